@@ -33,11 +33,15 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'protfolio.metrics.RequestMetricsMiddleware',
+    'protfolio.compression.CompressionMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'protfolio.middleware.UserRoleMiddleware',
+    'protfolio.analytics.PageViewMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -66,11 +70,61 @@ WSGI_APPLICATION = 'company.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
 
+# Applied on every new connection. WAL lets readers run alongside a writer,
+# synchronous=NORMAL is durable enough under WAL, and the mmap/page cache
+# keep hot pages in memory.
+SQLITE_PRAGMAS = (
+    'PRAGMA journal_mode=WAL;'
+    'PRAGMA synchronous=NORMAL;'
+    'PRAGMA mmap_size=268435456;'
+    'PRAGMA cache_size=-32000;'
+    'PRAGMA temp_store=MEMORY;'
+)
+
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
-    }
+        'CONN_MAX_AGE': 600,
+        'CONN_HEALTH_CHECKS': True,
+        'OPTIONS': {
+            # Seconds to wait on a locked database (busy_timeout).
+            'timeout': 20,
+            # Take the write lock when a transaction starts; a deferred
+            # transaction that later upgrades can fail with "database is
+            # locked" without waiting for the timeout.
+            'transaction_mode': 'IMMEDIATE',
+            'init_command': SQLITE_PRAGMAS,
+        },
+    },
+    # Read-only snapshot of the primary for the public pages, refreshed by
+    # `manage.py refresh_replica`. Tests use the primary in its place.
+    'replica': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': BASE_DIR / 'db-replica.sqlite3',
+        'CONN_MAX_AGE': 600,
+        'CONN_HEALTH_CHECKS': True,
+        'OPTIONS': {
+            'timeout': 20,
+            'init_command': 'PRAGMA query_only=ON;PRAGMA mmap_size=268435456;PRAGMA cache_size=-32000;',
+        },
+        'TEST': {'MIRROR': 'default'},
+    },
+}
+
+DATABASE_ROUTERS = ['protfolio.routers.ReadReplicaRouter']
+
+# One cache for every worker process on the host (see protfolio/cache_backend.py),
+# so page and fragment caches aren't duplicated per process.
+CACHES = {
+    'default': {
+        'BACKEND': 'protfolio.cache_backend.SQLiteCache',
+        'LOCATION': os.environ.get('CACHE_PATH', BASE_DIR / 'cache.sqlite3'),
+        'OPTIONS': {
+            'MAX_BYTES': int(os.environ.get('CACHE_MAX_BYTES', 64 * 2 ** 20)),
+            'MAX_ENTRIES': 100_000,
+        },
+    },
 }
 
 
@@ -101,10 +155,30 @@ STATIC_URL = 'static/'
 STATICFILES_DIRS = [
     os.path.join(BASE_DIR, 'protfolio', 'static'),
 ]
+# `manage.py build_assets` compiles the CSS and collects here: fingerprinted
+# names and .gz/.br variants, to be served with immutable caching.
+STATIC_ROOT = BASE_DIR / 'staticfiles'
+STORAGES = {
+    'default': {'BACKEND': 'django.core.files.storage.FileSystemStorage'},
+    'staticfiles': {'BACKEND': 'protfolio.storage.CompressedManifestStaticFilesStorage'},
+}
+# Standalone Tailwind CLI used by build_assets (works offline, no Node needed).
+TAILWIND_CLI = os.environ.get('TAILWIND_CLI', 'tailwindcss')
 
 # Media files configuration (for user-uploaded images)
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
+# Let the front-end server send media files (see protfolio/media.py): the
+# prefix of an nginx `internal` location aliasing MEDIA_ROOT, e.g.
+# '/_protected_media/', or MEDIA_X_SENDFILE=1 for Apache/lighttpd.
+MEDIA_ACCEL_REDIRECT = os.environ.get('MEDIA_ACCEL_REDIRECT') or None
+MEDIA_X_SENDFILE = os.environ.get('MEDIA_X_SENDFILE') == '1'
+
+
+# Page-view counting for the dashboard (protfolio/analytics.py); counts are
+# written in one batch per worker every ANALYTICS_FLUSH_INTERVAL seconds.
+PAGE_ANALYTICS = os.environ.get('PAGE_ANALYTICS', '1') == '1'
+ANALYTICS_FLUSH_INTERVAL = int(os.environ.get('ANALYTICS_FLUSH_INTERVAL', 60))
 
 
 # Default primary key field type
@@ -115,4 +189,17 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 # Authentication settings
 LOGIN_URL = 'login'
 LOGIN_REDIRECT_URL = 'home'
-LOGOUT_REDIRECT_URL = 'home'
\ No newline at end of file
+LOGOUT_REDIRECT_URL = 'home'
+
+# Per-view query/latency instrumentation (see protfolio/metrics.py).
+# Off by default; the middleware removes itself unless this is True.
+REQUEST_METRICS = os.environ.get('REQUEST_METRICS') == '1'
+
+# Sampling profiler for @sampled views (see protfolio/profiling.py). Collapsed
+# stacks are written to PROFILE_DIR and shown on the dashboard.
+SAMPLING_PROFILER = os.environ.get('SAMPLING_PROFILER') == '1'
+PROFILE_DIR = BASE_DIR / 'profiles'
+
+# Background task queue (see protfolio/tasks.py), worked by `manage.py run_tasks`.
+# TASKS_EAGER=1 runs tasks in the web process instead, for development.
+TASKS_EAGER = os.environ.get('TASKS_EAGER') == '1'
@@ -1,21 +1,40 @@
 # file path: protfolio/admin.py
 
 from django.contrib import admin
-from .models import Service, BlogPost, Developer, Review, Profile, Client
+from .models import Service, BlogPost, Developer, Review, Profile, Client, ReviewStats
+from . import search
+
+
+class FullTextSearchMixin:
+    """
+    Answer the changelist search box from the FTS5 index instead of LIKE
+    '%term%'. Terms match the start of words, not any substring: "host"
+    finds "hosting", "sting" doesn't.
+    """
+
+    search_help_text = "Finds every row with words starting with each search term."
+
+    def get_search_results(self, request, queryset, search_term):
+        if not search_term or not search.available():
+            return super().get_search_results(request, queryset, search_term)
+        pks = search.matching_pks(self.model, search_term)
+        if pks is None:
+            return queryset.none(), False
+        return queryset.filter(pk__in=pks), False
 
 @admin.register(Service)
-class ServiceAdmin(admin.ModelAdmin):
+class ServiceAdmin(FullTextSearchMixin, admin.ModelAdmin):
     list_display = ('title',)
     search_fields = ('title', 'description')
 
 @admin.register(BlogPost)
-class BlogPostAdmin(admin.ModelAdmin):
+class BlogPostAdmin(FullTextSearchMixin, admin.ModelAdmin):
     list_display = ('title', 'author', 'created_at')
     list_filter = ('created_at', 'author')
     search_fields = ('title', 'content')
 
 @admin.register(Developer)
-class DeveloperAdmin(admin.ModelAdmin):
+class DeveloperAdmin(FullTextSearchMixin, admin.ModelAdmin):
     list_display = ('name', 'position', 'experience')
     search_fields = ('name', 'position', 'bio')
 
@@ -34,4 +53,8 @@ class ProfileAdmin(admin.ModelAdmin):
 @admin.register(Client)
 class ClientAdmin(admin.ModelAdmin):
     list_display = ('name', 'display_order', 'website_url')
-    list_editable = ('display_order',)
\ No newline at end of file
+    list_editable = ('display_order',)
+
+@admin.register(ReviewStats)
+class ReviewStatsAdmin(admin.ModelAdmin):
+    list_display = ('total', 'rating_sum', 'rating_1', 'rating_2', 'rating_3', 'rating_4', 'rating_5')
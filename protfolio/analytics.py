@@ -0,0 +1,202 @@
+import atexit
+import logging
+import os
+import threading
+import time
+from collections import Counter
+from datetime import datetime, timedelta
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connection, transaction
+from django.db.models import Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from .models import BlogPost, PageView
+
+logger = logging.getLogger(__name__)
+
+# Page views are counted in memory, per process, path and minute, and a
+# background thread adds them to PageView in one bulk upsert per flush. The
+# database sees one write transaction per worker per interval however busy
+# the site is; a crash loses at most the counts of one interval.
+ANALYTICS_FLUSH_INTERVAL = getattr(settings, 'ANALYTICS_FLUSH_INTERVAL', 60)
+# Flush early once this many (path, minute) counters are pending.
+ANALYTICS_FLUSH_SIZE = getattr(settings, 'ANALYTICS_FLUSH_SIZE', 1000)
+ANALYTICS_RETENTION = getattr(settings, 'ANALYTICS_RETENTION', timedelta(days=90))
+PRUNE_INTERVAL = 60 * 60
+
+# URL names of the public pages that are counted.
+TRACKED_VIEWS = ('home', 'services', 'blog', 'blog_detail', 'about_us', 'review_page')
+
+_pending = Counter()
+_lock = threading.Lock()
+_wake = threading.Event()
+_flusher_pid = None
+
+
+def _start_flusher():
+    global _flusher_pid
+    with _lock:
+        if _flusher_pid == os.getpid():
+            return
+        # First view in this process (or in a freshly forked worker, which
+        # must not write the parent's counts a second time).
+        _flusher_pid = os.getpid()
+        _pending.clear()
+    threading.Thread(target=_flush_forever, name='page-view-flusher', daemon=True).start()
+
+
+def record(path, view_name, object_id=None):
+    _start_flusher()
+    minute = timezone.now().replace(second=0, microsecond=0)
+    with _lock:
+        _pending[path[:255], view_name, object_id, minute] += 1
+        full = len(_pending) >= ANALYTICS_FLUSH_SIZE
+    if full:
+        _wake.set()
+
+
+def pending():
+    with _lock:
+        return dict(_pending)
+
+
+def discard():
+    with _lock:
+        _pending.clear()
+
+
+def flush():
+    """Add the pending counts to PageView in one transaction; returns the rows written."""
+    with _lock:
+        counts = dict(_pending)
+        _pending.clear()
+    if not counts:
+        return 0
+    table = connection.ops.quote_name(PageView._meta.db_table)
+    rows = [
+        (path, view_name, object_id, connection.ops.adapt_datetimefield_value(minute), count)
+        for (path, view_name, object_id, minute), count in counts.items()
+    ]
+    try:
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.executemany(
+                f'INSERT INTO {table} (path, view_name, object_id, minute, count) VALUES (%s, %s, %s, %s, %s) '
+                f'ON CONFLICT (path, minute) DO UPDATE SET count = {table}.count + excluded.count',
+                rows,
+            )
+    except Exception:
+        # Keep them for the next attempt.
+        with _lock:
+            _pending.update(counts)
+        raise
+    return len(rows)
+
+
+def prune():
+    return PageView.objects.filter(minute__lt=timezone.now() - ANALYTICS_RETENTION).delete()[0]
+
+
+def _flush_forever():
+    pruned_at = 0
+    while True:
+        _wake.wait(ANALYTICS_FLUSH_INTERVAL)
+        _wake.clear()
+        try:
+            flush()
+            if time.monotonic() - pruned_at > PRUNE_INTERVAL:
+                prune()
+                pruned_at = time.monotonic()
+        except Exception:
+            logger.exception("Could not write page views")
+        finally:
+            # This thread's own connection; not worth holding between flushes.
+            connection.close()
+
+
+@atexit.register
+def _flush_at_exit():
+    # A graceful worker restart doesn't drop the last interval.
+    if _flusher_pid == os.getpid():
+        try:
+            flush()
+        except Exception:
+            logger.exception("Could not write page views")
+
+
+class PageViewMiddleware:
+    """
+    Count successful GETs of the TRACKED_VIEWS, including cache hits and
+    304s. Off with PAGE_ANALYTICS = False.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'PAGE_ANALYTICS', True):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        response = self.get_response(request)
+        self.count(request, response)
+        return response
+
+    async def __acall__(self, request):
+        response = await self.get_response(request)
+        self.count(request, response)
+        return response
+
+    def count(self, request, response):
+        match = getattr(request, 'resolver_match', None)
+        if (request.method == 'GET' and response.status_code in (200, 304)
+                and match is not None and match.url_name in TRACKED_VIEWS):
+            record(request.path, match.url_name, match.kwargs.get('pk'))
+
+
+# --- Dashboard ---
+
+def summary(days=14, top=10):
+    """Daily totals, views per page and the most-read posts of the last `days` days."""
+    today = timezone.localdate()
+    first_day = today - timedelta(days=days - 1)
+    # A plain range on minute, so the index is used.
+    views = PageView.objects.filter(minute__gte=timezone.make_aware(datetime.combine(first_day, datetime.min.time())))
+
+    per_day = dict(
+        views.annotate(day=TruncDate('minute')).order_by().values('day')
+        .annotate(total=Sum('count')).values_list('day', 'total')
+    )
+    peak = max(per_day.values(), default=0)
+    daily = []
+    for offset in range(days):
+        day = first_day + timedelta(days=offset)
+        total = per_day.get(day, 0)
+        daily.append({'day': day, 'total': total, 'percent': round(100 * total / peak) if peak else 0})
+
+    by_view = list(views.order_by().values('view_name').annotate(total=Sum('count')).order_by('-total'))
+
+    read = list(
+        views.filter(view_name='blog_detail').order_by().values('object_id')
+        .annotate(total=Sum('count')).order_by('-total')[:top]
+    )
+    posts = BlogPost.objects.only('title').in_bulk([row['object_id'] for row in read])
+    top_posts = [
+        {'post': posts[row['object_id']], 'total': row['total']}
+        for row in read if row['object_id'] in posts
+    ]
+    return {
+        'days': days,
+        'daily': daily,
+        'total': sum(per_day.values()),
+        'by_view': by_view,
+        'top_posts': top_posts,
+    }
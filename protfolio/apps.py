@@ -4,3 +4,10 @@ from django.apps import AppConfig
 class ProtfolioConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'protfolio'
+
+    def ready(self):
+        # assets registers the deploy check for the front-end bundle.
+        from . import assets, cache, search, static_export  # noqa: F401
+        cache.connect_signals()
+        search.connect_signals()
+        static_export.connect_signals()
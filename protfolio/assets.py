@@ -0,0 +1,117 @@
+import shutil
+import subprocess
+import time
+import urllib.request
+from pathlib import Path
+
+from django.conf import settings
+from django.contrib.staticfiles import finders
+from django.core.checks import Error, Tags, register
+
+# Front-end build: Tailwind compiled ahead of time instead of in every
+# visitor's browser, third-party CSS/JS served from our own static files.
+#
+#   manage.py build_assets --fetch   # once, online: download VENDOR_FILES
+#   manage.py build_assets           # offline: compile CSS, collectstatic
+#
+# collectstatic then fingerprints and pre-compresses everything (see
+# storage.CompressedManifestStaticFilesStorage).
+
+STATIC_DIR = Path(settings.BASE_DIR) / 'protfolio' / 'static'
+TAILWIND_CONFIG = Path(settings.BASE_DIR) / 'tailwind.config.js'
+TAILWIND_INPUT = Path(settings.BASE_DIR) / 'tailwind.css'
+# Static path of the compiled stylesheet: Tailwind with only the classes the
+# templates use, plus the vendored AOS styles and the Inter font face.
+APP_CSS = 'build/app.css'
+# The standalone Tailwind CLI (a single binary, no Node needed), or `npx tailwindcss`.
+TAILWIND_CLI = getattr(settings, 'TAILWIND_CLI', 'tailwindcss')
+# While the bundle is missing, look for it again at most this often (seconds).
+BUNDLE_RECHECK_INTERVAL = 30
+
+# Vendored copies of the CDN dependencies, by static path. Fetched once with
+# `build_assets --fetch` and committed, so later builds and page views never
+# depend on a third-party host; build_assets refuses to run without them.
+FONT_AWESOME = 'https://cdnjs.cloudflare.com/ajax/libs/font-awesome/6.4.0'
+VENDOR_FILES = {
+    'vendor/aos/aos.css': 'https://unpkg.com/aos@2.3.1/dist/aos.css',
+    'vendor/aos/aos.js': 'https://unpkg.com/aos@2.3.1/dist/aos.js',
+    'vendor/inter/inter-latin-wght-normal.woff2':
+        'https://cdn.jsdelivr.net/npm/@fontsource-variable/inter@5.0.18/files/inter-latin-wght-normal.woff2',
+    'vendor/fontawesome/css/all.min.css': f'{FONT_AWESOME}/css/all.min.css',
+    **{
+        f'vendor/fontawesome/webfonts/{font}.{ext}': f'{FONT_AWESOME}/webfonts/{font}.{ext}'
+        for font in ('fa-brands-400', 'fa-regular-400', 'fa-solid-900', 'fa-v4compatibility')
+        for ext in ('woff2', 'ttf')
+    },
+}
+
+
+def missing_vendor_files():
+    return [path for path in VENDOR_FILES if not (STATIC_DIR / path).exists()]
+
+
+def fetch_vendor_files(log=print):
+    """Download the vendored files that are not in the tree yet. Needs network access."""
+    for path in missing_vendor_files():
+        target = STATIC_DIR / path
+        target.parent.mkdir(parents=True, exist_ok=True)
+        log(f"Fetching {VENDOR_FILES[path]}")
+        with urllib.request.urlopen(VENDOR_FILES[path], timeout=30) as response:
+            target.write_bytes(response.read())
+
+
+def tailwind_command(cli=TAILWIND_CLI):
+    """The argv that runs the Tailwind CLI, or None if it is not installed."""
+    if shutil.which(cli):
+        return [cli]
+    if Path(settings.BASE_DIR, 'node_modules', '.bin', 'tailwindcss').exists() and shutil.which('npx'):
+        return ['npx', '--no-install', 'tailwindcss']
+    return None
+
+
+def build_css(command):
+    output = STATIC_DIR / APP_CSS
+    output.parent.mkdir(parents=True, exist_ok=True)
+    subprocess.run(
+        [*command, '-c', str(TAILWIND_CONFIG), '-i', str(TAILWIND_INPUT), '-o', str(output), '--minify'],
+        cwd=settings.BASE_DIR, check=True,
+    )
+    return output
+
+
+def _bundle_present():
+    return finders.find(APP_CSS) is not None and not missing_vendor_files()
+
+
+_built = False
+_checked_at = None
+
+
+def bundle_built():
+    """
+    Whether the compiled stylesheet and vendored files are available. Until
+    build_assets has run (a fresh checkout), pages fall back to the CDN tags
+    and `check --deploy` fails. Once found the bundle is assumed to stay;
+    while it is missing, running workers look again every
+    BUNDLE_RECHECK_INTERVAL seconds, so a build is picked up without a restart.
+    """
+    global _built, _checked_at
+    if _built:
+        return True
+    now = time.monotonic()
+    if _checked_at is None or now - _checked_at >= BUNDLE_RECHECK_INTERVAL:
+        _checked_at = now
+        _built = _bundle_present()
+    return _built
+
+
+@register(Tags.staticfiles, deploy=True)
+def check_bundle_built(app_configs, **kwargs):
+    if _bundle_present():
+        return []
+    return [Error(
+        "The front-end bundle has not been built; pages would load Tailwind and fonts from CDNs.",
+        hint="Run `manage.py build_assets --fetch` once online and commit protfolio/static/vendor, "
+             "then `manage.py build_assets` on every deploy.",
+        id='protfolio.E001',
+    )]
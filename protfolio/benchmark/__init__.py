@@ -0,0 +1,5 @@
+"""
+Load-test harness for the public site: seed a synthetic dataset, drive every
+route with concurrent test clients and compare the numbers to a baseline.
+Run it with `python manage.py benchmark`.
+"""
@@ -0,0 +1,162 @@
+import io
+import random
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.files.base import ContentFile
+from django.db import transaction
+from PIL import Image
+
+from .. import search
+from ..images import generate_derivatives
+from ..models import (
+    BlogPost, Client, Developer, MediaBlob, Profile, Review, ReviewStats,
+    Service, render_blog_content,
+)
+from ..storage import content_addressed_storage
+
+# Row counts of the full-size synthetic dataset; --scale multiplies them.
+DEFAULT_SIZES = {
+    'users': 50_000,
+    'blog_posts': 10_000,
+    'reviews': 200_000,
+    'clients': 500,
+    'developers': 200,
+    'services': 24,
+}
+
+BATCH_SIZE = 2000
+ADMIN_USERNAME = 'bench-admin'
+PASSWORD = 'bench-password'
+
+WORDS = (
+    'software cloud platform design team delivery product data secure fast '
+    'mobile web api service client project quality scale support growth '
+    'integration automation analytics backend frontend release review agile '
+    'infrastructure performance database migration testing deployment'
+).split()
+
+
+def scaled_sizes(scale=1.0):
+    return {name: max(1, int(count * scale)) for name, count in DEFAULT_SIZES.items()}
+
+
+def _text(rng, words):
+    return ' '.join(rng.choice(WORDS) for _ in range(words))
+
+
+def _paragraphs(rng, count, words):
+    return ''.join(f'<p>{_text(rng, words).capitalize()}.</p>\n' for _ in range(count))
+
+
+def placeholder_image():
+    """
+    One real JPEG (with derivatives) shared by every seeded image field. The
+    bytes never change, so writing it again yields the same blob name.
+    """
+    buffer = io.BytesIO()
+    Image.new('RGB', (1280, 720), (37, 99, 235)).save(buffer, 'JPEG', quality=80)
+    name = content_addressed_storage.save('benchmark.jpg', ContentFile(buffer.getvalue()))
+    generate_derivatives(name, content_addressed_storage)
+    return name
+
+
+def _bulk(model, objects):
+    return model.objects.bulk_create(objects, batch_size=BATCH_SIZE)
+
+
+def seed(sizes=None, random_seed=0, log=print):
+    """
+    Fill the (empty) current database with a synthetic dataset.
+
+    Rows go in through bulk_create, which skips save() and model signals, so
+    everything they would maintain (profiles, rendered post content, review
+    stats, the search index) is filled in here directly.
+    """
+    sizes = sizes or DEFAULT_SIZES
+    rng = random.Random(random_seed)
+    password = make_password(PASSWORD)
+
+    with transaction.atomic():
+        image = placeholder_image()
+
+        admin = User.objects.create_superuser(ADMIN_USERNAME, 'admin@example.com', PASSWORD)
+        Profile.objects.filter(user=admin).update(role='SUPERADMIN')
+
+        log(f"Users: {sizes['users']}")
+        for start in range(0, sizes['users'], BATCH_SIZE):
+            users = _bulk(User, [
+                User(username=f'bench-user-{i}', email=f'user{i}@example.com', password=password)
+                for i in range(start, min(start + BATCH_SIZE, sizes['users']))
+            ])
+            _bulk(Profile, [
+                Profile(user=user, role='CLIENT' if rng.random() < 0.9 else 'VISITOR')
+                for user in users
+            ])
+        user_ids = list(User.objects.filter(username__startswith='bench-user-').values_list('pk', flat=True))
+
+        log(f"Blog posts: {sizes['blog_posts']}")
+        posts = []
+        for i in range(sizes['blog_posts']):
+            content = _paragraphs(rng, rng.randint(4, 12), rng.randint(40, 120))
+            posts.append(BlogPost(
+                title=_text(rng, rng.randint(4, 9)).title(),
+                content=content,
+                **render_blog_content(content),
+                image=image,
+                author_id=admin.pk,
+            ))
+        _bulk(BlogPost, posts)
+
+        log(f"Reviews: {sizes['reviews']}")
+        for start in range(0, sizes['reviews'], BATCH_SIZE):
+            _bulk(Review, [
+                Review(
+                    user_id=rng.choice(user_ids),
+                    review_text=_text(rng, rng.randint(10, 60)).capitalize() + '.',
+                    rating=rng.choices((1, 2, 3, 4, 5), weights=(1, 1, 3, 8, 12))[0],
+                )
+                for _ in range(start, min(start + BATCH_SIZE, sizes['reviews']))
+            ])
+        ReviewStats.rebuild()
+
+        log(f"Clients: {sizes['clients']}, developers: {sizes['developers']}, services: {sizes['services']}")
+        _bulk(Client, [
+            Client(name=f'Client {i}', logo=image, website_url=f'https://client{i}.example.com', display_order=i)
+            for i in range(sizes['clients'])
+        ])
+        _bulk(Developer, [
+            Developer(
+                name=f'Developer {i}', position=_text(rng, 2).title(), experience=rng.randint(1, 20),
+                image=image, bio=_text(rng, rng.randint(30, 80)),
+            )
+            for i in range(sizes['developers'])
+        ])
+        _bulk(Service, [
+            Service(
+                title=_text(rng, 3).title(), description=_text(rng, rng.randint(20, 50)),
+                icon_class='fas fa-laptop-code', image=image,
+            )
+            for i in range(sizes['services'])
+        ])
+
+        references = sum(sizes[key] for key in ('blog_posts', 'clients', 'developers', 'services'))
+        MediaBlob.objects.update_or_create(
+            name=image, defaults={'size': content_addressed_storage.size(image), 'ref_count': references},
+        )
+
+    if search.available():
+        log("Building search index")
+        search.rebuild()
+
+
+def counts():
+    """Row counts of the seeded tables, stored with results so baselines compare like with like."""
+    return {
+        'users': User.objects.count(),
+        'blog_posts': BlogPost.objects.count(),
+        'reviews': Review.objects.count(),
+        'clients': Client.objects.count(),
+        'developers': Developer.objects.count(),
+        'services': Service.objects.count(),
+    }
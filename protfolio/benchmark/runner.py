@@ -0,0 +1,180 @@
+import threading
+import time
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db import connections
+from django.shortcuts import resolve_url
+from django.test import Client
+from django.urls import URLPattern, get_resolver, reverse
+
+from ..metrics import percentile
+from ..models import BlogPost, Client as ClientLogo, Developer, Service
+from .dataset import ADMIN_USERNAME
+
+# Routes that change state on GET are never driven.
+SKIP_ROUTES = {'logout'}
+
+# Model whose first row fills the <pk> of a route, by URL name prefix.
+PK_MODELS = {
+    'blog': BlogPost,
+    'service': Service,
+    'developer': Developer,
+    'client': ClientLogo,
+}
+
+# Query strings that make a route do representative work.
+QUERY_STRINGS = {
+    'search': 'q=software+platform',
+    'review_feed': 'format=html',
+}
+
+
+def discover_routes(urlconf='protfolio.urls'):
+    """
+    (name, url) for every named route, with <pk> filled from the dataset.
+    Raises LookupError for a <pk> route with no PK_MODELS entry, so new
+    routes can't silently drop out of the benchmark.
+    """
+    routes = []
+    for pattern in get_resolver(urlconf).url_patterns:
+        if not isinstance(pattern, URLPattern) or not pattern.name or pattern.name in SKIP_ROUTES:
+            continue
+        kwargs = {}
+        if 'pk' in pattern.pattern.converters:
+            prefix = pattern.name.split('_')[0]
+            if prefix not in PK_MODELS:
+                raise LookupError(f"No PK_MODELS entry for route {pattern.name!r}")
+            kwargs['pk'] = PK_MODELS[prefix].objects.values_list('pk', flat=True).order_by('pk').first()
+            if kwargs['pk'] is None:
+                continue
+        url = reverse(pattern.name, kwargs=kwargs or None)
+        if pattern.name in QUERY_STRINGS:
+            url = f'{url}?{QUERY_STRINGS[pattern.name]}'
+        routes.append((pattern.name, url))
+    return routes
+
+
+class _QueryCounter:
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+
+def _client(admin):
+    client = Client()
+    if admin is not None:
+        client.force_login(admin)
+    return client
+
+
+def _needs_login(response):
+    return response.status_code == 302 and response.url.startswith(resolve_url(settings.LOGIN_URL))
+
+
+def _worker(url, admin, count, timings, queries, statuses):
+    client = _client(admin)
+    counter = _QueryCounter()
+    try:
+        with ExitStack() as stack:
+            for conn in connections.all():
+                stack.enter_context(conn.execute_wrapper(counter))
+            for _ in range(count):
+                before = counter.count
+                start = time.perf_counter()
+                response = client.get(url)
+                timings.append(time.perf_counter() - start)
+                queries.append(counter.count - before)
+                statuses.add(response.status_code)
+    finally:
+        connections.close_all()
+
+
+def bench_route(url, admin, requests, workers):
+    """Drive `url` with `workers` threads, `requests` GETs in total."""
+    timings, queries, statuses = [], [], set()
+    shares = [requests // workers + (i < requests % workers) for i in range(workers)]
+    threads = [
+        threading.Thread(target=_worker, args=(url, admin, share, timings, queries, statuses))
+        for share in shares if share
+    ]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+
+    timings.sort()
+    queries.sort()
+    return {
+        'url': url,
+        'audience': 'superadmin' if admin else 'anonymous',
+        'requests': len(timings),
+        'status': sorted(statuses),
+        'p50_ms': round(percentile(timings, 0.50) * 1000, 3),
+        'p95_ms': round(percentile(timings, 0.95) * 1000, 3),
+        'p99_ms': round(percentile(timings, 0.99) * 1000, 3),
+        'rps': round(len(timings) / elapsed, 1) if elapsed else 0,
+        'queries_p50': percentile(queries, 0.50),
+        'queries_max': queries[-1] if queries else 0,
+    }
+
+
+def peak_rss_kb():
+    try:
+        import resource
+    except ImportError:  # Windows
+        return None
+    # ru_maxrss is in kilobytes on Linux (bytes on macOS).
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def run(routes, requests=200, workers=4, warmup=5, log=print):
+    """
+    Benchmark every (name, url) route. Each route is first requested
+    anonymously; routes that redirect to the login page are driven as the
+    seeded superadmin instead. Warm-up requests are not measured.
+    """
+    admin = User.objects.get(username=ADMIN_USERNAME)
+    anonymous = _client(None)
+    results = {}
+    for name, url in routes:
+        route_admin = admin if _needs_login(anonymous.get(url)) else None
+        if warmup:
+            bench_route(url, route_admin, warmup, 1)
+        results[name] = bench_route(url, route_admin, requests, workers)
+        row = results[name]
+        log(f"{name:<22} {row['p50_ms']:>9.2f} {row['p95_ms']:>9.2f} {row['p99_ms']:>9.2f} "
+            f"{row['rps']:>9.1f} {row['queries_max']:>5}  {url}")
+    return {'routes': results, 'peak_rss_kb': peak_rss_kb(), 'workers': workers, 'requests': requests}
+
+
+def compare(results, baseline, tolerance=0.2):
+    """
+    Regressions of `results` against `baseline`, as readable strings.
+
+    Latency, throughput and memory may drift by `tolerance` before they count
+    (timings are noisy); query counts are deterministic and must not grow.
+    """
+    regressions = []
+    limit = 1 + tolerance
+    for name, base in baseline.get('routes', {}).items():
+        row = results['routes'].get(name)
+        if row is None:
+            continue
+        for key in ('p50_ms', 'p95_ms', 'p99_ms'):
+            if row[key] > base[key] * limit:
+                regressions.append(f"{name}: {key} {row[key]} > {base[key]} (+{tolerance:.0%})")
+        if row['rps'] * limit < base['rps']:
+            regressions.append(f"{name}: rps {row['rps']} < {base['rps']} (-{tolerance:.0%})")
+        if row['queries_max'] > base['queries_max']:
+            regressions.append(f"{name}: queries {row['queries_max']} > {base['queries_max']}")
+    base_rss, rss = baseline.get('peak_rss_kb'), results.get('peak_rss_kb')
+    if base_rss and rss and rss > base_rss * limit:
+        regressions.append(f"peak RSS {rss} KB > {base_rss} KB (+{tolerance:.0%})")
+    return regressions
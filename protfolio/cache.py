@@ -0,0 +1,383 @@
+import hashlib
+import logging
+import time
+from functools import wraps
+
+from asgiref.sync import async_to_sync, iscoroutinefunction
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import DEFAULT_CACHE_ALIAS, cache, caches
+from django.db import transaction
+from django.db.models import Count, Max
+from django.db.models.signals import post_save, post_delete
+from django.test import RequestFactory
+from django.urls import resolve, reverse
+from django.utils.cache import get_conditional_response, patch_cache_control, patch_vary_headers
+from django.utils.http import http_date
+
+from .compression import prepare
+from .models import Service, BlogPost, Developer, Client, Review, Profile
+from .tasks import enqueue, task
+
+logger = logging.getLogger(__name__)
+
+PAGE_CACHE_TIMEOUT = getattr(settings, 'PAGE_CACHE_TIMEOUT', 60 * 60 * 24)
+PAGE_CACHE_WARM = getattr(settings, 'PAGE_CACHE_WARM', True)
+ROLE_CACHE_TIMEOUT = getattr(settings, 'ROLE_CACHE_TIMEOUT', 60 * 60)
+# Part of every page ETag: change it on deploys that change templates, so
+# browsers don't keep revalidating pages rendered by the old ones.
+PAGE_ETAG_VERSION = getattr(settings, 'PAGE_ETAG_VERSION', '')
+
+# Which cached pages each model is rendered into. A save or delete only
+# invalidates the pages listed for its model; '{pk}' is the saved row's pk.
+PAGE_DEPENDENCIES = {
+    Service: ('home', 'services'),
+    Client: ('home',),
+    BlogPost: ('blog', 'blog_detail:{pk}'),
+    Developer: ('about_us',),
+    Review: ('review_page',),
+}
+
+
+# --- Page Versions ---
+# Every page group has a version number in the cache. Cached responses are
+# stored under the current version, so bumping it drops every URL of that
+# group (all cursor pages of the blog, say) without having to know the URLs.
+
+def _version_key(group):
+    return f'page-version:{group}'
+
+def page_version(group):
+    return cache.get_or_set(_version_key(group), 1, None)
+
+def _changed_key(group):
+    return f'page-changed:{group}'
+
+def bump_page_version(group):
+    try:
+        cache.incr(_version_key(group))
+    except ValueError:
+        cache.set(_version_key(group), 2, None)
+    cache.set(_changed_key(group), time.time(), None)
+
+def page_changed_at(group):
+    """Timestamp of the group's last invalidation, or None if never invalidated."""
+    return cache.get(_changed_key(group))
+
+async def apage_changed_at(group):
+    return await cache.aget(_changed_key(group))
+
+async def apage_version(group):
+    return await cache.aget_or_set(_version_key(group), 1, None)
+
+def _page_key(group, version, request):
+    path = hashlib.md5(request.get_full_path().encode()).hexdigest()
+    return f'page:{group}:{version}:{path}'
+
+def page_cache_key(group, request):
+    return _page_key(group, page_version(group), request)
+
+async def apage_cache_key(group, request):
+    return _page_key(group, await apage_version(group), request)
+
+def _page_tags(group):
+    # Lets a tagging backend drop the superseded copies at once on
+    # invalidation instead of leaving them to LRU eviction.
+    return {'tags': [f'page:{group}']} if _cache_tags_pages() else {}
+
+def _cacheable(response):
+    return response.status_code == 200 and not response.cookies and not response.streaming
+
+
+def anonymous_page_cache(group):
+    """
+    Cache the full response of a view for anonymous GET requests, per URL.
+
+    `group` names the page for invalidation and may use the view kwargs,
+    e.g. 'blog_detail:{pk}'. Logged-in users always get a fresh render so
+    their personalised navbar (dashboard link, logout) is never shared.
+
+    Async views get an async wrapper that uses the async cache API; it relies
+    on UserRoleMiddleware having already resolved request.user.
+    """
+    def decorator(view):
+        if iscoroutinefunction(view):
+            @wraps(view)
+            async def async_wrap(request, *args, **kwargs):
+                if request.method not in ('GET', 'HEAD') or request.user.is_authenticated:
+                    return await view(request, *args, **kwargs)
+                page_group = group.format(**kwargs)
+                key = await apage_cache_key(page_group, request)
+                response = await cache.aget(key)
+                if response is not None:
+                    return response
+                response = await view(request, *args, **kwargs)
+                if _cacheable(response):
+                    # Hits are then served without minifying or compressing.
+                    await cache.aset(key, prepare(response, cached=True), PAGE_CACHE_TIMEOUT, **_page_tags(page_group))
+                return response
+            return async_wrap
+
+        @wraps(view)
+        def wrap(request, *args, **kwargs):
+            if request.method not in ('GET', 'HEAD') or request.user.is_authenticated:
+                return view(request, *args, **kwargs)
+            page_group = group.format(**kwargs)
+            key = page_cache_key(page_group, request)
+            response = cache.get(key)
+            if response is not None:
+                return response
+            response = view(request, *args, **kwargs)
+            if _cacheable(response):
+                cache.set(key, prepare(response, cached=True), PAGE_CACHE_TIMEOUT, **_page_tags(page_group))
+            return response
+        return wrap
+    return decorator
+
+
+# --- Conditional GET ---
+# A page only changes when a row it shows is added, edited or deleted, so
+# COUNT and MAX(updated_at) of its source tables (one aggregate each, read
+# from the updated_at index) validate it before any page query runs.
+
+def _source_querysets(sources, kwargs):
+    return [source.objects.all() if isinstance(source, type) else source(**kwargs) for source in sources]
+
+def _aggregate(queryset):
+    return queryset.order_by().aggregate(count=Count('pk'), latest=Max('updated_at'))
+
+async def _aaggregate(queryset):
+    return await queryset.order_by().aaggregate(count=Count('pk'), latest=Max('updated_at'))
+
+def _validators(request, role, aggregates):
+    """(ETag, Last-Modified timestamp) of a page built from `aggregates`."""
+    # The navbar differs per user and role, so they are part of the tag, and
+    # so is the CSRF secret: it rotates on login, and a page revalidated
+    # after that would keep a {% csrf_token %} the next POST is refused for.
+    parts = [PAGE_ETAG_VERSION, str(request.user.pk), str(role), request.META.get('CSRF_COOKIE', '')]
+    parts += [f"{row['count']}:{row['latest'].isoformat() if row['latest'] else ''}" for row in aggregates]
+    etag = 'W/"%s"' % hashlib.md5('|'.join(parts).encode()).hexdigest()
+    latest = [row['latest'] for row in aggregates if row['latest']]
+    return etag, int(max(latest).timestamp()) if latest else None
+
+def _set_validators(response, etag, last_modified):
+    # The tag depends on the session and CSRF cookies.
+    patch_vary_headers(response, ['Cookie'])
+    if response.status_code == 200:
+        response.headers['ETag'] = etag
+        if last_modified is not None:
+            response.headers['Last-Modified'] = http_date(last_modified)
+        # Browsers may keep the page but must ask first, so edits show at once.
+        patch_cache_control(response, no_cache=True)
+    return response
+
+def conditional_page(*sources):
+    """
+    Answer If-None-Match / If-Modified-Since for a page rendered from
+    `sources`: models, or functions of the view kwargs returning a queryset
+    (the one row of a detail page, say).
+
+    Put it inside @prefer_replica, so the validators come from the database
+    the page is rendered from, and outside anonymous_page_cache, so a 304
+    skips the cache lookup as well.
+
+    A deletion lowers a count without moving MAX(updated_at), which only the
+    ETag notices; get_conditional_response ignores If-Modified-Since whenever
+    If-None-Match is sent, so browsers are never served a stale 304.
+    """
+    def decorator(view):
+        if iscoroutinefunction(view):
+            @wraps(view)
+            async def async_wrap(request, *args, **kwargs):
+                if request.method not in ('GET', 'HEAD'):
+                    return await view(request, *args, **kwargs)
+                role = await aget_user_role(request.user)
+                aggregates = [await _aaggregate(queryset) for queryset in _source_querysets(sources, kwargs)]
+                etag, last_modified = _validators(request, role, aggregates)
+                response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+                if response is not None:
+                    return _set_validators(response, etag, last_modified)
+                return _set_validators(await view(request, *args, **kwargs), etag, last_modified)
+            return async_wrap
+
+        @wraps(view)
+        def wrap(request, *args, **kwargs):
+            if request.method not in ('GET', 'HEAD'):
+                return view(request, *args, **kwargs)
+            role = get_user_role(request.user)
+            aggregates = [_aggregate(queryset) for queryset in _source_querysets(sources, kwargs)]
+            etag, last_modified = _validators(request, role, aggregates)
+            response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+            if response is not None:
+                return _set_validators(response, etag, last_modified)
+            return _set_validators(view(request, *args, **kwargs), etag, last_modified)
+        return wrap
+    return decorator
+
+# --- Fragment Versions ---
+# Card fragments are cached per object under a version that is bumped on every
+# save, and the list around them under a key built from all member versions.
+# Editing one developer therefore misses one card fragment and the list, while
+# every other card is still served from the cache.
+
+FRAGMENT_MODELS = (Service, BlogPost, Developer, Client)
+
+def _fragment_version_key(model, pk):
+    return f'fragment-version:{model._meta.label_lower}:{pk}'
+
+def _fragment_keys(objects):
+    return {obj.pk: _fragment_version_key(type(obj), obj.pk) for obj in objects}
+
+def _assign_fragment_versions(objects, keys, versions):
+    """Set `fragment_version` on each object; returns (versions to seed, list key)."""
+    missing = {}
+    for obj in objects:
+        version = versions.get(keys[obj.pk])
+        if version is None:
+            # Never reuse a small number after eviction: an old fragment could
+            # still be cached under it.
+            version = missing[keys[obj.pk]] = time.time_ns()
+        obj.fragment_version = version
+    members = ','.join(f'{obj.pk}.{obj.fragment_version}' for obj in objects)
+    return missing, hashlib.md5(members.encode()).hexdigest()
+
+def attach_fragment_versions(objects):
+    """
+    Set `fragment_version` on each object (one cache round trip for the whole
+    list) and return a key identifying this exact set of card versions.
+    """
+    keys = _fragment_keys(objects)
+    missing, list_key = _assign_fragment_versions(objects, keys, cache.get_many(keys.values()))
+    if missing:
+        cache.set_many(missing, None)
+    return list_key
+
+async def aattach_fragment_versions(objects):
+    keys = _fragment_keys(objects)
+    missing, list_key = _assign_fragment_versions(objects, keys, await cache.aget_many(keys.values()))
+    if missing:
+        await cache.aset_many(missing, None)
+    return list_key
+
+def bump_fragment_version(sender, instance, **kwargs):
+    key = _fragment_version_key(sender, instance.pk)
+    if kwargs.get('signal') is post_delete:
+        cache.delete(key)
+        return
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, time.time_ns(), None)
+
+
+# --- User Roles ---
+
+def _role_key(user_id):
+    return f'user-role:{user_id}'
+
+def get_user_role(user):
+    """
+    The user's Profile.role, or None for anonymous users and users without a
+    profile. Read from the cache so page views don't query Profile; the
+    Profile signals below drop the entry whenever a role changes.
+    """
+    if not user.is_authenticated:
+        return None
+    role = cache.get(_role_key(user.pk))
+    if role is None:
+        role = Profile.objects.filter(user_id=user.pk).values_list('role', flat=True).first() or ''
+        cache.set(_role_key(user.pk), role, ROLE_CACHE_TIMEOUT)
+    return role or None
+
+async def aget_user_role(user):
+    if not user.is_authenticated:
+        return None
+    role = await cache.aget(_role_key(user.pk))
+    if role is None:
+        role = await Profile.objects.filter(user_id=user.pk).values_list('role', flat=True).afirst() or ''
+        await cache.aset(_role_key(user.pk), role, ROLE_CACHE_TIMEOUT)
+    return role or None
+
+def forget_user_role(sender, instance, **kwargs):
+    cache.delete(_role_key(instance.user_id))
+
+
+# --- Warming ---
+
+def group_url(group):
+    name, _, pk = group.partition(':')
+    return reverse(name, kwargs={'pk': pk} if pk else None)
+
+def render_anonymous(group):
+    """The response an anonymous visitor gets for the first page of `group`."""
+    url = group_url(group)
+    request = RequestFactory().get(url)
+    request.user = AnonymousUser()
+    match = resolve(url)
+    view = async_to_sync(match.func) if iscoroutinefunction(match.func) else match.func
+    return view(request, *match.args, **match.kwargs)
+
+def warm_pages(groups):
+    """Render the first page of each group anonymously so the next visitor gets a hit."""
+    for group in groups:
+        try:
+            render_anonymous(group)
+        except Exception:
+            logger.exception("Could not warm page cache for %s", group)
+
+@task
+def warm_page(group):
+    render_anonymous(group)
+
+def _cache_is_shared():
+    # A worker warming a per-process cache would only warm its own copy.
+    return not type(caches[DEFAULT_CACHE_ALIAS]).__module__.startswith((
+        'django.core.cache.backends.locmem', 'django.core.cache.backends.dummy',
+    ))
+
+def _cache_tags_pages():
+    # cache_backend.SQLiteCache; other backends have no tags.
+    return hasattr(caches[DEFAULT_CACHE_ALIAS], 'invalidate_tags')
+
+def cache_stats():
+    """Hit/miss/eviction totals of the default cache, or None if it keeps none."""
+    backend = caches[DEFAULT_CACHE_ALIAS]
+    return backend.stats() if hasattr(backend, 'stats') else None
+
+# --- Invalidation ---
+
+def invalidate_pages(sender, instance, **kwargs):
+    groups = [group.format(pk=instance.pk) for group in PAGE_DEPENDENCIES[sender]]
+    invalidate_groups(groups, deleted=kwargs.get('signal') is post_delete)
+
+def invalidate_groups(groups, deleted=False):
+    """
+    Drop the cached pages of `groups` and warm them again. For changes made
+    without the model signals, e.g. bulk_update().
+    """
+    for group in groups:
+        bump_page_version(group)
+    if _cache_tags_pages():
+        cache.invalidate_tags(*(f'page:{group}' for group in groups))
+    if PAGE_CACHE_WARM:
+        # Deleted rows have no detail page left to warm.
+        if deleted:
+            groups = [group for group in groups if ':' not in group]
+        if _cache_is_shared():
+            # Off the editor's request; a burst of edits warms each page once.
+            for group in groups:
+                enqueue('warm_page', group)
+        else:
+            # Runs after the editor's transaction commits, so the fresh render
+            # sees the change; only superadmin CRUD requests pay for it.
+            transaction.on_commit(lambda: warm_pages(groups))
+
+def connect_signals():
+    for model in PAGE_DEPENDENCIES:
+        post_save.connect(invalidate_pages, sender=model, dispatch_uid=f'page-cache-save-{model.__name__}')
+        post_delete.connect(invalidate_pages, sender=model, dispatch_uid=f'page-cache-delete-{model.__name__}')
+    post_save.connect(forget_user_role, sender=Profile, dispatch_uid='user-role-save')
+    post_delete.connect(forget_user_role, sender=Profile, dispatch_uid='user-role-delete')
+    for model in FRAGMENT_MODELS:
+        post_save.connect(bump_fragment_version, sender=model, dispatch_uid=f'fragment-save-{model.__name__}')
+        post_delete.connect(bump_fragment_version, sender=model, dispatch_uid=f'fragment-delete-{model.__name__}')
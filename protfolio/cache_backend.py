@@ -0,0 +1,386 @@
+import logging
+import os
+import pickle
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+from asgiref.sync import sync_to_async
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+
+logger = logging.getLogger(__name__)
+
+# A cache shared by every worker process on the host, kept in its own SQLite
+# file (WAL, memory-mapped) so memcached or Redis aren't needed:
+#
+#   CACHES = {'default': {
+#       'BACKEND': 'protfolio.cache_backend.SQLiteCache',
+#       'LOCATION': BASE_DIR / 'cache.sqlite3',
+#       'OPTIONS': {'MAX_BYTES': 64 * 2 ** 20},
+#   }}
+#
+# Entries are evicted least recently used first once MAX_BYTES or MAX_ENTRIES
+# is exceeded. Integers are stored as SQLite integers so incr() is a single
+# atomic UPDATE, and set() takes optional tags for invalidate_tags().
+#
+# Only the sqlite3 module is used, never the Django ORM, so the sync API is
+# safe to call from async code too ({% cache %} in a template rendered by an
+# async view); the async API runs the same calls in a thread.
+
+DEFAULT_MAX_BYTES = 64 * 2 ** 20
+DEFAULT_MAX_ENTRIES = 100_000
+DEFAULT_MMAP_SIZE = 256 * 2 ** 20
+# Culling stops once the cache is this far under its limits.
+CULL_TARGET = 0.9
+# Hits, misses and LRU touches are counted in memory and written at most this
+# often (seconds), so reads don't turn into writes.
+FLUSH_INTERVAL = 1.0
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS cache (
+    key TEXT PRIMARY KEY,
+    value BLOB,
+    size INTEGER NOT NULL,
+    expires REAL,
+    accessed REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS cache_accessed ON cache (accessed);
+CREATE INDEX IF NOT EXISTS cache_expires ON cache (expires) WHERE expires IS NOT NULL;
+CREATE TABLE IF NOT EXISTS cache_tag (
+    tag TEXT NOT NULL,
+    key TEXT NOT NULL,
+    PRIMARY KEY (tag, key)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS cache_tag_key ON cache_tag (key);
+CREATE TABLE IF NOT EXISTS cache_stat (name TEXT PRIMARY KEY, value INTEGER NOT NULL) WITHOUT ROWID;
+INSERT OR IGNORE INTO cache_stat VALUES
+    ('bytes', 0), ('entries', 0), ('hits', 0), ('misses', 0), ('evictions', 0);
+-- Size accounting in the same transaction as every change.
+CREATE TRIGGER IF NOT EXISTS cache_insert AFTER INSERT ON cache BEGIN
+    UPDATE cache_stat SET value = value + NEW.size WHERE name = 'bytes';
+    UPDATE cache_stat SET value = value + 1 WHERE name = 'entries';
+END;
+CREATE TRIGGER IF NOT EXISTS cache_update AFTER UPDATE OF size ON cache BEGIN
+    UPDATE cache_stat SET value = value + NEW.size - OLD.size WHERE name = 'bytes';
+END;
+CREATE TRIGGER IF NOT EXISTS cache_delete AFTER DELETE ON cache BEGIN
+    UPDATE cache_stat SET value = value - OLD.size WHERE name = 'bytes';
+    UPDATE cache_stat SET value = value - 1 WHERE name = 'entries';
+    DELETE FROM cache_tag WHERE key = OLD.key;
+END;
+"""
+
+# Keeps IN (...) lists under SQLite's bound-parameter limit.
+BATCH_SIZE = 500
+
+
+def _encode(value):
+    """(stored value, size in bytes)."""
+    if type(value) is int and -2 ** 63 <= value < 2 ** 63:
+        return value, 8
+    data = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+    return data, len(data)
+
+
+def _decode(value):
+    return value if isinstance(value, int) else pickle.loads(value)
+
+
+def _batches(items):
+    items = list(items)
+    for start in range(0, len(items), BATCH_SIZE):
+        yield items[start:start + BATCH_SIZE]
+
+
+class _Store:
+    """
+    One cache file as seen by this process: a connection per thread, and the
+    counters not yet written. Shared by every SQLiteCache instance (Django
+    makes one per thread) with the same LOCATION.
+    """
+
+    def __init__(self, path, mmap_size):
+        self.path = str(path)
+        self.mmap_size = mmap_size
+        self.pid = os.getpid()
+        self.local = threading.local()
+        self.lock = threading.Lock()
+        self.hits = self.misses = 0
+        self.touched = {}
+        self.flush_at = time.monotonic() + FLUSH_INTERVAL
+
+    def connection(self):
+        db = getattr(self.local, 'db', None)
+        if db is None:
+            db = sqlite3.connect(self.path, timeout=20, isolation_level=None, check_same_thread=False)
+            db.executescript(
+                'PRAGMA journal_mode=WAL;'
+                'PRAGMA synchronous=NORMAL;'
+                f'PRAGMA mmap_size={int(self.mmap_size)};'
+            )
+            db.executescript(SCHEMA)
+            self.local.db = db
+        return db
+
+    @contextmanager
+    def write(self):
+        # IMMEDIATE: take the write lock up front, as for the main database.
+        db = self.connection()
+        db.execute('BEGIN IMMEDIATE')
+        try:
+            yield db
+        except BaseException:
+            db.execute('ROLLBACK')
+            raise
+        db.execute('COMMIT')
+
+    def record(self, hits=0, misses=0, touched=()):
+        now = time.time()
+        with self.lock:
+            self.hits += hits
+            self.misses += misses
+            for key in touched:
+                self.touched[key] = now
+            due = time.monotonic() >= self.flush_at
+        if due:
+            self.flush()
+
+    def flush(self):
+        """Write the pending counters and access times, and drop expired entries."""
+        with self.lock:
+            hits, misses, touched = self.hits, self.misses, self.touched
+            self.hits = self.misses = 0
+            self.touched = {}
+            self.flush_at = time.monotonic() + FLUSH_INTERVAL
+        try:
+            with self.write() as db:
+                db.executemany('UPDATE cache SET accessed = ? WHERE key = ?',
+                               [(accessed, key) for key, accessed in touched.items()])
+                db.executemany("UPDATE cache_stat SET value = value + ? WHERE name = ?",
+                               [(hits, 'hits'), (misses, 'misses')])
+                db.execute('DELETE FROM cache WHERE expires <= ?', (time.time(),))
+        except sqlite3.OperationalError:
+            # Statistics only; not worth failing the request that triggered it.
+            logger.warning("Could not write cache statistics to %s", self.path, exc_info=True)
+
+
+_stores = {}
+_stores_lock = threading.Lock()
+
+
+def _get_store(path, mmap_size):
+    with _stores_lock:
+        store = _stores.get(str(path))
+        # Never reuse the connections of the process we were forked from.
+        if store is None or store.pid != os.getpid():
+            store = _stores[str(path)] = _Store(path, mmap_size)
+        return store
+
+
+class SQLiteCache(BaseCache):
+    def __init__(self, location, params):
+        super().__init__(params)
+        options = params.get('OPTIONS', {})
+        self._path = location
+        self._mmap_size = options.get('MMAP_SIZE', DEFAULT_MMAP_SIZE)
+        self._max_bytes = int(options.get('MAX_BYTES', DEFAULT_MAX_BYTES))
+        self._max_entries = int(options.get('MAX_ENTRIES', DEFAULT_MAX_ENTRIES))
+
+    @property
+    def _store(self):
+        return _get_store(self._path, self._mmap_size)
+
+    def _db(self):
+        return self._store.connection()
+
+    # --- Reads ---
+
+    def get(self, key, default=None, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        row = self._db().execute(
+            'SELECT value FROM cache WHERE key = ? AND (expires IS NULL OR expires > ?)', (key, time.time()),
+        ).fetchone()
+        if row is None:
+            self._store.record(misses=1)
+            return default
+        self._store.record(hits=1, touched=(key,))
+        return _decode(row[0])
+
+    def get_many(self, keys, version=None):
+        keys = {self.make_and_validate_key(key, version=version): key for key in keys}
+        found = {}
+        for batch in _batches(keys):
+            found.update(self._db().execute(
+                f"SELECT key, value FROM cache WHERE key IN ({', '.join('?' * len(batch))})"
+                f" AND (expires IS NULL OR expires > ?)",
+                (*batch, time.time()),
+            ))
+        self._store.record(hits=len(found), misses=len(keys) - len(found), touched=found)
+        return {keys[key]: _decode(value) for key, value in found.items()}
+
+    def has_key(self, key, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        return self._db().execute(
+            'SELECT 1 FROM cache WHERE key = ? AND (expires IS NULL OR expires > ?)', (key, time.time()),
+        ).fetchone() is not None
+
+    # --- Writes ---
+
+    def _put(self, db, key, value, timeout, tags=(), only_if_missing=False):
+        """Store one entry inside a write transaction; False if `only_if_missing` and it exists."""
+        now = time.time()
+        data, size = _encode(value)
+        cursor = db.execute(
+            'INSERT INTO cache (key, value, size, expires, accessed) VALUES (?, ?, ?, ?, ?)'
+            ' ON CONFLICT (key) DO UPDATE SET value = excluded.value, size = excluded.size,'
+            ' expires = excluded.expires, accessed = excluded.accessed'
+            + (' WHERE cache.expires <= excluded.accessed' if only_if_missing else ''),
+            (key, data, size + len(key), self.get_backend_timeout(timeout), now),
+        )
+        if not cursor.rowcount:
+            return False
+        db.execute('DELETE FROM cache_tag WHERE key = ?', (key,))
+        db.executemany('INSERT INTO cache_tag (tag, key) VALUES (?, ?)', [(tag, key) for tag in set(tags)])
+        return True
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None, tags=()):
+        key = self.make_and_validate_key(key, version=version)
+        with self._store.write() as db:
+            self._put(db, key, value, timeout, tags)
+            self._cull(db)
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None, tags=()):
+        key = self.make_and_validate_key(key, version=version)
+        with self._store.write() as db:
+            added = self._put(db, key, value, timeout, tags, only_if_missing=True)
+            if added:
+                self._cull(db)
+        return added
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None, tags=()):
+        with self._store.write() as db:
+            for key, value in data.items():
+                self._put(db, self.make_and_validate_key(key, version=version), value, timeout, tags)
+            self._cull(db)
+        return []
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        cursor = self._db().execute(
+            'UPDATE cache SET expires = ? WHERE key = ? AND (expires IS NULL OR expires > ?)',
+            (self.get_backend_timeout(timeout), key, time.time()),
+        )
+        return cursor.rowcount > 0
+
+    def incr(self, key, delta=1, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        row = self._db().execute(
+            "UPDATE cache SET value = value + ?, accessed = ? WHERE key = ?"
+            " AND (expires IS NULL OR expires > ?) AND typeof(value) = 'integer' RETURNING value",
+            (delta, time.time(), key, time.time()),
+        ).fetchone()
+        if row is None:
+            raise ValueError("Key '%s' not found" % key)
+        return row[0]
+
+    def delete(self, key, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        return self._db().execute('DELETE FROM cache WHERE key = ?', (key,)).rowcount > 0
+
+    def delete_many(self, keys, version=None):
+        keys = [self.make_and_validate_key(key, version=version) for key in keys]
+        with self._store.write() as db:
+            for batch in _batches(keys):
+                db.execute(f"DELETE FROM cache WHERE key IN ({', '.join('?' * len(batch))})", batch)
+
+    def invalidate_tags(self, *tags):
+        """Delete every entry set with any of `tags`; returns how many."""
+        with self._store.write() as db:
+            return db.execute(
+                f"DELETE FROM cache WHERE key IN (SELECT key FROM cache_tag WHERE tag IN ({', '.join('?' * len(tags))}))",
+                tags,
+            ).rowcount
+
+    def clear(self):
+        with self._store.write() as db:
+            db.execute('DELETE FROM cache')
+
+    # --- Eviction ---
+
+    def _totals(self, db):
+        return dict(db.execute("SELECT name, value FROM cache_stat WHERE name IN ('bytes', 'entries')"))
+
+    def _cull(self, db):
+        totals = self._totals(db)
+        if totals['bytes'] <= self._max_bytes and totals['entries'] <= self._max_entries:
+            return
+        db.execute('DELETE FROM cache WHERE expires <= ?', (time.time(),))
+        totals = self._totals(db)
+        excess_bytes = totals['bytes'] - int(self._max_bytes * CULL_TARGET)
+        excess_entries = totals['entries'] - int(self._max_entries * CULL_TARGET)
+        victims = []
+        oldest_first = db.execute('SELECT key, size FROM cache ORDER BY accessed')
+        for key, size in oldest_first:
+            if excess_bytes <= 0 and excess_entries <= 0:
+                break
+            victims.append(key)
+            excess_bytes -= size
+            excess_entries -= 1
+        oldest_first.close()
+        for batch in _batches(victims):
+            db.execute(f"DELETE FROM cache WHERE key IN ({', '.join('?' * len(batch))})", batch)
+        db.execute("UPDATE cache_stat SET value = value + ? WHERE name = 'evictions'", (len(victims),))
+
+    # --- Statistics ---
+
+    def stats(self):
+        """Totals for the dashboard, counted across every process using the cache."""
+        self._store.flush()
+        stats = dict(self._db().execute('SELECT name, value FROM cache_stat'))
+        lookups = stats['hits'] + stats['misses']
+        stats['hit_rate'] = stats['hits'] / lookups if lookups else None
+        stats['max_bytes'] = self._max_bytes
+        stats['max_entries'] = self._max_entries
+        return stats
+
+    # --- Async ---
+    # BaseCache runs these with thread_sensitive=True, i.e. one at a time on
+    # a single thread. Every thread has its own connection here, so they run
+    # in the default pool instead and concurrent async views don't queue.
+
+    async def aget(self, key, default=None, version=None):
+        return await sync_to_async(self.get, thread_sensitive=False)(key, default, version)
+
+    async def aget_many(self, keys, version=None):
+        return await sync_to_async(self.get_many, thread_sensitive=False)(keys, version)
+
+    async def ahas_key(self, key, version=None):
+        return await sync_to_async(self.has_key, thread_sensitive=False)(key, version)
+
+    async def aset(self, key, value, timeout=DEFAULT_TIMEOUT, version=None, tags=()):
+        return await sync_to_async(self.set, thread_sensitive=False)(key, value, timeout, version, tags)
+
+    async def aadd(self, key, value, timeout=DEFAULT_TIMEOUT, version=None, tags=()):
+        return await sync_to_async(self.add, thread_sensitive=False)(key, value, timeout, version, tags)
+
+    async def aset_many(self, data, timeout=DEFAULT_TIMEOUT, version=None, tags=()):
+        return await sync_to_async(self.set_many, thread_sensitive=False)(data, timeout, version, tags)
+
+    async def atouch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        return await sync_to_async(self.touch, thread_sensitive=False)(key, timeout, version)
+
+    async def aincr(self, key, delta=1, version=None):
+        return await sync_to_async(self.incr, thread_sensitive=False)(key, delta, version)
+
+    async def adelete(self, key, version=None):
+        return await sync_to_async(self.delete, thread_sensitive=False)(key, version)
+
+    async def adelete_many(self, keys, version=None):
+        return await sync_to_async(self.delete_many, thread_sensitive=False)(keys, version)
+
+    async def ainvalidate_tags(self, *tags):
+        return await sync_to_async(self.invalidate_tags, thread_sensitive=False)(*tags)
+
+    async def aclear(self):
+        return await sync_to_async(self.clear, thread_sensitive=False)()
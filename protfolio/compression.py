@@ -0,0 +1,124 @@
+import re
+
+from django.conf import settings
+from django.utils.cache import patch_vary_headers
+from django.utils.deprecation import MiddlewareMixin
+from django.utils.text import compress_string
+
+try:
+    import brotli
+except ImportError:  # Optional: gzip only without it.
+    brotli = None
+
+HTML_MINIFY = getattr(settings, 'HTML_MINIFY', True)
+# Not worth compressing below this many bytes (as GZipMiddleware).
+MIN_COMPRESS_SIZE = 200
+COMPRESSIBLE_TYPES = ('text/', 'application/json', 'application/javascript', 'image/svg+xml')
+# Random bytes in the gzip header against BREACH, as GZipMiddleware does.
+GZIP_RANDOM_BYTES = 100
+# Brotli quality: the highest for responses compressed once and cached, a
+# cheap one for responses compressed on every request.
+BROTLI_QUALITY_CACHED = 11
+BROTLI_QUALITY = 4
+
+# Elements whose whitespace is significant or not HTML.
+_PRESERVED = re.compile(r'(<(pre|textarea|script|style)\b.*?</\2\s*>)', re.IGNORECASE | re.DOTALL)
+# Conditional comments (<!--[if IE]>) are kept.
+_COMMENT = re.compile(r'<!--(?!\[if).*?-->', re.DOTALL)
+_WHITESPACE = re.compile(r'\s+')
+_REFUSED = re.compile(r'q=0(\.0*)?')
+
+
+def _collapse(match):
+    return '\n' if '\n' in match.group() else ' '
+
+
+def minify_html(html):
+    """
+    Drop comments and collapse runs of whitespace to one space (or newline)
+    outside <pre>, <textarea>, <script> and <style>. The browser renders the
+    result like the original; only attribute values that depend on repeated
+    spaces would change, and the templates have none.
+    """
+    parts = _PRESERVED.split(html)
+    # split() with two groups yields: text, whole element, tag name, text, ...
+    for index in range(0, len(parts), 3):
+        parts[index] = _WHITESPACE.sub(_collapse, _COMMENT.sub('', parts[index]))
+    return ''.join(part for index, part in enumerate(parts) if index % 3 != 2)
+
+
+def _compressible(response):
+    return (
+        not response.streaming
+        and not response.has_header('Content-Encoding')
+        and response.get('Content-Type', '').startswith(COMPRESSIBLE_TYPES)
+    )
+
+
+def encode(data, cached=False):
+    """{content-coding: bytes} for every coding smaller than `data`."""
+    encoded = {'gzip': compress_string(data, max_random_bytes=GZIP_RANDOM_BYTES)}
+    if brotli is not None:
+        encoded['br'] = brotli.compress(data, quality=BROTLI_QUALITY_CACHED if cached else BROTLI_QUALITY)
+    return {coding: body for coding, body in encoded.items() if len(body) < len(data)}
+
+
+def prepare(response, cached=False):
+    """
+    Minify an HTML response and attach its compressed variants as
+    `response.encoded`, plus `response.original_size` for the metrics.
+    anonymous_page_cache calls this before storing a page, so cache hits
+    are served without compressing anything.
+    """
+    if hasattr(response, 'encoded') or not _compressible(response):
+        return response
+    response.original_size = len(response.content)
+    if HTML_MINIFY and response['Content-Type'].startswith('text/html'):
+        response.content = minify_html(response.content.decode(response.charset)).encode(response.charset)
+        if response.has_header('Content-Length'):
+            response.headers['Content-Length'] = str(len(response.content))
+    response.encoded = encode(response.content, cached) if len(response.content) >= MIN_COMPRESS_SIZE else {}
+    return response
+
+
+def _accepted(header):
+    codings = set()
+    for item in header.split(','):
+        coding, _, params = item.strip().partition(';')
+        if not _REFUSED.fullmatch(params.replace(' ', '')):
+            codings.add(coding.strip().lower())
+    return codings
+
+
+def negotiate(request, encoded):
+    """The best of the `encoded` variants the client accepts, or None for identity."""
+    accepted = _accepted(request.META.get('HTTP_ACCEPT_ENCODING', ''))
+    for coding in ('br', 'gzip'):
+        if coding in encoded and (coding in accepted or '*' in accepted):
+            return coding
+    return None
+
+
+class CompressionMiddleware(MiddlewareMixin):
+    """
+    Minify HTML and send it brotli-compressed if the client accepts that,
+    else gzip. Replaces GZipMiddleware and goes in the same place: above
+    every middleware that reads or changes the body.
+    """
+
+    def process_response(self, request, response):
+        prepare(response)
+        encoded = getattr(response, 'encoded', None)
+        if not encoded:
+            return response
+        patch_vary_headers(response, ('Accept-Encoding',))
+        coding = negotiate(request, encoded)
+        if coding is None:
+            return response
+        response.content = encoded[coding]
+        response.headers['Content-Length'] = str(len(response.content))
+        response.headers['Content-Encoding'] = coding
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            response.headers['ETag'] = 'W/' + etag
+        return response
@@ -0,0 +1,124 @@
+import io
+import os
+import re
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from PIL import Image, ImageOps
+
+# Widths (px) of the resized copies written next to every uploaded image.
+DERIVATIVE_WIDTHS = getattr(settings, 'IMAGE_DERIVATIVE_WIDTHS', (320, 640, 960, 1280))
+WEBP_QUALITY = 80
+JPEG_QUALITY = 82
+
+# Pillow format name for each extension we keep as a fallback format.
+FALLBACK_FORMATS = {
+    '.jpg': 'JPEG',
+    '.jpeg': 'JPEG',
+    '.png': 'PNG',
+    '.webp': 'WEBP',
+}
+
+
+def derivative_name(name, width, webp=False):
+    """
+    'blog_images/cover.png', 640 -> 'blog_images/cover.w640.png'
+    (or 'blog_images/cover.w640.webp' with webp=True).
+    """
+    root, ext = os.path.splitext(name)
+    if webp or ext.lower() not in FALLBACK_FORMATS:
+        ext = '.webp'
+    return f'{root}.w{width}{ext}'
+
+
+def original_names(name):
+    """
+    Names the derivative `name` may have been made from, most likely first:
+    'blog_images/cover.w640.webp' -> ['blog_images/cover.webp', 'blog_images/cover.jpg', ...].
+    Empty if `name` is not a derivative name.
+    """
+    match = re.search(r'\.w(\d+)(\.[A-Za-z0-9]+)$', name)
+    if match is None or int(match.group(1)) not in DERIVATIVE_WIDTHS:
+        return []
+    root = name[:match.start()]
+    extensions = dict.fromkeys([match.group(2), *FALLBACK_FORMATS])
+    return [f'{root}{ext}' for ext in extensions]
+
+
+def derivative_names(name):
+    """Every derivative name for `name`, fallback format first then WebP."""
+    names = []
+    for width in DERIVATIVE_WIDTHS:
+        names.append(derivative_name(name, width))
+        names.append(derivative_name(name, width, webp=True))
+    return names
+
+
+def has_derivatives(name, storage=default_storage):
+    return storage.exists(derivative_name(name, DERIVATIVE_WIDTHS[-1], webp=True))
+
+
+def _encode(image, fmt):
+    buffer = io.BytesIO()
+    if fmt == 'JPEG':
+        image.convert('RGB').save(buffer, fmt, quality=JPEG_QUALITY, optimize=True, progressive=True)
+    elif fmt == 'PNG':
+        image.save(buffer, fmt, optimize=True)
+    else:
+        image.save(buffer, 'WEBP', quality=WEBP_QUALITY, method=6)
+    return buffer.getvalue()
+
+
+def _write(storage, name, data):
+    # Storage.save() would pick a new name rather than overwrite.
+    if storage.exists(name):
+        storage.delete(name)
+    # ContentAddressedStorage.save() would store the derivative as a blob.
+    save = getattr(storage, 'save_derivative', storage.save)
+    save(name, ContentFile(data))
+
+
+def generate_derivatives(name, storage=default_storage, force=False):
+    """
+    Write the resized and WebP copies of the stored image `name`.
+
+    Images are never upscaled: a width larger than the original gets a copy at
+    the original size, so every derivative name always exists once this has
+    run and templates can build srcset without touching storage.
+    Returns the number of files written.
+    """
+    if not name or (not force and has_derivatives(name, storage)):
+        return 0
+
+    with storage.open(name, 'rb') as source:
+        original = Image.open(source)
+        original = ImageOps.exif_transpose(original)
+        original.load()
+
+    if original.mode not in ('RGB', 'RGBA'):
+        original = original.convert('RGBA' if original.has_transparency_data else 'RGB')
+
+    ext = os.path.splitext(name)[1].lower()
+    fallback_format = FALLBACK_FORMATS.get(ext, 'WEBP')
+    written = 0
+    for width in DERIVATIVE_WIDTHS:
+        if width < original.width:
+            height = round(original.height * width / original.width)
+            resized = original.resize((width, height), Image.Resampling.LANCZOS)
+        else:
+            resized = original
+        fallback_name = derivative_name(name, width)
+        webp_name = derivative_name(name, width, webp=True)
+        if fallback_name != webp_name:
+            _write(storage, fallback_name, _encode(resized, fallback_format))
+            written += 1
+        _write(storage, webp_name, _encode(resized, 'WEBP'))
+        written += 1
+    return written
+
+
+def delete_derivatives(name, storage=default_storage):
+    for derivative in derivative_names(name):
+        if storage.exists(derivative):
+            storage.delete(derivative)
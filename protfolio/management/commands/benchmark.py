@@ -0,0 +1,123 @@
+import json
+import tempfile
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, connections
+from django.test.utils import override_settings
+
+from protfolio.benchmark import dataset, runner
+from protfolio.models import BlogPost
+from protfolio.routers import REPLICA
+
+
+class Command(BaseCommand):
+    help = (
+        "Seed a synthetic dataset into a separate benchmark database, drive every "
+        "route with concurrent clients and compare against a stored baseline."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--database-file', default=str(Path(settings.BASE_DIR) / 'benchmark.sqlite3'),
+                            help="SQLite file holding the benchmark dataset (kept between runs).")
+        parser.add_argument('--reseed', action='store_true',
+                            help="Recreate the benchmark database and seed it again.")
+        parser.add_argument('--scale', type=float, default=1.0,
+                            help="Multiply the default dataset sizes, e.g. 0.01 for a quick run.")
+        parser.add_argument('--requests', type=int, default=200, help="Measured requests per route.")
+        parser.add_argument('--workers', type=int, default=4, help="Concurrent clients per route.")
+        parser.add_argument('--warmup', type=int, default=5, help="Unmeasured requests per route.")
+        parser.add_argument('--no-cache', action='store_true',
+                            help="Run with a dummy cache so every request renders (measures views, not the page cache).")
+        parser.add_argument('--route', action='append', dest='routes', metavar='NAME',
+                            help="Only benchmark this URL name (repeatable).")
+        parser.add_argument('--baseline', default=str(Path(settings.BASE_DIR) / 'benchmark-baseline.json'),
+                            help="Baseline JSON to compare against.")
+        parser.add_argument('--save-baseline', action='store_true',
+                            help="Write the results to --baseline instead of comparing.")
+        parser.add_argument('--tolerance', type=float, default=0.2,
+                            help="Allowed latency/throughput/memory drift before failing (0.2 = 20%%).")
+        parser.add_argument('--output', help="Also write the results as JSON to this path.")
+
+    def handle(self, *args, **options):
+        if connection.vendor == 'sqlite':
+            connection.settings_dict['TEST']['NAME'] = options['database_file']
+        old_name = connection.creation.create_test_db(
+            verbosity=0, autoclobber=True, serialize=False, keepdb=not options['reseed'],
+        )
+        # Point the read replica at the benchmark database too, never at the
+        # real snapshot.
+        replica = connections.settings.get(REPLICA)
+        if replica:
+            old_replica_name, replica['NAME'] = replica['NAME'], connection.settings_dict['NAME']
+        # A cache and MEDIA_ROOT of its own as well, empty on every run: the
+        # default ones are shared with the real site, which must never be fed
+        # synthetic pages or images.
+        scratch_dir = tempfile.TemporaryDirectory()
+        bench_cache = {'default': {
+            'BACKEND': 'protfolio.cache_backend.SQLiteCache',
+            'LOCATION': str(Path(scratch_dir.name) / 'cache.sqlite3'),
+        }}
+        bench_media = Path(scratch_dir.name) / 'media'
+        try:
+            with override_settings(CACHES=bench_cache, MEDIA_ROOT=str(bench_media)):
+                if not BlogPost.objects.exists():
+                    self.stdout.write("Seeding benchmark dataset...")
+                    dataset.seed(dataset.scaled_sizes(options['scale']), log=self.stdout.write)
+                else:
+                    # The kept rows all point at the placeholder blob.
+                    dataset.placeholder_image()
+                results = self.run_benchmark(options)
+        finally:
+            scratch_dir.cleanup()
+            connection.creation.destroy_test_db(old_name, verbosity=0, keepdb=True)
+            if replica:
+                replica['NAME'] = old_replica_name
+
+        if options['output']:
+            Path(options['output']).write_text(json.dumps(results, indent=2))
+
+        baseline_path = Path(options['baseline'])
+        if options['save_baseline']:
+            baseline_path.write_text(json.dumps(results, indent=2))
+            self.stdout.write(self.style.SUCCESS(f"Baseline written to {baseline_path}"))
+            return
+        if not baseline_path.exists():
+            self.stdout.write(f"No baseline at {baseline_path}; run with --save-baseline to create one.")
+            return
+
+        baseline = json.loads(baseline_path.read_text())
+        if baseline.get('dataset') != results['dataset']:
+            raise CommandError(
+                f"Baseline was recorded on a different dataset ({baseline.get('dataset')}); "
+                "reseed with the same --scale or save a new baseline."
+            )
+        if baseline.get('cache') != results['cache']:
+            raise CommandError("Baseline and this run differ in --no-cache; compare like with like.")
+        regressions = runner.compare(results, baseline, options['tolerance'])
+        if regressions:
+            for line in regressions:
+                self.stderr.write(line)
+            raise CommandError(f"{len(regressions)} regression(s) against {baseline_path}")
+        self.stdout.write(self.style.SUCCESS(f"No regressions against {baseline_path}"))
+
+    def run_benchmark(self, options):
+        routes = runner.discover_routes()
+        if options['routes']:
+            routes = [route for route in routes if route[0] in options['routes']]
+
+        self.stdout.write(f"{'route':<22} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'req/s':>9} {'qry':>5}  url")
+        # Production-like settings: no debug query log, test client host allowed.
+        overrides = {'DEBUG': False, 'ALLOWED_HOSTS': ['testserver']}
+        if options['no_cache']:
+            overrides['CACHES'] = {'default': {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'}}
+        with override_settings(**overrides):
+            results = runner.run(
+                routes, requests=options['requests'], workers=options['workers'],
+                warmup=options['warmup'], log=self.stdout.write,
+            )
+        results['dataset'] = dataset.counts()
+        results['cache'] = not options['no_cache']
+        self.stdout.write(f"Peak RSS: {results['peak_rss_kb']} KB")
+        return results
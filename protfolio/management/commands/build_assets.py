@@ -0,0 +1,52 @@
+import subprocess
+from pathlib import Path
+
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+
+from protfolio import assets
+
+
+class Command(BaseCommand):
+    help = (
+        "Compile the Tailwind CSS used by the templates into one purged stylesheet, "
+        "then collect static files with fingerprinted names and gzip/brotli variants."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--fetch', action='store_true',
+                            help="Download missing vendored CSS/JS/fonts first (needs network; commit the result).")
+        parser.add_argument('--tailwind', default=assets.TAILWIND_CLI,
+                            help="Path of the standalone Tailwind CLI.")
+        parser.add_argument('--no-collect', action='store_true',
+                            help="Only compile the CSS; skip collectstatic.")
+
+    def handle(self, *args, **options):
+        if options['fetch']:
+            assets.fetch_vendor_files(log=self.stdout.write)
+        missing = assets.missing_vendor_files()
+        if missing:
+            raise CommandError(f"Vendored files missing ({', '.join(missing)}); run with --fetch once.")
+
+        command = assets.tailwind_command(options['tailwind'])
+        if command is None:
+            raise CommandError(
+                f"Tailwind CLI {options['tailwind']!r} not found. Download the standalone binary from "
+                "https://github.com/tailwindlabs/tailwindcss/releases and pass --tailwind or set TAILWIND_CLI."
+            )
+        try:
+            output = assets.build_css(command)
+        except subprocess.CalledProcessError as error:
+            raise CommandError(f"Tailwind failed with exit status {error.returncode}")
+        self.stdout.write(f"Compiled {assets.APP_CSS}: {output.stat().st_size / 1024:.1f} KB")
+
+        if options['no_collect']:
+            return
+        call_command('collectstatic', interactive=False, verbosity=options['verbosity'])
+        collected = Path(staticfiles_storage.path(staticfiles_storage.stored_name(assets.APP_CSS)))
+        sizes = [f"{path.name} {path.stat().st_size / 1024:.1f} KB"
+                 for path in (collected, collected.with_name(collected.name + '.gz'),
+                              collected.with_name(collected.name + '.br'))
+                 if path.exists()]
+        self.stdout.write(self.style.SUCCESS(f"Static files collected: {', '.join(sizes)}"))
@@ -0,0 +1,61 @@
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from protfolio.images import generate_derivatives
+from protfolio.models import Service, BlogPost, Developer, Client
+
+# Workers are forked, so they start with Django set up and the apps loaded.
+# (Spawned ones would import this module, and the models, before setup.)
+_fork = multiprocessing.get_context('fork')
+
+IMAGE_FIELDS = (
+    (Service, 'image'),
+    (BlogPost, 'image'),
+    (Developer, 'image'),
+    (Client, 'logo'),
+)
+
+
+def _build(name, force):
+    return generate_derivatives(name, force=force)
+
+
+class Command(BaseCommand):
+    help = "Generate resized and WebP derivatives for every stored image."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=None,
+                            help="Size of the process pool (default: number of CPUs).")
+        parser.add_argument('--force', action='store_true',
+                            help="Rebuild derivatives that already exist.")
+
+    def handle(self, *args, **options):
+        names = set()
+        for model, field in IMAGE_FIELDS:
+            names.update(
+                model.objects.exclude(**{field: ''}).exclude(**{f'{field}__isnull': True})
+                .values_list(field, flat=True)
+            )
+        if not names:
+            self.stdout.write("No images to process.")
+            return
+
+        # Forked workers must not share the parent's database connection.
+        connections.close_all()
+
+        written = failed = 0
+        with ProcessPoolExecutor(max_workers=options['workers'], mp_context=_fork) as pool:
+            futures = {pool.submit(_build, name, options['force']): name for name in sorted(names)}
+            for future in as_completed(futures):
+                try:
+                    written += future.result()
+                except Exception as exc:
+                    failed += 1
+                    self.stderr.write(f"{futures[future]}: {exc}")
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Processed {len(names)} images: {written} derivatives written, {failed} failed."
+        ))
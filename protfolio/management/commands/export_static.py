@@ -0,0 +1,80 @@
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.utils import timezone
+
+from protfolio import static_export
+
+# Workers are forked, so they start with Django set up and the apps loaded.
+# (Spawned ones would import this module, and the models, before setup.)
+_fork = multiprocessing.get_context('fork')
+
+
+def _export(groups, root):
+    return static_export.export_pages(groups, root)
+
+
+class Command(BaseCommand):
+    help = (
+        "Render the public pages to static HTML for nginx. After the first full "
+        "export only pages whose content changed since the last run are rebuilt."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--output', default=str(static_export.EXPORT_ROOT),
+                            help="Directory to write the site to.")
+        parser.add_argument('--full', action='store_true',
+                            help="Re-render every page, not just the changed ones.")
+        parser.add_argument('--workers', type=int, default=None,
+                            help="Size of the process pool (default: number of CPUs); 1 renders in this process.")
+        parser.add_argument('--no-assets', action='store_true',
+                            help="Skip copying static and media files.")
+
+    def handle(self, *args, **options):
+        root = Path(options['output'])
+        started_at = timezone.now()
+        changes = static_export.pending_changes()
+        if options['full'] or static_export.read_manifest(root) is None:
+            groups = static_export.all_groups() | set(changes)
+        else:
+            groups = set(changes)
+
+        written = removed = 0
+        failed = []
+        for chunk_written, chunk_removed, chunk_failed in self.export(sorted(groups), root, options['workers']):
+            written += chunk_written
+            removed += chunk_removed
+            failed += chunk_failed
+
+        copied = 0 if options['no_assets'] else static_export.sync_assets(root)
+        static_export.write_manifest(root, exported_at=started_at.isoformat())
+        static_export.clear_changes({g: t for g, t in changes.items() if g not in failed})
+        # Failed pages stay (or become) pending so the next run retries them.
+        static_export.mark_pending(failed)
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Exported {len(groups)} pages to {root}: {written} written, {removed} removed, "
+            f"{len(failed)} failed; {copied} asset files copied."
+        ))
+        if failed:
+            raise CommandError(f"Could not render: {', '.join(sorted(failed))}")
+
+    def export(self, groups, root, workers):
+        """Yield export_pages() results for chunks of `groups`."""
+        if not groups:
+            return
+        if workers == 1:
+            # A handful of changed pages isn't worth starting a pool for.
+            yield _export(groups, root)
+            return
+        chunk_size = max(1, len(groups) // ((workers or 4) * 4))
+        chunks = [groups[i:i + chunk_size] for i in range(0, len(groups), chunk_size)]
+        # Forked workers must not share the parent's database connection.
+        connections.close_all()
+        with ProcessPoolExecutor(max_workers=workers, mp_context=_fork) as pool:
+            futures = [pool.submit(_export, chunk, root) for chunk in chunks]
+            for future in as_completed(futures):
+                yield future.result()
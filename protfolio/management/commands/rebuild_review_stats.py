@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from protfolio.cache import PAGE_DEPENDENCIES, invalidate_groups
+from protfolio.models import Review, ReviewStats
+from protfolio.static_export import mark_pending
+
+
+class Command(BaseCommand):
+    help = "Recompute the ReviewStats summary row from the Review table."
+
+    def handle(self, *args, **options):
+        stats = ReviewStats.rebuild()
+        # The pages show the stats; no Review signal tells them they changed.
+        groups = PAGE_DEPENDENCIES[Review]
+        invalidate_groups(groups)
+        mark_pending(groups)
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt review stats: {stats}"))
@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from protfolio import search
+
+
+class Command(BaseCommand):
+    help = "Rebuild the full-text search index for blog posts, services and developers."
+
+    def handle(self, *args, **options):
+        if not search.available():
+            raise CommandError("Full-text search needs the SQLite database backend (FTS5).")
+        count = search.rebuild()
+        self.stdout.write(self.style.SUCCESS(f"Indexed {count} documents."))
@@ -0,0 +1,48 @@
+import os
+import sqlite3
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+from protfolio.routers import REPLICA
+
+
+class Command(BaseCommand):
+    help = "Copy the primary SQLite database into the read replica snapshot."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--interval', type=float, default=None,
+                            help="Keep running and refresh every INTERVAL seconds.")
+
+    def handle(self, *args, **options):
+        if REPLICA not in connections.settings:
+            raise CommandError(f"No '{REPLICA}' database configured.")
+        primary = connections['default'].settings_dict
+        replica = connections[REPLICA].settings_dict
+        if primary['ENGINE'] != 'django.db.backends.sqlite3' or replica['ENGINE'] != primary['ENGINE']:
+            raise CommandError("refresh_replica only supports SQLite databases.")
+
+        while True:
+            elapsed = self.refresh(str(primary['NAME']), str(replica['NAME']))
+            self.stdout.write(self.style.SUCCESS(f"Replica refreshed in {elapsed:.2f}s"))
+            if options['interval'] is None:
+                return
+            time.sleep(options['interval'])
+
+    def refresh(self, primary_name, replica_name):
+        started = time.time()
+        source = sqlite3.connect(primary_name)
+        target = sqlite3.connect(replica_name, timeout=30)
+        try:
+            # The backup copies one consistent snapshot of the primary and
+            # writes it into the replica in place, so open (persistent)
+            # replica connections keep working and see the new data.
+            source.backup(target)
+        finally:
+            target.close()
+            source.close()
+        # The routers compare page changes against this time, so record when
+        # the snapshot was taken rather than when the copy finished.
+        os.utime(replica_name, (started, started))
+        return time.time() - started
@@ -0,0 +1,43 @@
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from protfolio.cache import PAGE_DEPENDENCIES, bump_fragment_version, invalidate_groups
+from protfolio.models import BlogPost, RENDERED_CONTENT_FIELDS
+from protfolio.static_export import mark_pending
+
+BATCH_SIZE = 500
+
+
+class Command(BaseCommand):
+    help = "Recompute the stored excerpt, HTML, word count and reading time of every blog post."
+
+    def handle(self, *args, **options):
+        batch = []
+        total = 0
+        posts = BlogPost.objects.only('content', *RENDERED_CONTENT_FIELDS)
+        for post in posts.iterator(chunk_size=BATCH_SIZE):
+            before = [getattr(post, field) for field in RENDERED_CONTENT_FIELDS]
+            post.render_content()
+            if [getattr(post, field) for field in RENDERED_CONTENT_FIELDS] == before:
+                continue
+            batch.append(post)
+            if len(batch) == BATCH_SIZE:
+                total += self.update(batch)
+                batch = []
+        if batch:
+            total += self.update(batch)
+        self.stdout.write(self.style.SUCCESS(f"Rendered {total} blog posts."))
+
+    def update(self, posts):
+        # bulk_update() sends no signals: invalidate what a save() would.
+        # updated_at changes the pages' ETags and Last-Modified.
+        now = timezone.now()
+        for post in posts:
+            post.updated_at = now
+        updated = BlogPost.objects.bulk_update(posts, [*RENDERED_CONTENT_FIELDS, 'updated_at'])
+        groups = list(dict.fromkeys(group.format(pk=post.pk) for post in posts for group in PAGE_DEPENDENCIES[BlogPost]))
+        for post in posts:
+            bump_fragment_version(BlogPost, post)
+        invalidate_groups(groups)
+        mark_pending(groups)
+        return updated
@@ -0,0 +1,65 @@
+import multiprocessing
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from protfolio import tasks
+
+# How often (seconds) the parent requeues stalled tasks and prunes old ones.
+MAINTENANCE_INTERVAL = 60
+
+# Workers are forked, so they start with Django set up and the apps loaded.
+# (Spawned ones would import this module, and the models, before setup.)
+_fork = multiprocessing.get_context('fork')
+
+
+def _work(poll, once):
+    try:
+        tasks.work(poll=poll, once=once)
+    except KeyboardInterrupt:
+        pass
+
+
+class Command(BaseCommand):
+    help = "Run queued background tasks (image derivatives, cache warming) in a pool of worker processes."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=2, help="Number of worker processes.")
+        parser.add_argument('--poll', type=float, default=1.0,
+                            help="Seconds an idle worker waits before checking the queue again.")
+        parser.add_argument('--once', action='store_true',
+                            help="Exit once no task is due instead of waiting for more.")
+
+    def handle(self, *args, **options):
+        self.maintain()
+        processes = [self.start(options) for _ in range(options['workers'])]
+        try:
+            while True:
+                deadline = time.monotonic() + MAINTENANCE_INTERVAL
+                for process in processes:
+                    process.join(max(0, deadline - time.monotonic()))
+                if options['once'] and not any(process.is_alive() for process in processes):
+                    break
+                self.maintain()
+                if not options['once']:
+                    # Replace workers that died, e.g. killed for running out of memory.
+                    processes = [p if p.is_alive() else self.start(options) for p in processes]
+        except KeyboardInterrupt:
+            # The workers got the same SIGINT and hand their tasks back.
+            for process in processes:
+                process.join()
+        self.stdout.write(self.style.SUCCESS("Task workers stopped."))
+
+    def start(self, options):
+        # Forked workers must not share the parent's database connection.
+        connections.close_all()
+        process = _fork.Process(target=_work, args=(options['poll'], options['once']))
+        process.start()
+        return process
+
+    def maintain(self):
+        stalled, pruned = tasks.recover_stalled(), tasks.prune()
+        if stalled or pruned:
+            self.stdout.write(f"Requeued {stalled} stalled task(s), pruned {pruned} finished task(s).")
+        connections.close_all()
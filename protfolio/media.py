@@ -0,0 +1,181 @@
+import asyncio
+import mimetypes
+import os
+import re
+import stat
+from urllib.parse import quote
+
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.core.handlers.asgi import ASGIRequest
+from django.http import FileResponse, Http404, HttpResponse, StreamingHttpResponse
+from django.utils._os import safe_join
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date, parse_etags
+
+from .images import original_names
+from .storage import BLOB_PREFIX
+
+# Serving MEDIA_ROOT in production. Best is to let the front-end server send
+# the bytes: with MEDIA_ACCEL_REDIRECT (nginx, an `internal` location aliasing
+# MEDIA_ROOT) or MEDIA_X_SENDFILE (Apache mod_xsendfile, lighttpd) Django only
+# checks the request and answers with a header. Without one, files go out
+# through the WSGI server's file_wrapper (os.sendfile under gunicorn) or, under
+# ASGI, in chunks read off the event loop, so a slow download never holds a
+# worker thread or the whole file in memory.
+MEDIA_ACCEL_REDIRECT = getattr(settings, 'MEDIA_ACCEL_REDIRECT', None)
+MEDIA_X_SENDFILE = getattr(settings, 'MEDIA_X_SENDFILE', False)
+CHUNK_SIZE = 64 * 1024
+
+# Blobs and their derivatives are named after their content and never change.
+IMMUTABLE = {'public': True, 'max_age': 365 * 24 * 3600, 'immutable': True}
+# Other uploads keep their name when replaced, so they are revalidated.
+REVALIDATE = {'public': True, 'max_age': 3600}
+# An original standing in for a derivative that is still being built.
+FALLBACK = {'public': True, 'max_age': 60}
+
+_RANGE = re.compile(r'bytes=(\d*)-(\d*)')
+
+
+class _FileRange:
+    """`length` bytes of `file` from `start`, readable by FileResponse and sendfile."""
+
+    def __init__(self, file, start, length):
+        file.seek(start)
+        self.file = file
+        self.remaining = length
+
+    def read(self, size=-1):
+        if size < 0 or size > self.remaining:
+            size = self.remaining
+        data = self.file.read(size)
+        self.remaining -= len(data)
+        return data
+
+    def fileno(self):
+        return self.file.fileno()
+
+    def tell(self):
+        return self.file.tell()
+
+    def close(self):
+        self.file.close()
+
+
+async def _chunks(file, start, length):
+    try:
+        await asyncio.to_thread(file.seek, start)
+        while length > 0:
+            data = await asyncio.to_thread(file.read, min(CHUNK_SIZE, length))
+            if not data:
+                break
+            length -= len(data)
+            yield data
+    finally:
+        file.close()
+
+
+def _locate(path):
+    """(name, absolute path, stat) of the file to send for `path`, or Http404."""
+    try:
+        full = safe_join(settings.MEDIA_ROOT, path)
+        st = os.stat(full)
+    except SuspiciousFileOperation:
+        raise Http404
+    except (FileNotFoundError, NotADirectoryError):
+        pass
+    else:
+        # No directory listings (or 500s from open() on a directory).
+        if not stat.S_ISREG(st.st_mode):
+            raise Http404
+        return path, full, st
+    # A derivative the task queue hasn't written yet: send the original.
+    for name in original_names(path):
+        full = safe_join(settings.MEDIA_ROOT, name)
+        if os.path.isfile(full):
+            return name, full, os.stat(full)
+    raise Http404
+
+
+def _byte_range(request, size, etag):
+    """
+    (start, end) of a single satisfiable `Range`, None to send the whole file
+    (no Range, several ranges, or a stale If-Range), or False if unsatisfiable.
+    """
+    header = request.META.get('HTTP_RANGE', '')
+    match = _RANGE.fullmatch(header.replace(' ', ''))
+    if match is None or match.group() == 'bytes=-':
+        return None
+    if_range = request.META.get('HTTP_IF_RANGE')
+    if if_range and etag not in parse_etags(if_range):
+        return None
+    first, last = match.groups()
+    if not first:
+        # bytes=-N: the last N bytes.
+        start, end = max(size - int(last), 0), size - 1
+    else:
+        start = int(first)
+        end = min(int(last), size - 1) if last else size - 1
+    if start > end or start >= size:
+        return False
+    return start, end
+
+
+def serve(request, path):
+    """Send the file at MEDIA_ROOT/`path`; see the top of this module."""
+    name, full, st = _locate(path)
+    fallback = name != path
+    etag = f'"{st.st_mtime_ns:x}-{st.st_size:x}"'
+    if fallback:
+        cache_control = FALLBACK
+    elif path.startswith(f'{BLOB_PREFIX}/'):
+        cache_control = IMMUTABLE
+    else:
+        cache_control = REVALIDATE
+
+    response = get_conditional_response(request, etag=etag, last_modified=int(st.st_mtime))
+    if response is None:
+        response = _send(request, name, full, st, etag)
+    response.headers['ETag'] = etag
+    response.headers['Last-Modified'] = http_date(st.st_mtime)
+    patch_cache_control(response, **cache_control)
+    return response
+
+
+def _send(request, name, full, st, etag):
+    content_type, encoding = mimetypes.guess_type(full)
+    content_type = content_type or 'application/octet-stream'
+
+    if MEDIA_ACCEL_REDIRECT or MEDIA_X_SENDFILE:
+        # The front-end server handles Range itself.
+        response = HttpResponse(content_type=content_type)
+        if MEDIA_ACCEL_REDIRECT:
+            response.headers['X-Accel-Redirect'] = MEDIA_ACCEL_REDIRECT.rstrip('/') + '/' + quote(name)
+        else:
+            response.headers['X-Sendfile'] = full
+        return response
+
+    size = st.st_size
+    byte_range = _byte_range(request, size, etag)
+    if byte_range is False:
+        response = HttpResponse(status=416)
+        response.headers['Content-Range'] = f'bytes */{size}'
+        return response
+    start, end = byte_range or (0, size - 1)
+    length = end - start + 1
+
+    if request.method == 'HEAD':
+        response = HttpResponse(content_type=content_type)
+    elif isinstance(request, ASGIRequest):
+        response = StreamingHttpResponse(_chunks(open(full, 'rb'), start, length), content_type=content_type)
+    else:
+        response = FileResponse(_FileRange(open(full, 'rb'), start, length), content_type=content_type)
+    if byte_range:
+        response.status_code = 206
+        response.headers['Content-Range'] = f'bytes {start}-{end}/{size}'
+    response.headers['Content-Length'] = str(length)
+    response.headers['Accept-Ranges'] = 'bytes'
+    if encoding:
+        # e.g. an uploaded .svgz: the bytes are already compressed.
+        response.headers['Content-Encoding'] = encoding
+    return response
@@ -0,0 +1,193 @@
+import logging
+import math
+import re
+import threading
+import time
+from collections import Counter, defaultdict, deque
+from contextlib import ExitStack
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.template.backends.django import Template as DjangoTemplate
+
+logger = logging.getLogger(__name__)
+
+METRICS_BUFFER_SIZE = getattr(settings, 'REQUEST_METRICS_BUFFER_SIZE', 5000)
+# A query shape seen this many times in one request is reported as N+1.
+N_PLUS_ONE_THRESHOLD = getattr(settings, 'REQUEST_METRICS_N_PLUS_ONE', 3)
+
+_current = ContextVar('request_metrics', default=None)
+_buffer = deque(maxlen=METRICS_BUFFER_SIZE)
+_buffer_lock = threading.Lock()
+
+
+class RequestRecord:
+    """What one request cost: queries, DB time, template time and response size."""
+
+    def __init__(self):
+        self.view = None
+        self.started = time.perf_counter()
+        self.timestamp = time.time()
+        self.queries = 0
+        self.db_time = 0.0
+        self.template_time = 0.0
+        self.shapes = Counter()
+        self.total_time = 0.0
+        self.size = 0
+        self.original_size = 0
+        self.status = None
+
+    def n_plus_one(self):
+        return [
+            {'query': shape, 'count': count}
+            for shape, count in self.shapes.most_common()
+            if count >= N_PLUS_ONE_THRESHOLD
+        ]
+
+    def as_dict(self):
+        return {
+            'view': self.view,
+            'timestamp': self.timestamp,
+            'status': self.status,
+            'queries': self.queries,
+            'db_ms': round(self.db_time * 1000, 3),
+            'template_ms': round(self.template_time * 1000, 3),
+            'total_ms': round(self.total_time * 1000, 3),
+            'size': self.size,
+            'original_size': self.original_size,
+            'n_plus_one': self.n_plus_one(),
+        }
+
+
+_IN_LIST = re.compile(r'IN \((?:%s, )*%s\)')
+
+def query_shape(sql):
+    """SQL with its parameters stripped, so repeats of one query compare equal."""
+    return _IN_LIST.sub('IN (...)', sql)
+
+
+def _record_query(execute, sql, params, many, context):
+    record = _current.get()
+    if record is None:
+        return execute(sql, params, many, context)
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        record.db_time += time.perf_counter() - start
+        record.queries += 1
+        record.shapes[query_shape(sql)] += 1
+
+
+_original_render = DjangoTemplate.render
+
+def _timed_render(self, context=None, request=None):
+    record = _current.get()
+    if record is None:
+        return _original_render(self, context, request)
+    start = time.perf_counter()
+    try:
+        return _original_render(self, context, request)
+    finally:
+        record.template_time += time.perf_counter() - start
+
+
+class RequestMetricsMiddleware:
+    """
+    Opt-in (REQUEST_METRICS = True) per-view cost accounting.
+
+    Every request is recorded into an in-process ring buffer that the
+    superadmin dashboard rolls up into percentiles. Query shapes repeated
+    N_PLUS_ONE_THRESHOLD times or more within a request are logged as N+1.
+    """
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'REQUEST_METRICS', False):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        # Only the top-level render() of each response goes through the
+        # backend Template, so includes are not counted twice.
+        DjangoTemplate.render = _timed_render
+
+    def __call__(self, request):
+        record = RequestRecord()
+        token = _current.set(record)
+        try:
+            with ExitStack() as stack:
+                for conn in connections.all():
+                    stack.enter_context(conn.execute_wrapper(_record_query))
+                response = self.get_response(request)
+        finally:
+            _current.reset(token)
+
+        record.total_time = time.perf_counter() - record.started
+        match = getattr(request, 'resolver_match', None)
+        record.view = match.view_name if match else request.path
+        record.status = response.status_code
+        if not response.streaming:
+            record.size = len(response.content)
+            # Before CompressionMiddleware minified and compressed it.
+            record.original_size = getattr(response, 'original_size', record.size)
+        store(record)
+
+        suspects = record.n_plus_one()
+        if suspects:
+            logger.warning(
+                "Possible N+1 in %s: %s", record.view,
+                '; '.join(f"{s['count']}x {s['query'][:200]}" for s in suspects),
+            )
+        return response
+
+
+def store(record):
+    with _buffer_lock:
+        _buffer.append(record.as_dict())
+
+
+def recent(limit=None):
+    with _buffer_lock:
+        records = list(_buffer)
+    return records[-limit:] if limit else records
+
+
+def clear():
+    with _buffer_lock:
+        _buffer.clear()
+
+
+def percentile(values, fraction):
+    """Nearest-rank percentile of an already sorted list."""
+    if not values:
+        return 0
+    index = min(len(values) - 1, max(0, math.ceil(fraction * len(values)) - 1))
+    return values[index]
+
+
+def summary():
+    """Per-view rollup of the buffered requests, slowest p95 first."""
+    by_view = defaultdict(list)
+    for record in recent():
+        by_view[record['view']].append(record)
+
+    rows = []
+    for view, records in by_view.items():
+        totals = sorted(r['total_ms'] for r in records)
+        queries = sorted(r['queries'] for r in records)
+        rows.append({
+            'view': view,
+            'requests': len(records),
+            'p50_ms': percentile(totals, 0.50),
+            'p95_ms': percentile(totals, 0.95),
+            'p99_ms': percentile(totals, 0.99),
+            'queries_p50': percentile(queries, 0.50),
+            'queries_max': queries[-1],
+            'db_ms_avg': round(sum(r['db_ms'] for r in records) / len(records), 3),
+            'template_ms_avg': round(sum(r['template_ms'] for r in records) / len(records), 3),
+            'size_avg': round(sum(r['size'] for r in records) / len(records)),
+            'saved_avg': round(sum(r['original_size'] - r['size'] for r in records) / len(records)),
+            'n_plus_one': sum(1 for r in records if r['n_plus_one']),
+        })
+    rows.sort(key=lambda row: row['p95_ms'], reverse=True)
+    return rows
@@ -0,0 +1,34 @@
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+
+from .cache import aget_user_role, get_user_role
+
+
+class UserRoleMiddleware:
+    """
+    Resolve the user's role once per request and attach it as
+    `request.user.role`, so decorators and templates (`user.role`) never
+    have to load the Profile. Must come after AuthenticationMiddleware.
+
+    Under ASGI the user is loaded with the async API and request.user is
+    replaced by the loaded user, so async views can read it without
+    touching the database.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        request.user.role = get_user_role(request.user)
+        return self.get_response(request)
+
+    async def __acall__(self, request):
+        request.user = await request.auser()
+        request.user.role = await aget_user_role(request.user)
+        return await self.get_response(request)
@@ -0,0 +1,35 @@
+# Generated by Django 5.2.18 on 2026-10-18 15:41
+
+from django.conf import settings
+from django.db import migrations, models
+from django.utils.html import strip_tags
+from django.utils.text import Truncator
+
+
+def fill_excerpts(apps, schema_editor):
+    BlogPost = apps.get_model('protfolio', 'BlogPost')
+    posts = list(BlogPost.objects.only('content'))
+    for post in posts:
+        post.excerpt = Truncator(strip_tags(post.content)).words(25)
+    BlogPost.objects.bulk_update(posts, ['excerpt'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('protfolio', '0008_delete_herosection'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='blogpost',
+            name='excerpt',
+            field=models.TextField(blank=True, editable=False),
+        ),
+        migrations.RunPython(fill_excerpts, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='blogpost',
+            index=models.Index(fields=['-created_at', '-id'], name='blogpost_created_id_idx'),
+        ),
+    ]
@@ -0,0 +1,44 @@
+# Generated by Django 5.2.18 on 2026-10-18 15:42
+
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def build_stats(apps, schema_editor):
+    Review = apps.get_model('protfolio', 'Review')
+    ReviewStats = apps.get_model('protfolio', 'ReviewStats')
+    counts = dict(Review.objects.values_list('rating').annotate(n=Count('id')).order_by())
+    values = {f'rating_{r}': counts.get(r, 0) for r in range(1, 6)}
+    ReviewStats.objects.create(
+        pk=1,
+        total=sum(counts.values()),
+        rating_sum=sum(r * n for r, n in counts.items()),
+        **values,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('protfolio', '0009_blogpost_excerpt'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReviewStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('total', models.PositiveIntegerField(default=0)),
+                ('rating_sum', models.PositiveIntegerField(default=0)),
+                ('rating_1', models.PositiveIntegerField(default=0)),
+                ('rating_2', models.PositiveIntegerField(default=0)),
+                ('rating_3', models.PositiveIntegerField(default=0)),
+                ('rating_4', models.PositiveIntegerField(default=0)),
+                ('rating_5', models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                'verbose_name_plural': 'Review stats',
+            },
+        ),
+        migrations.RunPython(build_stats, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,44 @@
+# Generated by Django 5.2.18 on 2026-10-18 15:45
+
+import protfolio.storage
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('protfolio', '0011_review_feed_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MediaBlob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100, unique=True)),
+                ('size', models.PositiveBigIntegerField(default=0)),
+                ('ref_count', models.PositiveIntegerField(default=1)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.AlterField(
+            model_name='blogpost',
+            name='image',
+            field=models.ImageField(storage=protfolio.storage.media_storage, upload_to='blog_images/'),
+        ),
+        migrations.AlterField(
+            model_name='client',
+            name='logo',
+            field=models.ImageField(storage=protfolio.storage.media_storage, upload_to='client_logos/'),
+        ),
+        migrations.AlterField(
+            model_name='developer',
+            name='image',
+            field=models.ImageField(storage=protfolio.storage.media_storage, upload_to='developers/'),
+        ),
+        migrations.AlterField(
+            model_name='service',
+            name='image',
+            field=models.ImageField(blank=True, help_text='Optional image for the service', null=True, storage=protfolio.storage.media_storage, upload_to='service_images/'),
+        ),
+    ]
@@ -0,0 +1,35 @@
+from django.db import migrations
+
+# rowid = pk * 4 + kind (1 blog post, 2 service, 3 developer); see protfolio/search.py.
+CREATE_INDEX = [
+    "CREATE VIRTUAL TABLE protfolio_search USING fts5(title, body, tokenize='porter unicode61')",
+    "INSERT INTO protfolio_search (rowid, title, body) SELECT id * 4 + 1, title, content FROM protfolio_blogpost",
+    "INSERT INTO protfolio_search (rowid, title, body) SELECT id * 4 + 2, title, description FROM protfolio_service",
+    "INSERT INTO protfolio_search (rowid, title, body) SELECT id * 4 + 3, name, position || char(10) || bio FROM protfolio_developer",
+]
+DROP_INDEX = ["DROP TABLE IF EXISTS protfolio_search"]
+
+
+def create_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    for statement in CREATE_INDEX:
+        schema_editor.execute(statement)
+
+
+def drop_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    for statement in DROP_INDEX:
+        schema_editor.execute(statement)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('protfolio', '0012_content_addressed_media'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_index, drop_index),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 5.2.18 on 2026-10-18 16:03
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('protfolio', '0013_search_index'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='client',
+            options={'ordering': ['display_order', 'id']},
+        ),
+        migrations.AddIndex(
+            model_name='client',
+            index=models.Index(fields=['display_order'], name='client_display_order_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='profile',
+            index=models.Index(fields=['role'], name='profile_role_idx'),
+        ),
+    ]
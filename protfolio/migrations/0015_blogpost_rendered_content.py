@@ -0,0 +1,40 @@
+# Generated by Django 5.2.18 on 2026-10-18 16:04
+
+from django.db import migrations, models
+from django.utils.html import linebreaks
+
+
+def fill_rendered_content(apps, schema_editor):
+    BlogPost = apps.get_model('protfolio', 'BlogPost')
+    posts = list(BlogPost.objects.only('content'))
+    for post in posts:
+        post.content_html = linebreaks(post.content, autoescape=True)
+        post.word_count = len(post.content.split())
+        post.reading_time = max(1, round(post.word_count / 200))
+    BlogPost.objects.bulk_update(posts, ['content_html', 'word_count', 'reading_time'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('protfolio', '0014_listing_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='blogpost',
+            name='content_html',
+            field=models.TextField(blank=True, editable=False),
+        ),
+        migrations.AddField(
+            model_name='blogpost',
+            name='reading_time',
+            field=models.PositiveIntegerField(default=1, editable=False, help_text='Minutes'),
+        ),
+        migrations.AddField(
+            model_name='blogpost',
+            name='word_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(fill_rendered_content, migrations.RunPython.noop),
+    ]
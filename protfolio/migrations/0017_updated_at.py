@@ -0,0 +1,68 @@
+# Generated by Django 5.2.18 on 2026-10-18 16:08
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+def updated_at_from_created_at(apps, schema_editor):
+    # Rows that record their creation start out unchanged since then; the
+    # rest keep the migration time.
+    for model_name in ('BlogPost', 'Review'):
+        model = apps.get_model('protfolio', model_name)
+        model.objects.update(updated_at=models.F('created_at'))
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('protfolio', '0016_static_page_change'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='blogpost',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AddField(
+            model_name='client',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AddField(
+            model_name='developer',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AddField(
+            model_name='review',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AddField(
+            model_name='service',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AddIndex(
+            model_name='blogpost',
+            index=models.Index(fields=['updated_at'], name='blogpost_updated_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='client',
+            index=models.Index(fields=['updated_at'], name='client_updated_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='developer',
+            index=models.Index(fields=['updated_at'], name='developer_updated_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='review',
+            index=models.Index(fields=['updated_at'], name='review_updated_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='service',
+            index=models.Index(fields=['updated_at'], name='service_updated_idx'),
+        ),
+        migrations.RunPython(updated_at_from_created_at, migrations.RunPython.noop),
+    ]
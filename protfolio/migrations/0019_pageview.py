@@ -0,0 +1,28 @@
+# Generated by Django 5.2.18 on 2026-10-18 16:25
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('protfolio', '0018_task'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PageView',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('path', models.CharField(max_length=255)),
+                ('view_name', models.CharField(max_length=50)),
+                ('object_id', models.PositiveIntegerField(blank=True, help_text="pk of the page's object, e.g. the blog post", null=True)),
+                ('minute', models.DateTimeField()),
+                ('count', models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['minute'], name='pageview_minute_idx'), models.Index(fields=['view_name', 'minute'], name='pageview_view_minute_idx')],
+                'constraints': [models.UniqueConstraint(fields=('path', 'minute'), name='pageview_path_minute_unique')],
+            },
+        ),
+    ]
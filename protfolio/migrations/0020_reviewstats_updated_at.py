@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 16:57
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('protfolio', '0019_pageview'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='reviewstats',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+    ]
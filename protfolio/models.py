@@ -1,10 +1,106 @@
 # file path: protfolio/models.py
 
+import logging
+
 from django.db import models
 from django.core.validators import MinValueValidator, MaxValueValidator
 from django.contrib.auth.models import User
-from django.db.models.signals import post_save
+from django.db.models import Count, F, Q
+from django.db.models.signals import post_save, post_delete, post_init
 from django.dispatch import receiver
+from django.utils import timezone
+from django.utils.html import linebreaks, strip_tags
+from django.utils.text import Truncator
+from PIL import UnidentifiedImageError
+
+from .images import generate_derivatives
+from .storage import media_storage
+from .tasks import enqueue, task
+
+logger = logging.getLogger(__name__)
+
+EXCERPT_WORDS = 25
+WORDS_PER_MINUTE = 200
+
+# --- Static Export ---
+
+class StaticPageChange(models.Model):
+    """A page group (see cache.PAGE_DEPENDENCIES) whose static export is out of date."""
+    group = models.CharField(max_length=100, unique=True)
+    changed_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return self.group
+
+# --- Background Tasks ---
+
+class Task(models.Model):
+    """A queued call of a function registered in tasks.TASKS, run by the run_tasks worker."""
+    PENDING, RUNNING, DONE, FAILED = 'pending', 'running', 'done', 'failed'
+    STATUS_CHOICES = (
+        (PENDING, 'Pending'),
+        (RUNNING, 'Running'),
+        (DONE, 'Done'),
+        (FAILED, 'Failed'),
+    )
+    name = models.CharField(max_length=100)
+    args = models.JSONField(default=list)
+    key = models.CharField(max_length=64, help_text="Hash of name and args, for deduplication")
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=PENDING)
+    attempts = models.PositiveIntegerField(default=0)
+    run_at = models.DateTimeField(default=timezone.now)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'run_at'], name='task_status_run_at_idx'),
+            models.Index(fields=['status', 'finished_at'], name='task_status_finished_idx'),
+        ]
+        constraints = [
+            # At most one pending copy of the same call.
+            models.UniqueConstraint(fields=['key'], condition=Q(status='pending'), name='task_pending_key_unique'),
+        ]
+
+    def __str__(self):
+        return f"{self.name}{tuple(self.args)} ({self.status})"
+
+# --- Analytics ---
+
+class PageView(models.Model):
+    """Views of one public page in one minute; written in batches by analytics.py."""
+    path = models.CharField(max_length=255)
+    view_name = models.CharField(max_length=50)
+    object_id = models.PositiveIntegerField(null=True, blank=True, help_text="pk of the page's object, e.g. the blog post")
+    minute = models.DateTimeField()
+    count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['minute'], name='pageview_minute_idx'),
+            models.Index(fields=['view_name', 'minute'], name='pageview_view_minute_idx'),
+        ]
+        constraints = [
+            # The upsert target: every worker adds its counts to the same row.
+            models.UniqueConstraint(fields=['path', 'minute'], name='pageview_path_minute_unique'),
+        ]
+
+    def __str__(self):
+        return f"{self.path} at {self.minute:%Y-%m-%d %H:%M}: {self.count}"
+
+# --- Media ---
+
+class MediaBlob(models.Model):
+    """One stored file in the content-addressed media storage (see storage.py)."""
+    name = models.CharField(max_length=100, unique=True)
+    size = models.PositiveBigIntegerField(default=0)
+    ref_count = models.PositiveIntegerField(default=1)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.name} ({self.ref_count} refs)"
 
 # --- Main Content Models ---
 
@@ -12,7 +108,13 @@ class Service(models.Model):
     title = models.CharField(max_length=100)
     description = models.TextField()
     icon_class = models.CharField(max_length=50, help_text="Font Awesome class, e.g., 'fas fa-laptop-code'")
-    image = models.ImageField(upload_to='service_images/', blank=True, null=True, help_text="Optional image for the service")
+    image = models.ImageField(upload_to='service_images/', storage=media_storage, blank=True, null=True, help_text="Optional image for the service")
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['updated_at'], name='service_updated_idx'),
+        ]
 
     def __str__(self):
         return self.title
@@ -20,20 +122,62 @@ class Service(models.Model):
 class BlogPost(models.Model):
     title = models.CharField(max_length=200)
     content = models.TextField()
-    image = models.ImageField(upload_to='blog_images/')
+    image = models.ImageField(upload_to='blog_images/', storage=media_storage)
     created_at = models.DateTimeField(auto_now_add=True)
     author = models.ForeignKey(User, on_delete=models.CASCADE)
+    excerpt = models.TextField(blank=True, editable=False)
+    content_html = models.TextField(blank=True, editable=False)
+    word_count = models.PositiveIntegerField(default=0, editable=False)
+    reading_time = models.PositiveIntegerField(default=1, editable=False, help_text="Minutes")
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['-created_at', '-id'], name='blogpost_created_id_idx'),
+            models.Index(fields=['updated_at'], name='blogpost_updated_idx'),
+        ]
 
     def __str__(self):
         return self.title
 
+    def render_content(self):
+        # Stored so page views never process the body: the listing reads the
+        # excerpt and the detail page the rendered HTML and reading time.
+        for field, value in render_blog_content(self.content).items():
+            setattr(self, field, value)
+
+    def save(self, *args, **kwargs):
+        self.render_content()
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'content' in update_fields:
+            kwargs['update_fields'] = set(update_fields) | set(RENDERED_CONTENT_FIELDS)
+        super().save(*args, **kwargs)
+
+RENDERED_CONTENT_FIELDS = ('excerpt', 'content_html', 'word_count', 'reading_time')
+
+def render_blog_content(content):
+    """The stored renderings of a blog post body, keyed by field name."""
+    word_count = len(content.split())
+    return {
+        'excerpt': Truncator(strip_tags(content)).words(EXCERPT_WORDS),
+        'content_html': linebreaks(content, autoescape=True),
+        'word_count': word_count,
+        'reading_time': max(1, round(word_count / WORDS_PER_MINUTE)),
+    }
+
 class Developer(models.Model):
     name = models.CharField(max_length=100)
     position = models.CharField(max_length=100)
     experience = models.PositiveIntegerField()
-    image = models.ImageField(upload_to='developers/')
+    image = models.ImageField(upload_to='developers/', storage=media_storage)
     bio = models.TextField()
     cv_url = models.URLField(blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['updated_at'], name='developer_updated_idx'),
+        ]
 
     def __str__(self):
         return self.name
@@ -41,12 +185,18 @@ class Developer(models.Model):
 # --- নতুন Client মডেল ---
 class Client(models.Model):
     name = models.CharField(max_length=100)
-    logo = models.ImageField(upload_to='client_logos/')
+    logo = models.ImageField(upload_to='client_logos/', storage=media_storage)
     website_url = models.URLField(blank=True, null=True)
     display_order = models.PositiveIntegerField(default=0, help_text="Lower numbers are displayed first")
+    updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
-        ordering = ['display_order']
+        # id breaks ties so the order is stable (and the admin doesn't add -pk)
+        ordering = ['display_order', 'id']
+        indexes = [
+            models.Index(fields=['display_order'], name='client_display_order_idx'),
+            models.Index(fields=['updated_at'], name='client_updated_idx'),
+        ]
 
     def __str__(self):
         return self.name
@@ -58,10 +208,110 @@ class Review(models.Model):
     review_text = models.TextField()
     rating = models.IntegerField(validators=[MinValueValidator(1), MaxValueValidator(5)])
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['-created_at', '-id'], name='review_created_id_idx'),
+            models.Index(fields=['rating', '-created_at', '-id'], name='review_rating_created_idx'),
+            models.Index(fields=['updated_at'], name='review_updated_idx'),
+        ]
 
     def __str__(self):
         return f"Review by {self.user.username}"
 
+class ReviewStats(models.Model):
+    """
+    Single-row running summary of all reviews, kept current by the Review
+    signals below so the review page never has to aggregate the table.
+    Rebuild with `manage.py rebuild_review_stats` if it ever drifts.
+    """
+    total = models.PositiveIntegerField(default=0)
+    rating_sum = models.PositiveIntegerField(default=0)
+    rating_1 = models.PositiveIntegerField(default=0)
+    rating_2 = models.PositiveIntegerField(default=0)
+    rating_3 = models.PositiveIntegerField(default=0)
+    rating_4 = models.PositiveIntegerField(default=0)
+    rating_5 = models.PositiveIntegerField(default=0)
+    # Part of the review page's ETag: a rebuild changes no Review row.
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name_plural = 'Review stats'
+
+    def __str__(self):
+        return f"{self.total} reviews, average {self.average:.1f}"
+
+    @classmethod
+    def load(cls):
+        stats, created = cls.objects.get_or_create(pk=1)
+        return stats
+
+    @classmethod
+    async def aload(cls):
+        stats, created = await cls.objects.aget_or_create(pk=1)
+        return stats
+
+    @classmethod
+    def rebuild(cls):
+        counts = dict(Review.objects.values_list('rating').annotate(n=Count('id')).order_by())
+        values = {f'rating_{r}': counts.get(r, 0) for r in range(1, 6)}
+        values['total'] = sum(counts.values())
+        values['rating_sum'] = sum(r * n for r, n in counts.items())
+        stats, created = cls.objects.update_or_create(pk=1, defaults=values)
+        return stats
+
+    @classmethod
+    def apply(cls, rating, delta):
+        """Add (delta=1) or remove (delta=-1) one review with `rating`."""
+        updated = cls.objects.filter(pk=1).update(**{
+            'total': F('total') + delta,
+            'rating_sum': F('rating_sum') + delta * rating,
+            f'rating_{rating}': F(f'rating_{rating}') + delta,
+            'updated_at': timezone.now(),
+        })
+        if not updated:
+            cls.rebuild()
+
+    @property
+    def average(self):
+        return self.rating_sum / self.total if self.total else 0
+
+    @property
+    def histogram(self):
+        """[(rating, count, percent)] from 5 stars down to 1."""
+        rows = []
+        for rating in range(5, 0, -1):
+            count = getattr(self, f'rating_{rating}')
+            percent = round(100 * count / self.total) if self.total else 0
+            rows.append((rating, count, percent))
+        return rows
+
+
+# Remember the rating as loaded (without touching deferred fields) so that an
+# edit can move the review between histogram buckets.
+@receiver(post_init, sender=Review)
+def remember_review_rating(sender, instance, **kwargs):
+    instance._stats_rating = instance.__dict__.get('rating') if instance.pk else None
+
+@receiver(post_save, sender=Review)
+def count_saved_review(sender, instance, created, **kwargs):
+    if created:
+        ReviewStats.apply(instance.rating, 1)
+    elif instance._stats_rating is not None and instance._stats_rating != instance.rating:
+        ReviewStats.apply(instance._stats_rating, -1)
+        ReviewStats.apply(instance.rating, 1)
+    instance._stats_rating = instance.__dict__.get('rating')
+
+@receiver(post_delete, sender=Review)
+def count_deleted_review(sender, instance, **kwargs):
+    rating = instance._stats_rating or instance.__dict__.get('rating')
+    if rating is None:
+        # Deleted without its rating loaded, and the row is gone: count again.
+        ReviewStats.rebuild()
+    else:
+        ReviewStats.apply(rating, -1)
+
 # --- User Profile Model ---
 
 class Profile(models.Model):
@@ -73,6 +323,11 @@ class Profile(models.Model):
     user = models.OneToOneField(User, on_delete=models.CASCADE)
     role = models.CharField(max_length=20, choices=ROLE_CHOICES, default='VISITOR')
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['role'], name='profile_role_idx'),
+        ]
+
     def __str__(self):
         return f"{self.user.username}'s Profile - {self.role}"
 
@@ -82,7 +337,85 @@ def create_user_profile(sender, instance, created, **kwargs):
     if created:
         Profile.objects.create(user=instance, role='CLIENT') # Default role is Client
 
+# Remember the role as loaded so save_user_profile can tell whether the
+# profile was actually modified through the user object.
+@receiver(post_init, sender=Profile)
+def remember_profile_role(sender, instance, **kwargs):
+    instance._saved_role = instance.__dict__.get('role') if instance.pk else None
+
+@receiver(post_save, sender=Profile)
+def reset_profile_role(sender, instance, **kwargs):
+    instance._saved_role = instance.__dict__.get('role')
+
 @receiver(post_save, sender=User)
 def save_user_profile(sender, instance, **kwargs):
-    if hasattr(instance, 'profile'):
-        instance.profile.save()
\ No newline at end of file
+    # Every login saves the user (last_login); only touch the profile if it was
+    # already loaded on this instance and its role has changed since.
+    profile = instance._state.fields_cache.get('profile')
+    if profile is not None and profile.role != profile._saved_role:
+        profile.save(update_fields=['role'])
+
+# --- Image Files ---
+
+def _image_fields(model):
+    return [f for f in model._meta.fields if isinstance(f, models.ImageField)]
+
+def _stored_name(value):
+    return getattr(value, 'name', value) or None
+
+@receiver(post_init, sender=Service)
+@receiver(post_init, sender=BlogPost)
+@receiver(post_init, sender=Developer)
+@receiver(post_init, sender=Client)
+def remember_image_names(sender, instance, **kwargs):
+    # Deferred fields are left out: what they store isn't known.
+    instance._image_names = {
+        field.attname: _stored_name(instance.__dict__[field.attname])
+        for field in _image_fields(sender) if field.attname in instance.__dict__
+    }
+
+@receiver(post_save, sender=Service)
+@receiver(post_save, sender=BlogPost)
+@receiver(post_save, sender=Developer)
+@receiver(post_save, sender=Client)
+def process_saved_images(sender, instance, update_fields=None, **kwargs):
+    for field in _image_fields(sender):
+        if update_fields is not None and field.attname not in update_fields:
+            continue
+        image = getattr(instance, field.attname)
+        previous = instance._image_names.get(field.attname)
+        # Everything here follows the stored name: saving the same bytes
+        # again yields the same blob name, which must not count twice or be
+        # resized again, and neither must an edit that leaves the image alone.
+        if (image.name or None) == previous:
+            continue
+        if hasattr(image.storage, 'add_reference'):
+            if image:
+                image.storage.add_reference(image.name)
+            if previous:
+                image.storage.release(previous)
+        instance._image_names[field.attname] = image.name or None
+        if image:
+            # Resizing takes seconds per upload, so it runs on a worker.
+            enqueue('build_image_derivatives', image.name)
+
+@task
+def build_image_derivatives(name):
+    storage = media_storage()
+    if not storage.exists(name):  # Replaced or deleted before the worker got to it.
+        return
+    try:
+        generate_derivatives(name, storage)
+    except UnidentifiedImageError:
+        # Not an image Pillow can read; retrying won't change that.
+        logger.exception("Could not build derivatives for %s", name)
+
+@receiver(post_delete, sender=Service)
+@receiver(post_delete, sender=BlogPost)
+@receiver(post_delete, sender=Developer)
+@receiver(post_delete, sender=Client)
+def release_deleted_images(sender, instance, **kwargs):
+    for field in _image_fields(sender):
+        image = getattr(instance, field.attname)
+        if image and hasattr(image.storage, 'release'):
+            image.storage.release(image.name)
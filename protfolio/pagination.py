@@ -0,0 +1,67 @@
+import base64
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.db.models import Q
+
+EPOCH = datetime(1970, 1, 1, tzinfo=dt_timezone.utc)
+# Bounds of a valid cursor; anything outside was not made by encode_cursor.
+MAX_MICROS = (datetime.max.replace(tzinfo=dt_timezone.utc) - EPOCH) // timedelta(microseconds=1)
+MAX_PK = 2 ** 63 - 1
+
+
+def encode_cursor(created_at, pk):
+    """Turn the (created_at, pk) of the last row shown into an opaque token."""
+    micros = (created_at - EPOCH) // timedelta(microseconds=1)
+    raw = f"{micros}:{pk}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(token):
+    """Inverse of encode_cursor. Returns None for missing or malformed tokens."""
+    if not token:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4)).decode()
+        micros, pk = (int(part) for part in raw.split(':'))
+        if not (0 <= micros <= MAX_MICROS and 0 < pk <= MAX_PK):
+            return None
+        return EPOCH + timedelta(microseconds=micros), pk
+    except (ValueError, OverflowError, UnicodeDecodeError):
+        return None
+
+
+def _page_queryset(queryset, cursor, per_page, field):
+    position = decode_cursor(cursor)
+    if position is not None:
+        value, pk = position
+        queryset = queryset.filter(
+            Q(**{f'{field}__lt': value}) | Q(**{field: value, 'pk__lt': pk})
+        )
+    return queryset.order_by(f'-{field}', '-pk')[:per_page + 1]
+
+
+def _split_page(items, per_page, field):
+    next_cursor = None
+    if len(items) > per_page:
+        items = items[:per_page]
+        last = items[-1]
+        next_cursor = encode_cursor(getattr(last, field), last.pk)
+    return items, next_cursor
+
+
+def keyset_page(queryset, cursor, per_page, field='created_at'):
+    """
+    Return one page of `queryset` ordered newest first on (field, pk), starting
+    after `cursor`, plus the cursor for the next page (None on the last page).
+
+    Unlike OFFSET pagination the cost does not grow with how deep the page is,
+    as long as (field, id) is indexed.
+    """
+    items = list(_page_queryset(queryset, cursor, per_page, field))
+    return _split_page(items, per_page, field)
+
+
+async def akeyset_page(queryset, cursor, per_page, field='created_at'):
+    """Async version of keyset_page, for async views."""
+    items = [item async for item in _page_queryset(queryset, cursor, per_page, field)]
+    return _split_page(items, per_page, field)
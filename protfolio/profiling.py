@@ -0,0 +1,283 @@
+import asyncio
+import os
+import random
+import sys
+import threading
+import time
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import timedelta
+from functools import wraps
+from pathlib import Path
+
+from asgiref.sync import AsyncToSync, SyncToAsync, iscoroutinefunction
+from django.conf import settings
+
+PROFILER_ENABLED = getattr(settings, 'SAMPLING_PROFILER', False)
+# Fraction of calls to a @sampled function that get profiled.
+PROFILER_RATE = getattr(settings, 'SAMPLING_PROFILER_RATE', 0.05)
+# Target time between two samples of the same thread.
+PROFILER_INTERVAL = getattr(settings, 'SAMPLING_PROFILER_INTERVAL', 0.005)
+# Hard ceiling on the share of wall time the sampler thread may be busy.
+PROFILER_MAX_OVERHEAD = getattr(settings, 'SAMPLING_PROFILER_MAX_OVERHEAD', 0.01)
+PROFILER_FLUSH_INTERVAL = getattr(settings, 'SAMPLING_PROFILER_FLUSH_INTERVAL', 10)
+PROFILE_DIR = Path(getattr(settings, 'PROFILE_DIR', Path(settings.BASE_DIR) / 'profiles'))
+# Files not rewritten for this long belong to workers that are gone.
+PROFILE_MAX_AGE = getattr(settings, 'SAMPLING_PROFILER_MAX_AGE', timedelta(days=7))
+
+# Frame every sync_to_async call runs under in its executor thread.
+SYNC_HANDLER = 'asgiref.sync.SyncToAsync.thread_handler'
+
+# Set inside a tracked call: in its thread, or in its task and the
+# sync_to_async calls it makes.
+_tracking = ContextVar('sampling_profiler_tracking', default=False)
+
+
+def collapse(frame):
+    """Render a frame's stack in collapsed-stack form, outermost call first."""
+    names = []
+    while frame is not None:
+        code = frame.f_code
+        names.append(f"{frame.f_globals.get('__name__', '?')}.{code.co_qualname}")
+        frame = frame.f_back
+    return ';'.join(reversed(names))
+
+
+class Sampler:
+    """
+    Statistical profiler: a background thread periodically reads the stacks of
+    the calls registered through `track()` and counts collapsed stacks per
+    label. A call in a coroutine is one task of the event loop: the loop's
+    thread is counted for it only while that task is the one running. Counts are flushed to `<label>.<pid>.folded` files in PROFILE_DIR,
+    the format flamegraph.pl and speedscope read. A live worker rewrites its
+    files on every flush; files older than `max_age` are removed.
+
+    The thread measures how long each sampling pass takes and sleeps at least
+    busy / max_overhead between passes, so it never occupies more than
+    `max_overhead` of wall time no matter how many threads are tracked. While
+    nothing is tracked it only wakes up to flush.
+    """
+
+    def __init__(self, interval=PROFILER_INTERVAL, max_overhead=PROFILER_MAX_OVERHEAD,
+                 output_dir=PROFILE_DIR, flush_interval=PROFILER_FLUSH_INTERVAL,
+                 max_age=PROFILE_MAX_AGE):
+        self.interval = interval
+        self.max_overhead = max_overhead
+        self.output_dir = Path(output_dir)
+        self.flush_interval = flush_interval
+        self.max_age = max_age
+        self.active = {}
+        self.counts = defaultdict(Counter)
+        self.lock = threading.Lock()
+        self.wakeup = threading.Event()
+        self.pid = None
+        self.busy_time = 0.0
+        self.started_at = None
+
+    def _ensure_running(self):
+        # Started lazily and per process, so forked workers get their own thread.
+        if self.pid == os.getpid():
+            return
+        with self.lock:
+            if self.pid == os.getpid():
+                return
+            self.pid = os.getpid()
+            self.active = {}
+            self.counts = defaultdict(Counter)
+            self.started_at = time.perf_counter()
+            self.busy_time = 0.0
+            threading.Thread(target=self._run, name='sampling-profiler', daemon=True).start()
+
+    @contextmanager
+    def track(self, label, related=None):
+        """
+        Sample the current thread, or task, under `label` inside the block.
+        `related` may return the idents of further threads doing this call's
+        work; they are sampled while they run sync_to_async code.
+        """
+        self._ensure_running()
+        try:
+            loop = asyncio.get_running_loop()
+            task = asyncio.current_task()
+        except RuntimeError:
+            loop = task = None
+        key = object()
+        with self.lock:
+            self.active[key] = (label, threading.get_ident(), loop, task, related)
+        self.wakeup.set()
+        tracking = _tracking.set(True)
+        try:
+            yield
+        finally:
+            _tracking.reset(tracking)
+            with self.lock:
+                self.active.pop(key, None)
+
+    def sample(self):
+        frames = sys._current_frames()
+        with self.lock:
+            active = list(self.active.values())
+        for label, ident, loop, task, related in active:
+            frame = frames.get(ident)
+            # The loop's thread may be running another request, or idle.
+            if frame is not None and (task is None or asyncio.current_task(loop) is task):
+                self.counts[label][collapse(frame)] += 1
+            for thread in related() if related else ():
+                frame = frames.get(thread)
+                stack = collapse(frame) if frame is not None else ''
+                # Skip the executor thread while it waits for work.
+                if SYNC_HANDLER in stack:
+                    self.counts[label][stack] += 1
+
+    def overhead(self):
+        """Share of wall time spent sampling since the thread started."""
+        if not self.started_at:
+            return 0.0
+        return self.busy_time / max(time.perf_counter() - self.started_at, 1e-9)
+
+    def _run(self):
+        last_flush = time.monotonic()
+        while True:
+            if time.monotonic() - last_flush >= self.flush_interval:
+                self.flush()
+                last_flush = time.monotonic()
+            if not self.active:
+                self.wakeup.wait(self.flush_interval)
+                self.wakeup.clear()
+                continue
+            start = time.perf_counter()
+            self.sample()
+            busy = time.perf_counter() - start
+            self.busy_time += busy
+            time.sleep(max(self.interval, busy / self.max_overhead - busy))
+
+    def flush(self):
+        with self.lock:
+            snapshot = {label: dict(counter) for label, counter in self.counts.items()}
+        if not snapshot:
+            return
+        self.output_dir.mkdir(parents=True, exist_ok=True)
+        self.prune()
+        for label, counter in snapshot.items():
+            path = self.output_dir / f'{label}.{os.getpid()}.folded'
+            tmp = path.with_suffix('.tmp')
+            with open(tmp, 'w') as handle:
+                for stack, count in counter.items():
+                    handle.write(f'{stack} {count}\n')
+            os.replace(tmp, path)
+
+    def prune(self):
+        """Delete the files of workers that stopped flushing `max_age` ago."""
+        cutoff = time.time() - self.max_age.total_seconds()
+        for path in self.output_dir.glob('*.folded'):
+            try:
+                if path.stat().st_mtime < cutoff:
+                    path.unlink()
+            except FileNotFoundError:
+                # Pruned by another worker.
+                pass
+
+
+sampler = Sampler()
+
+
+def _sync_threads():
+    """
+    A function returning the threads that run the current task's
+    thread-sensitive sync_to_async calls (ORM queries, template rendering in
+    async views), picked the way SyncToAsync picks its executor. The
+    per-request executor is only created by the first call, so it is looked
+    up on every sample.
+    """
+    current = getattr(AsyncToSync.executors, 'current', None)
+    context = SyncToAsync.thread_sensitive_context.get(None)
+    loop = asyncio.get_running_loop()
+
+    def threads():
+        if current:
+            # Under async_to_sync: the sync thread that is waiting for us.
+            return [current._work_thread.ident]
+        if context is not None:
+            executor = SyncToAsync.context_to_thread_executor.get(context)
+        else:
+            executor = AsyncToSync.loop_thread_executors.get(loop, SyncToAsync.single_thread_executor)
+        return [thread.ident for thread in getattr(executor, '_threads', ())]
+    return threads
+
+
+def sampled(function=None, *, rate=None):
+    """
+    Profile a sample of calls to `function` when SAMPLING_PROFILER is on:
+    `rate` of them, PROFILER_RATE by default, 0 to leave a view out. Use as
+    @sampled or @sampled(rate=...). Nested @sampled calls are attributed to
+    the outermost one.
+
+    For coroutine functions the call's task is tracked while it is pending,
+    together with the thread its sync_to_async work runs on, where async
+    views spend most of their time.
+    """
+    if function is None:
+        return lambda function: sampled(function, rate=rate)
+    label = function.__name__
+    if rate is None:
+        rate = PROFILER_RATE
+
+    def skip():
+        return not PROFILER_ENABLED or _tracking.get() or random.random() >= rate
+
+    if iscoroutinefunction(function):
+        @wraps(function)
+        async def async_wrap(*args, **kwargs):
+            if skip():
+                return await function(*args, **kwargs)
+            with sampler.track(label, related=_sync_threads()):
+                return await function(*args, **kwargs)
+        return async_wrap
+
+    @wraps(function)
+    def wrap(*args, **kwargs):
+        if skip():
+            return function(*args, **kwargs)
+        with sampler.track(label):
+            return function(*args, **kwargs)
+    return wrap
+
+
+# --- Reading profiles back ---
+
+def load_profiles(output_dir=PROFILE_DIR):
+    """{label: Counter(stack -> samples)} summed over every worker's files."""
+    profiles = defaultdict(Counter)
+    for path in Path(output_dir).glob('*.folded'):
+        label = path.name.split('.')[0]
+        with open(path) as handle:
+            for line in handle:
+                stack, _, count = line.rstrip('\n').rpartition(' ')
+                if stack and count.isdigit():
+                    profiles[label][stack] += int(count)
+    return profiles
+
+
+def flame_tree(counter, min_fraction=0.002):
+    """
+    Fold collapsed stacks into the nested {name, value, children} tree that
+    flame graph renderers expect, dropping frames below `min_fraction` of all
+    samples to keep the payload small.
+    """
+    root = {'name': 'all', 'value': 0, 'children': {}}
+    for stack, count in counter.items():
+        root['value'] += count
+        node = root
+        for name in stack.split(';'):
+            node = node['children'].setdefault(name, {'name': name, 'value': 0, 'children': {}})
+            node['value'] += count
+
+    cutoff = root['value'] * min_fraction
+
+    def finish(node):
+        children = [finish(child) for child in node['children'].values() if child['value'] >= cutoff]
+        children.sort(key=lambda child: child['value'], reverse=True)
+        return {'name': node['name'], 'value': node['value'], 'children': children}
+
+    return finish(root)
@@ -0,0 +1,159 @@
+import re
+
+from django.db import connection
+from django.db.models.expressions import RawSQL
+from django.db.models.signals import post_save, post_delete
+from django.urls import reverse
+from django.utils.html import escape
+from django.utils.safestring import mark_safe
+
+from .models import Service, BlogPost, Developer
+
+# SQLite FTS5 index over the public content. Each document's rowid encodes
+# both the model and the pk (pk * 4 + kind) so a row can be replaced or
+# removed by rowid without scanning the index.
+TABLE = 'protfolio_search'
+# Room for kind codes 0-3 in every rowid.
+KIND_MULTIPLIER = 4
+
+MARK_START, MARK_END = '\x02', '\x03'
+
+
+def _blog_document(post):
+    return post.title, post.content
+
+def _service_document(service):
+    return service.title, service.description
+
+def _developer_document(developer):
+    return developer.name, f"{developer.position}\n{developer.bio}"
+
+
+# kind name -> (model, kind code, document builder, url builder)
+SOURCES = {
+    'blog': (BlogPost, 1, _blog_document, lambda pk: reverse('blog_detail', args=[pk])),
+    'service': (Service, 2, _service_document, lambda pk: reverse('services')),
+    'developer': (Developer, 3, _developer_document, lambda pk: reverse('about_us')),
+}
+KIND_BY_MODEL = {model: kind for kind, (model, *rest) in SOURCES.items()}
+KIND_BY_CODE = {code: kind for kind, (model, code, *rest) in SOURCES.items()}
+
+
+def available():
+    return connection.vendor == 'sqlite'
+
+
+def _rowid(kind, pk):
+    return pk * KIND_MULTIPLIER + SOURCES[kind][1]
+
+
+def index_object(instance):
+    kind = KIND_BY_MODEL[type(instance)]
+    title, body = SOURCES[kind][2](instance)
+    rowid = _rowid(kind, instance.pk)
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {TABLE} WHERE rowid = %s', [rowid])
+        cursor.execute(f'INSERT INTO {TABLE} (rowid, title, body) VALUES (%s, %s, %s)', [rowid, title, body])
+
+
+def remove_object(instance):
+    kind = KIND_BY_MODEL[type(instance)]
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {TABLE} WHERE rowid = %s', [_rowid(kind, instance.pk)])
+
+
+def rebuild():
+    """Drop every indexed document and index all rows again. Returns the document count."""
+    count = 0
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {TABLE}')
+        for kind, (model, code, document, url) in SOURCES.items():
+            rows = []
+            for obj in model.objects.iterator(chunk_size=500):
+                rows.append((_rowid(kind, obj.pk), *document(obj)))
+            cursor.executemany(f'INSERT INTO {TABLE} (rowid, title, body) VALUES (%s, %s, %s)', rows)
+            count += len(rows)
+        cursor.execute(f"INSERT INTO {TABLE} ({TABLE}) VALUES ('optimize')")
+    return count
+
+
+def fts_query(text):
+    """
+    Turn free text into an FTS5 query: every word must match, as a prefix.
+    Quoting each term keeps FTS5 operators in user input from being parsed.
+    """
+    terms = re.findall(r'\w+', text)
+    return ' '.join(f'"{term}"*' for term in terms)
+
+
+def _highlight(text):
+    return mark_safe(escape(text).replace(MARK_START, '<mark>').replace(MARK_END, '</mark>'))
+
+
+def _where(match, kind):
+    sql = f'FROM {TABLE} WHERE {TABLE} MATCH %s'
+    params = [match]
+    if kind in SOURCES:
+        sql += f' AND rowid %% {KIND_MULTIPLIER} = %s'
+        params.append(SOURCES[kind][1])
+    return sql, params
+
+
+def _match(query, kind, limit, columns):
+    match = fts_query(query)
+    if not match or not available():
+        return []
+    where, params = _where(match, kind)
+    sql = f'SELECT rowid, {columns} {where}'
+    # Title matches weigh five times as much as body matches.
+    sql += f' ORDER BY bm25({TABLE}, 5.0, 1.0) LIMIT %s'
+    params.append(limit)
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        return cursor.fetchall()
+
+
+def search(query, kind=None, limit=20):
+    """Ranked results as dicts with kind, pk, url and highlighted title/snippet."""
+    columns = (
+        f"highlight({TABLE}, 0, '{MARK_START}', '{MARK_END}'), "
+        f"snippet({TABLE}, 1, '{MARK_START}', '{MARK_END}', '…', 24)"
+    )
+    results = []
+    for rowid, title, snippet in _match(query, kind, limit, columns):
+        pk, code = divmod(rowid, KIND_MULTIPLIER)
+        result_kind = KIND_BY_CODE[code]
+        results.append({
+            'kind': result_kind,
+            'pk': pk,
+            'url': SOURCES[result_kind][3](pk),
+            'title': _highlight(title),
+            'snippet': _highlight(snippet),
+        })
+    return results
+
+
+def matching_pks(model, query):
+    """
+    A subquery selecting the pks of every `model` row matching `query`, for
+    `pk__in`, or None if `query` has no words to match.
+    """
+    match = fts_query(query)
+    if not match:
+        return None
+    where, params = _where(match, KIND_BY_MODEL[model])
+    return RawSQL(f'SELECT rowid / {KIND_MULTIPLIER} {where}', params)
+
+
+def _index_saved(sender, instance, **kwargs):
+    if available():
+        index_object(instance)
+
+def _remove_deleted(sender, instance, **kwargs):
+    if available():
+        remove_object(instance)
+
+def connect_signals():
+    for model in KIND_BY_MODEL:
+        post_save.connect(_index_saved, sender=model, dispatch_uid=f'search-save-{model.__name__}')
+        post_delete.connect(_remove_deleted, sender=model, dispatch_uid=f'search-delete-{model.__name__}')
@@ -0,0 +1,163 @@
+import json
+import os
+import shutil
+from pathlib import Path
+
+from django.conf import settings
+from django.contrib.staticfiles import finders
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+from django.http import Http404
+
+from .cache import PAGE_DEPENDENCIES, group_url, render_anonymous
+from .models import StaticPageChange
+from .routers import primary_only
+
+# Static copy of the anonymous site for nginx to serve without Django.
+# Only the first page of each listing is exported, so requests with a query
+# string (cursor pages, filters, search) must go to Django; try_files alone
+# ignores $args and would answer /reviews/?cursor=... with the first page:
+#
+#   location / {
+#       error_page 418 = @django;
+#       if ($args) { return 418; }
+#       try_files $uri $uri/index.html @django;
+#   }
+#   location @django { proxy_pass http://django; }
+EXPORT_ROOT = Path(getattr(settings, 'STATIC_EXPORT_ROOT', Path(settings.BASE_DIR) / 'static_export'))
+MANIFEST = '.export.json'
+
+
+def all_groups():
+    """Every exported page group, '{pk}' groups expanded over the existing rows."""
+    groups = set()
+    for model, templates in PAGE_DEPENDENCIES.items():
+        for template in templates:
+            if '{pk}' in template:
+                groups.update(template.format(pk=pk) for pk in model.objects.values_list('pk', flat=True))
+            else:
+                groups.add(template)
+    return groups
+
+
+def page_path(root, group):
+    return Path(root) / group_url(group).lstrip('/') / 'index.html'
+
+
+def _write(path, content):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(f'.{path.name}.{os.getpid()}.tmp')
+    tmp.write_bytes(content)
+    os.replace(tmp, path)
+
+
+def export_pages(groups, root=EXPORT_ROOT):
+    """
+    Render each group and write it under `root`. Pages that no longer exist
+    (a deleted post) are removed. Returns (written, removed, failed groups).
+    """
+    written = removed = 0
+    failed = []
+    for group in groups:
+        path = page_path(root, group)
+        try:
+            # Never export a page from a replica snapshot that predates the change.
+            with primary_only():
+                response = render_anonymous(group)
+        except Http404:
+            response = None
+        if response is None or response.status_code == 404:
+            if path.exists():
+                path.unlink()
+                removed += 1
+        elif response.status_code == 200:
+            _write(path, response.content)
+            written += 1
+        else:
+            failed.append(group)
+    return written, removed, failed
+
+
+def _sync_file(source, target):
+    source_stat = os.stat(source)
+    try:
+        target_stat = os.stat(target)
+        if target_stat.st_size == source_stat.st_size and target_stat.st_mtime >= source_stat.st_mtime:
+            return False
+    except FileNotFoundError:
+        target.parent.mkdir(parents=True, exist_ok=True)
+    shutil.copy2(source, target)
+    return True
+
+
+def _sync_tree(source_root, target_root):
+    copied = 0
+    for source in Path(source_root).rglob('*'):
+        if source.is_file():
+            copied += _sync_file(source, target_root / source.relative_to(source_root))
+    return copied
+
+
+def sync_assets(root=EXPORT_ROOT):
+    """Copy new or changed static and media files under `root`. Returns the number copied."""
+    copied = 0
+    static_root = Path(root) / settings.STATIC_URL.strip('/')
+    collected = Path(settings.STATIC_ROOT) if settings.STATIC_ROOT else None
+    if collected and (collected / 'staticfiles.json').exists():
+        # After build_assets the pages link the fingerprinted copies; the
+        # .gz/.br variants come along for gzip_static/brotli_static.
+        copied += _sync_tree(collected, static_root)
+    else:
+        seen = set()
+        for finder in finders.get_finders():
+            for path, storage in finder.list(['CVS', '.*', '*~']):
+                if path in seen:  # The first finder wins, as with collectstatic.
+                    continue
+                seen.add(path)
+                copied += _sync_file(storage.path(path), static_root / path)
+
+    media_target = Path(root) / settings.MEDIA_URL.strip('/')
+    return copied + _sync_tree(Path(settings.MEDIA_ROOT), media_target)
+
+
+# --- Change Tracking ---
+
+def read_manifest(root=EXPORT_ROOT):
+    try:
+        return json.loads((Path(root) / MANIFEST).read_text())
+    except (FileNotFoundError, ValueError):
+        return None
+
+
+def write_manifest(root, **values):
+    _write(Path(root) / MANIFEST, json.dumps(values).encode())
+
+
+def pending_changes():
+    """{group: changed_at} of every page changed since it was last exported."""
+    return dict(StaticPageChange.objects.values_list('group', 'changed_at'))
+
+
+def clear_changes(changes):
+    """
+    Forget the `changes` an export has just written. A group changed again
+    in the meantime has a newer changed_at and stays pending.
+    """
+    with transaction.atomic():
+        for group, changed_at in changes.items():
+            StaticPageChange.objects.filter(group=group, changed_at=changed_at).delete()
+
+
+def mark_pending(groups):
+    for group in groups:
+        StaticPageChange.objects.update_or_create(group=group)
+
+
+def mark_changed(sender, instance, **kwargs):
+    mark_pending(template.format(pk=instance.pk) for template in PAGE_DEPENDENCIES[sender])
+
+
+def connect_signals():
+    for model in PAGE_DEPENDENCIES:
+        post_save.connect(mark_changed, sender=model, dispatch_uid=f'static-export-save-{model.__name__}')
+        post_delete.connect(mark_changed, sender=model, dispatch_uid=f'static-export-delete-{model.__name__}')
@@ -0,0 +1,157 @@
+import gzip
+import hashlib
+import os
+import re
+
+from django.apps import apps
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage
+from django.core.files import File
+from django.core.files.storage import FileSystemStorage
+from django.db import transaction
+from django.db.models import F
+
+from .images import delete_derivatives
+
+try:
+    import brotli
+except ImportError:  # Optional: only gzip variants are written without it.
+    brotli = None
+
+BLOB_PREFIX = 'blobs'
+BLOB_NAME_RE = re.compile(rf'^{BLOB_PREFIX}/[0-9a-f]{{2}}/[0-9a-f]{{64}}\.[a-z0-9]+$')
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    """
+    Stores every upload once, under the SHA-256 of its bytes:
+
+        blog_images/cover.jpg -> blobs/3f/3f9a...c1.jpg
+
+    The requested name (and its upload_to directory) is ignored, so the same
+    image uploaded as a client logo and as a blog cover ends up as one file
+    with one URL. A MediaBlob row counts how many model fields point at each
+    blob: the image signals in models.py call `add_reference()` and
+    `release()` when a field's stored name changes, and `release()` deletes
+    the file with the last reference.
+
+    Resized derivatives (see images.derivative_name) go through
+    `save_derivative()` and are stored under the name given.
+    """
+
+    def is_blob(self, name):
+        return bool(name) and BLOB_NAME_RE.match(name) is not None
+
+    def blob_name(self, digest, ext):
+        return f'{BLOB_PREFIX}/{digest[:2]}/{digest}{ext.lower()}'
+
+    def content_name(self, name, content):
+        """The blob name `content` is stored under when uploaded as `name`."""
+        hasher = hashlib.sha256()
+        content.seek(0)
+        for chunk in content.chunks():
+            hasher.update(chunk)
+        return self.blob_name(hasher.hexdigest(), os.path.splitext(name)[1])
+
+    def save(self, name, content, max_length=None):
+        if name is None:
+            name = content.name
+        if not hasattr(content, 'chunks'):
+            content = File(content, name)
+        blob_name = self.content_name(name, content)
+        if not self.exists(blob_name):
+            content.seek(0)
+            saved = self._save(blob_name, content)
+            if saved != blob_name:
+                # The same bytes were written concurrently by another request
+                # and _save() picked an alternate name; keep theirs.
+                self.delete(saved)
+        return blob_name
+
+    def save_derivative(self, name, content):
+        """
+        Store a derivative of a blob verbatim. Decided by the caller, never by
+        the name: an upload called 'logo.w640.jpg' is still hashed and counted.
+        """
+        return super().save(name, content)
+
+    def add_reference(self, name):
+        """Count one more field pointing at `name`."""
+        if not self.is_blob(name):
+            return
+        MediaBlob = apps.get_model('protfolio', 'MediaBlob')
+        with transaction.atomic():
+            blob, created = MediaBlob.objects.get_or_create(name=name, defaults={'size': self.size(name)})
+            if not created:
+                MediaBlob.objects.filter(pk=blob.pk).update(ref_count=F('ref_count') + 1)
+
+    def release(self, name):
+        """Drop one reference to `name`; the blob is deleted on commit when none are left."""
+        if not self.is_blob(name):
+            return
+        MediaBlob = apps.get_model('protfolio', 'MediaBlob')
+        with transaction.atomic():
+            MediaBlob.objects.filter(name=name).update(ref_count=F('ref_count') - 1)
+            orphaned = MediaBlob.objects.filter(name=name, ref_count__lte=0).delete()[0]
+        if orphaned:
+            # Once committed: a rollback brings the row back, and its file.
+            transaction.on_commit(lambda: self._delete_orphan(name))
+
+    def _delete_orphan(self, name):
+        MediaBlob = apps.get_model('protfolio', 'MediaBlob')
+        if MediaBlob.objects.filter(name=name).exists():
+            # The same bytes were uploaded again since.
+            return
+        self.delete(name)
+        delete_derivatives(name, self)
+
+
+content_addressed_storage = ContentAddressedStorage()
+
+
+def media_storage():
+    return content_addressed_storage
+
+
+# --- Static Files ---
+
+# Text formats worth compressing; images and woff2 fonts already are.
+COMPRESSIBLE_EXTENSIONS = {'.css', '.js', '.map', '.svg', '.json', '.txt', '.ttf', '.html'}
+
+
+class CompressedManifestStaticFilesStorage(ManifestStaticFilesStorage):
+    """
+    collectstatic storage that fingerprints every file (app.3f9a1c.css) and
+    writes .gz and, with the brotli package, .br copies of the text files.
+    Serve STATIC_ROOT with far-future immutable caching, e.g. in nginx:
+
+        location /static/ { gzip_static on; brotli_static on; expires max; add_header Cache-Control immutable; }
+    """
+
+    def stored_name(self, name):
+        # Nothing collected yet (development, tests): fall back to the plain
+        # name rather than failing every {% static %} tag.
+        if not self.hashed_files:
+            return name
+        return super().stored_name(name)
+
+    def post_process(self, paths, dry_run=False, **options):
+        hashed = {}
+        for name, hashed_name, processed in super().post_process(paths, dry_run, **options):
+            if isinstance(hashed_name, str):
+                hashed[name] = hashed_name
+            yield name, hashed_name, processed
+        if dry_run:
+            return
+        for name in [*paths, *hashed.values()]:
+            if os.path.splitext(name)[1].lower() in COMPRESSIBLE_EXTENSIONS:
+                self.compress(name)
+
+    def compress(self, name):
+        with self.open(name) as source:
+            data = source.read()
+        path = self.path(name)
+        with open(f'{path}.gz', 'wb') as target:
+            target.write(gzip.compress(data, compresslevel=9, mtime=0))
+        if brotli is not None:
+            with open(f'{path}.br', 'wb') as target:
+                target.write(brotli.compress(data))
@@ -0,0 +1,193 @@
+import hashlib
+import json
+import logging
+import time
+import traceback
+from datetime import timedelta
+
+from django.apps import apps
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Min
+from django.utils import timezone
+
+from .metrics import percentile
+
+logger = logging.getLogger(__name__)
+
+# Run tasks in the web process (after the transaction commits) instead of
+# queueing them; for development without a run_tasks worker.
+TASKS_EAGER = getattr(settings, 'TASKS_EAGER', False)
+TASK_MAX_ATTEMPTS = getattr(settings, 'TASK_MAX_ATTEMPTS', 5)
+# Seconds before the first retry; doubled after every further failure.
+TASK_RETRY_DELAY = getattr(settings, 'TASK_RETRY_DELAY', 10)
+# A task running longer than this is assumed to have lost its worker.
+TASK_TIMEOUT = getattr(settings, 'TASK_TIMEOUT', 10 * 60)
+# Finished tasks are kept this long for the dashboard.
+TASK_RETENTION = getattr(settings, 'TASK_RETENTION', timedelta(days=7))
+
+# Every function that can be queued, by name. Registered with @task where the
+# function lives, so the names stored in the queue never depend on imports.
+TASKS = {}
+
+
+def _model():
+    # Looked up lazily: models.py registers its own tasks from this module.
+    return apps.get_model('protfolio', 'Task')
+
+
+def task(func):
+    """Register `func` as a background task under its function name."""
+    if func.__name__ in TASKS:
+        raise ValueError(f"Task {func.__name__!r} is already registered")
+    TASKS[func.__name__] = func
+    return func
+
+
+def task_key(name, args):
+    return hashlib.sha256(json.dumps([name, args]).encode()).hexdigest()
+
+
+def _run_eagerly(name, args):
+    try:
+        TASKS[name](*args)
+    except Exception:
+        logger.exception("Task %s%r failed", name, tuple(args))
+
+
+def enqueue(name, *args):
+    """
+    Queue TASKS[name](*args). The row is written in the caller's transaction,
+    so the task only becomes visible to workers if the change that queued it
+    commits. An identical task that is still pending is not queued twice.
+    Returns the new Task, or None if it was a duplicate (or ran eagerly).
+    """
+    if name not in TASKS:
+        raise KeyError(f"Unknown task {name!r}")
+    args = list(args)
+    if TASKS_EAGER:
+        transaction.on_commit(lambda: _run_eagerly(name, args))
+        return None
+    Task = _model()
+    try:
+        with transaction.atomic():
+            return Task.objects.create(name=name, args=args, key=task_key(name, args))
+    except IntegrityError:
+        return None
+
+
+# --- Worker ---
+
+def claim():
+    """Mark the next due task as running and return it, or None if nothing is due."""
+    Task = _model()
+    now = timezone.now()
+    # Write transactions are IMMEDIATE, so two workers can't pick the same row.
+    with transaction.atomic():
+        task = Task.objects.filter(status=Task.PENDING, run_at__lte=now).order_by('run_at', 'id').first()
+        if task is None:
+            return None
+        Task.objects.filter(pk=task.pk).update(
+            status=Task.RUNNING, started_at=now, attempts=F('attempts') + 1,
+        )
+    task.refresh_from_db()
+    return task
+
+
+def _retry_or_fail(task, error):
+    Task = _model()
+    now = timezone.now()
+    if task.attempts >= TASK_MAX_ATTEMPTS:
+        Task.objects.filter(pk=task.pk).update(status=Task.FAILED, finished_at=now, last_error=error)
+        return
+    delay = TASK_RETRY_DELAY * 2 ** (task.attempts - 1)
+    try:
+        with transaction.atomic():
+            Task.objects.filter(pk=task.pk).update(
+                status=Task.PENDING, run_at=now + timedelta(seconds=delay), last_error=error,
+            )
+    except IntegrityError:
+        # The same work was queued again meanwhile; that copy will do it.
+        Task.objects.filter(pk=task.pk).delete()
+
+
+def run(task):
+    """Run a claimed task and record the outcome."""
+    Task = _model()
+    try:
+        TASKS[task.name](*task.args)
+    except KeyboardInterrupt:
+        # Shutting down: give the attempt back and let another worker run it.
+        Task.objects.filter(pk=task.pk).update(status=Task.PENDING, attempts=F('attempts') - 1)
+        raise
+    except Exception:
+        logger.exception("Task %s%r failed (attempt %d)", task.name, tuple(task.args), task.attempts)
+        _retry_or_fail(task, traceback.format_exc())
+    else:
+        Task.objects.filter(pk=task.pk).update(status=Task.DONE, finished_at=timezone.now(), last_error='')
+
+
+def work(poll=1.0, once=False):
+    """Run tasks until interrupted (or, with once=True, until none are due)."""
+    processed = 0
+    while True:
+        task = claim()
+        if task is None:
+            if once:
+                return processed
+            time.sleep(poll)
+            continue
+        run(task)
+        processed += 1
+
+
+def recover_stalled():
+    """Retry (or fail) tasks whose worker died while running them."""
+    Task = _model()
+    cutoff = timezone.now() - timedelta(seconds=TASK_TIMEOUT)
+    stalled = list(Task.objects.filter(status=Task.RUNNING, started_at__lt=cutoff))
+    for task in stalled:
+        _retry_or_fail(task, f"No result after {TASK_TIMEOUT}s; the worker probably stopped.")
+    return len(stalled)
+
+
+def prune():
+    Task = _model()
+    cutoff = timezone.now() - TASK_RETENTION
+    return Task.objects.filter(status__in=(Task.DONE, Task.FAILED), finished_at__lt=cutoff).delete()[0]
+
+
+# --- Dashboard ---
+
+def queue_stats(sample_size=1000):
+    """Queue depth by status, and per-task latency of the latest finished tasks."""
+    Task = _model()
+    now = timezone.now()
+    depth = dict(Task.objects.order_by().values_list('status').annotate(Count('id')))
+    oldest_due = Task.objects.filter(status=Task.PENDING, run_at__lte=now).aggregate(Min('run_at'))['run_at__min']
+
+    recent = (
+        Task.objects.filter(status=Task.DONE).order_by('-finished_at')
+        .values_list('name', 'created_at', 'started_at', 'finished_at')[:sample_size]
+    )
+    latencies, runtimes = {}, {}
+    for name, created_at, started_at, finished_at in recent:
+        latencies.setdefault(name, []).append((finished_at - created_at).total_seconds())
+        runtimes.setdefault(name, []).append((finished_at - started_at).total_seconds())
+    rows = []
+    for name in sorted(latencies):
+        latency, runtime = sorted(latencies[name]), sorted(runtimes[name])
+        rows.append({
+            'name': name,
+            'count': len(latency),
+            'latency_p50': percentile(latency, 0.50),
+            'latency_p95': percentile(latency, 0.95),
+            'runtime_p50': percentile(runtime, 0.50),
+            'runtime_p95': percentile(runtime, 0.95),
+        })
+    return {
+        'depth': {status: depth.get(status, 0) for status, _ in Task.STATUS_CHOICES},
+        'oldest_due_seconds': (now - oldest_due).total_seconds() if oldest_due else 0,
+        'rows': rows,
+        'failures': Task.objects.filter(status=Task.FAILED).order_by('-finished_at')[:20],
+    }
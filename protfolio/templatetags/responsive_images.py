@@ -0,0 +1,34 @@
+from django import template
+from django.utils.html import format_html
+
+from protfolio.images import DERIVATIVE_WIDTHS, derivative_name
+
+register = template.Library()
+
+
+def _srcset(image, webp=False):
+    storage = image.storage
+    return ', '.join(
+        f'{storage.url(derivative_name(image.name, width, webp=webp))} {width}w'
+        for width in DERIVATIVE_WIDTHS
+    )
+
+
+@register.simple_tag
+def responsive_image(image, alt='', sizes='100vw', css_class='', loading='lazy'):
+    """
+    Render an ImageField as a <picture> with a WebP srcset and a srcset in the
+    original format, falling back to the untouched upload for `src`.
+
+        {% responsive_image post.image alt=post.title sizes="(min-width: 1024px) 33vw, 100vw" css_class="w-full" %}
+    """
+    if not image:
+        return ''
+    return format_html(
+        '<picture>'
+        '<source type="image/webp" srcset="{}" sizes="{}">'
+        '<img src="{}" srcset="{}" sizes="{}" alt="{}" class="{}" loading="{}" decoding="async">'
+        '</picture>',
+        _srcset(image, webp=True), sizes,
+        image.url, _srcset(image), sizes, alt, css_class, loading,
+    )
@@ -0,0 +1,16 @@
+from django import template
+
+from protfolio.assets import APP_CSS, bundle_built
+
+register = template.Library()
+
+
+@register.inclusion_tag('partials/head_assets.html')
+def head_assets():
+    """Stylesheets for <head>: the compiled bundle, or the CDN fallback before build_assets has run."""
+    return {'built': bundle_built(), 'app_css': APP_CSS}
+
+
+@register.inclusion_tag('partials/aos_script.html')
+def aos_script():
+    return {'built': bundle_built()}
@@ -1,3 +1,1280 @@
-from django.test import TestCase
+import asyncio
+import base64
+import gzip
+import io
+import os
+import tempfile
+import time
+from datetime import timedelta
+from pathlib import Path
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import ThreadSensitiveContext, async_to_sync, sync_to_async
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.core.cache import cache
+from django.core.cache.utils import make_template_fragment_key
+from django.core.files.base import ContentFile
+from django.core.management import call_command
+from django.db import OperationalError, connection, transaction
+from django.db.models import Count
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
+from django.test import Client as TestClient, RequestFactory, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from PIL import Image
+
+from . import analytics, assets, compression, media, metrics, profiling, routers, search, static_export, tasks
+from .profiling import Sampler, _sync_threads, sampled
+from .cache import page_cache_key, page_version
+from .cache_backend import SQLiteCache
+from .models import (
+    BlogPost, Client, Developer, MediaBlob, PageView, Profile, Review, ReviewStats, Service,
+    StaticPageChange, Task,
+)
+from .pagination import decode_cursor, encode_cursor
+from .routers import REPLICA, ReadReplicaRouter, prefer_replica, primary_only
+from .storage import content_addressed_storage
+
+PASSWORD = 'Str0ng-pass-123'
+
+
+_cache_dir = tempfile.TemporaryDirectory()
+# The configured cache is shared with the real site: tests get their own,
+# empty one. Page views are only counted where a test asks for them.
+test_settings = override_settings(
+    CACHES={'default': {
+        'BACKEND': 'protfolio.cache_backend.SQLiteCache',
+        'LOCATION': os.path.join(_cache_dir.name, 'cache.sqlite3'),
+    }},
+    PAGE_ANALYTICS=False,
+)
+
+
+def setUpModule():
+    test_settings.enable()
+
+
+def tearDownModule():
+    test_settings.disable()
+    _cache_dir.cleanup()
+
+
+def write_queries(queries):
+    return [q['sql'] for q in queries if q['sql'].startswith(('INSERT', 'UPDATE', 'DELETE'))]
+
+
+class ProfileWriteTests(TestCase):
+    def test_login_does_not_write_profile(self):
+        User.objects.create_user('alice', password=PASSWORD)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(reverse('login'), {'username': 'alice', 'password': PASSWORD})
+        writes = write_queries(queries)
+        self.assertRedirects(response, reverse('home'))
+        # Session insert, last_login update, session update.
+        self.assertEqual(len(writes), 3, writes)
+        self.assertFalse([sql for sql in writes if 'protfolio_profile' in sql])
+
+    def test_register_writes_profile_once(self):
+        data = {'username': 'bob', 'email': 'bob@example.com', 'password1': PASSWORD, 'password2': PASSWORD}
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(reverse('register'), data)
+        writes = write_queries(queries)
+        self.assertRedirects(response, reverse('home'))
+        # User insert, profile insert, session insert, last_login update, session update.
+        self.assertEqual(len(writes), 5, writes)
+        profile_writes = [sql for sql in writes if 'protfolio_profile' in sql]
+        self.assertEqual(len(profile_writes), 1, profile_writes)
+        self.assertTrue(profile_writes[0].startswith('INSERT'))
+        self.assertEqual(User.objects.get(username='bob').profile.role, 'CLIENT')
+
+    def test_role_change_updates_only_role(self):
+        admin = User.objects.create_user('admin', password=PASSWORD)
+        Profile.objects.filter(user=admin).update(role='SUPERADMIN')
+        member = User.objects.create_user('carol', password=PASSWORD)
+        self.client.force_login(admin)
+        with CaptureQueriesContext(connection) as queries:
+            self.client.post(reverse('user_management'), {'user_id': member.pk, 'role': 'VISITOR'})
+        profile_writes = [sql for sql in write_queries(queries) if 'protfolio_profile' in sql]
+        self.assertEqual(len(profile_writes), 1, profile_writes)
+        self.assertRegex(profile_writes[0], r'^UPDATE "protfolio_profile" SET "role" = \S+ WHERE')
+        self.assertEqual(Profile.objects.get(user=member).role, 'VISITOR')
+
+
+class QueryPlanTests(TestCase):
+    """
+    Every SELECT a listing view runs must be answered through an index: no
+    full table scan and no temporary B-tree to sort. Pages that show every row
+    of a table on purpose name that table in `full_listings`.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_user('admin', password=PASSWORD)
+        Profile.objects.filter(user=cls.admin).update(role='SUPERADMIN')
+        # bulk_create skips the image signals; these files don't exist.
+        [cls.post] = BlogPost.objects.bulk_create([BlogPost(
+            title='Indexes', content='<p>Keep every listing on an index.</p>',
+            image='blog_images/plan.jpg', author=cls.admin,
+        )])
+        Developer.objects.bulk_create([
+            Developer(name='Dana', position='Engineer', experience=3, image='developers/d.jpg', bio='Databases.'),
+        ])
+        Client.objects.bulk_create([Client(name='Acme', logo='client_logos/acme.png', display_order=1)])
+        Review.objects.create(user=cls.admin, review_text='Fast pages.', rating=5)
+        Service.objects.create(title='Hosting', description='Managed hosting.', icon_class='fas fa-server')
+
+    def setUp(self):
+        cache.clear()
+
+    def query_plans(self, url):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200, url)
+        plans = []
+        with connection.cursor() as cursor:
+            for query in queries:
+                if not query['sql'].startswith('SELECT'):
+                    continue
+                cursor.execute(f"EXPLAIN QUERY PLAN {query['sql']}")
+                plans.append((query['sql'], [row[-1] for row in cursor.fetchall()]))
+        return plans
+
+    def assertIndexedQueries(self, url, full_listings=()):
+        for sql, plan in self.query_plans(url):
+            # Full-text matches are ranked by score, which no index can order.
+            ranked = any('VIRTUAL TABLE' in step for step in plan)
+            for step in plan:
+                if not ranked:
+                    self.assertNotIn('USE TEMP B-TREE', step, f'{url}: sort without an index\n{sql}\n{plan}')
+                words = step.split()
+                if words[0] == 'SCAN' and 'USING' not in words and 'VIRTUAL' not in words:
+                    self.assertIn(words[1], full_listings, f'{url}: full table scan\n{sql}\n{plan}')
+
+    def test_public_pages(self):
+        self.assertIndexedQueries(reverse('home'), full_listings={'protfolio_service'})
+        self.assertIndexedQueries(reverse('services'), full_listings={'protfolio_service'})
+        self.assertIndexedQueries(reverse('about_us'), full_listings={'protfolio_developer'})
+        self.assertIndexedQueries(reverse('blog_detail', args=[self.post.pk]))
+        self.assertIndexedQueries(reverse('search') + '?q=index')
+
+    def test_blog_listing(self):
+        cursor = encode_cursor(self.post.created_at, self.post.pk)
+        self.assertIndexedQueries(reverse('blog'))
+        self.assertIndexedQueries(reverse('blog') + f'?cursor={cursor}')
+
+    def test_review_listing(self):
+        review = Review.objects.get()
+        cursor = encode_cursor(review.created_at, review.pk)
+        for query in ('', '?rating=5', f'?cursor={cursor}', f'?rating=5&cursor={cursor}'):
+            self.assertIndexedQueries(reverse('review_page') + query)
+            self.assertIndexedQueries(reverse('review_feed') + query)
+
+    def test_tampered_cursor_shows_first_page(self):
+        for raw in (b'99999999999999999999:1', b'-5:1', b'0:99999999999999999999', b'x:1'):
+            cursor = base64.urlsafe_b64encode(raw).decode()
+            self.assertIsNone(decode_cursor(cursor), raw)
+            for name in ('blog', 'review_page', 'review_feed'):
+                self.assertEqual(self.client.get(reverse(name), {'cursor': cursor}).status_code, 200, name)
+
+    def test_admin_listings(self):
+        self.client.force_login(self.admin)
+        self.assertIndexedQueries(reverse('user_management'), full_listings={'auth_user'})
+        User.objects.filter(pk=self.admin.pk).update(is_staff=True, is_superuser=True)
+        self.assertIndexedQueries(reverse('admin:protfolio_profile_changelist') + '?role__exact=CLIENT')
+        self.assertIndexedQueries(reverse('admin:protfolio_client_changelist'))
+
+
+class ReviewFeedTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        users = [User.objects.create_user(f'user{n}', password=PASSWORD) for n in range(3)]
+        Review.objects.bulk_create([
+            Review(user=users[n % 3], review_text=f'Review {n}', rating=n % 5 + 1) for n in range(45)
+        ])
+        # Ties on created_at are ordered by pk, across page boundaries too.
+        stamp = timezone.now() - timedelta(days=1)
+        Review.objects.filter(pk__in=Review.objects.order_by('pk').values('pk')[15:30]).update(created_at=stamp)
+
+    def walk(self, **params):
+        ids, cursor, pages = [], None, 0
+        while True:
+            query = {**params, **({'cursor': cursor} if cursor else {})}
+            with self.assertNumQueries(1):
+                data = self.client.get(reverse('review_feed'), query).json()
+            ids += [result['id'] for result in data['results']]
+            pages += 1
+            cursor = data['next_cursor']
+            if cursor is None:
+                return ids, pages
+
+    def test_pages_cover_every_review_once_newest_first(self):
+        ids, pages = self.walk()
+        self.assertEqual(ids, list(Review.objects.order_by('-created_at', '-pk').values_list('pk', flat=True)))
+        self.assertEqual(pages, 3)
+
+    def test_rating_filter(self):
+        ids, pages = self.walk(rating='2')
+        self.assertEqual(ids, list(Review.objects.filter(rating=2).order_by('-created_at', '-pk').values_list('pk', flat=True)))
+        self.assertEqual(pages, 1)
+        self.assertEqual(len(self.walk(rating='9')[0]), 45)
+
+    def test_html_fragments_carry_the_next_cursor(self):
+        response = self.client.get(reverse('review_feed'), {'format': 'html'})
+        self.assertEqual(response.content.decode().count('class="review-card '), 20)
+        data = self.client.get(reverse('review_feed')).json()
+        self.assertEqual(response['X-Next-Cursor'], data['next_cursor'])
+        self.assertEqual(data['results'][0]['username'], Review.objects.order_by('-created_at', '-pk')[0].user.username)
+
+
+class AnonymousPageCacheTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.service = Service.objects.create(title='Hosting', description='Managed hosting.', icon_class='fas fa-server')
+        cls.developer = Developer.objects.create(
+            name='Dana', position='Engineer', experience=3, image='', bio='Databases.',
+        )
+
+    def setUp(self):
+        cache.clear()
+
+    def assertCached(self, url, cached=True):
+        # A hit runs the conditional GET aggregate only, never the view.
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(queries) == 1, cached, url)
+        return response
+
+    def test_anonymous_views_are_cached_per_url(self):
+        first = self.assertCached(reverse('services'), cached=False)
+        self.assertEqual(self.assertCached(reverse('services')).content, first.content)
+        self.assertCached(reverse('services') + '?utm=1', cached=False)
+
+    def test_logged_in_users_get_a_fresh_render(self):
+        self.assertCached(reverse('services'), cached=False)
+        self.client.force_login(User.objects.create_user('erin', password=PASSWORD))
+        self.assertContains(self.client.get(reverse('services')), reverse('logout'))
+        self.client.logout()
+        self.assertNotContains(self.assertCached(reverse('services')), reverse('logout'))
+
+    def test_saves_only_invalidate_the_pages_of_their_model(self):
+        self.assertCached(reverse('services'), cached=False)
+        self.assertCached(reverse('about_us'), cached=False)
+        stale_key = page_cache_key('about_us', RequestFactory().get(reverse('about_us')))
+        self.assertIsNotNone(cache.get(stale_key))
+
+        self.developer.bio = 'Databases and caches.'
+        self.developer.save()
+        # Tagged, so the superseded copy is dropped rather than left to LRU.
+        self.assertIsNone(cache.get(stale_key))
+        self.assertContains(self.assertCached(reverse('about_us'), cached=False), 'Databases and caches.')
+        self.assertCached(reverse('services'))
+
+        self.service.delete()
+        self.assertCached(reverse('services'), cached=False)
+        self.assertCached(reverse('about_us'))
+
+
+@override_settings(REQUEST_METRICS=True)
+class RequestMetricsTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.services = [
+            Service.objects.create(title=f'Service {n}', description='Managed.', icon_class='fas fa-server')
+            for n in range(3)
+        ]
+
+    def setUp(self):
+        cache.clear()
+        metrics.clear()
+
+    def test_requests_are_recorded_per_view(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('services'))
+        [record] = metrics.recent()
+        self.assertEqual((record['view'], record['status'], record['queries']), ('services', 200, len(queries)))
+        self.assertEqual(record['size'], len(response.content))
+        self.assertGreater(record['template_ms'], 0)
+        self.assertGreaterEqual(record['total_ms'], record['db_ms'] + record['template_ms'])
+        self.assertEqual(record['n_plus_one'], [])
+
+    def test_repeated_query_shapes_are_reported(self):
+        def view(request):
+            # One query per row, with IN lists of different lengths.
+            for count in range(1, 4):
+                list(Service.objects.filter(pk__in=[service.pk for service in self.services[:count]]))
+            return HttpResponse('ok')
+
+        request = RequestFactory().get('/n-plus-one/')
+        with self.assertLogs('protfolio.metrics', 'WARNING') as logs:
+            metrics.RequestMetricsMiddleware(view)(request)
+        [record] = metrics.recent()
+        self.assertEqual(record['queries'], 3)
+        self.assertEqual([suspect['count'] for suspect in record['n_plus_one']], [3])
+        self.assertIn('IN (...)', record['n_plus_one'][0]['query'])
+        self.assertIn('Possible N+1 in /n-plus-one/', logs.output[0])
+
+    def test_summary_percentiles_slowest_first(self):
+        for view, total in [('fast', ms) for ms in range(1, 101)] + [('slow', 500), ('slow', 900)]:
+            record = metrics.RequestRecord()
+            record.view, record.total_time = view, total / 1000
+            metrics.store(record)
+        rows = metrics.summary()
+        self.assertEqual([row['view'] for row in rows], ['slow', 'fast'])
+        self.assertEqual((rows[1]['requests'], rows[1]['p50_ms'], rows[1]['p95_ms'], rows[1]['p99_ms']), (100, 50, 95, 99))
+        self.assertEqual(rows[0]['p50_ms'], 500)
+
+
+class AsyncPageTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user('author', password=PASSWORD)
+        # bulk_create skips the image signals; these files don't exist.
+        [cls.post] = BlogPost.objects.bulk_create([BlogPost(
+            title='Async views', content='<p>Awaited together.</p>',
+            image='blog_images/a.jpg', author=cls.author,
+        )])
+        Service.objects.create(title='Hosting', description='Managed hosting.', icon_class='fas fa-server')
+        Client.objects.bulk_create([Client(name='Acme', logo='client_logos/acme.png', display_order=1)])
+        Developer.objects.bulk_create([
+            Developer(name='Dana', position='Engineer', experience=3, image='developers/d.jpg', bio='Databases.'),
+        ])
+        Review.objects.create(user=cls.author, review_text='Fast pages.', rating=5)
+
+    def setUp(self):
+        cache.clear()
+
+    async def test_concurrent_requests_render_their_own_pages(self):
+        pages = {
+            reverse('home'): 'Acme',
+            reverse('services'): 'Managed hosting.',
+            reverse('blog'): reverse('blog_detail', args=[self.post.pk]),
+            reverse('blog_detail', args=[self.post.pk]): '<title>Async views',
+            reverse('about_us'): 'Dana',
+            reverse('review_page'): 'Fast pages.',
+        }
+        responses = await asyncio.gather(*(self.async_client.get(url) for url in pages))
+        for (url, text), response in zip(pages.items(), responses):
+            self.assertContains(response, text, msg_prefix=url)
+        self.assertEqual((await self.async_client.get(reverse('blog_detail', args=[self.post.pk + 1]))).status_code, 404)
+
+    def test_home_page_queries_do_not_grow_with_its_rows(self):
+        def count_queries():
+            cache.clear()
+            with CaptureQueriesContext(connection) as queries:
+                self.assertEqual(self.client.get(reverse('home')).status_code, 200)
+            return len(queries)
+
+        before = count_queries()
+        Service.objects.bulk_create([
+            Service(title=f'Plan {n}', description='Managed.', icon_class='fas fa-server') for n in range(3)
+        ])
+        Client.objects.bulk_create([
+            Client(name=f'Client {n}', logo='client_logos/c.png', display_order=n + 2) for n in range(5)
+        ])
+        self.assertEqual(count_queries(), before)
+
+    async def test_cached_page_is_served_without_the_view(self):
+        await self.async_client.get(reverse('home'))
+        with mock.patch('protfolio.views._alist') as alist:
+            response = await self.async_client.get(reverse('home'))
+        alist.assert_not_called()
+        self.assertContains(response, 'Acme')
+
+
+class ConditionalGetTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.service = Service.objects.create(title='Hosting', description='Managed hosting.', icon_class='fas fa-server')
+
+    def setUp(self):
+        cache.clear()
+
+    def test_unchanged_page_is_not_modified(self):
+        response = self.client.get(reverse('services'))
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('Last-Modified', response)
+        # Only the validator query runs; the page cache and view are skipped.
+        with self.assertNumQueries(1):
+            response = self.client.get(reverse('services'), HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 304)
+
+    def test_edit_changes_the_etag(self):
+        etag = self.client.get(reverse('services'))['ETag']
+        self.service.title = 'Managed hosting'
+        self.service.save()
+        self.assertEqual(self.client.get(reverse('services'), HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_delete_changes_the_etag(self):
+        Service.objects.create(title='Backups', description='Nightly.', icon_class='fas fa-database')
+        etag = self.client.get(reverse('services'))['ETag']
+        # Not the newest row, so only the count tells the pages apart.
+        self.service.delete()
+        self.assertEqual(self.client.get(reverse('services'), HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_etag_depends_on_user(self):
+        etag = self.client.get(reverse('services'))['ETag']
+        self.client.force_login(User.objects.create_user('erin', password=PASSWORD))
+        self.assertEqual(self.client.get(reverse('services'), HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_page_with_a_csrf_token_is_not_revalidated_after_login(self):
+        User.objects.create_user('erin', password=PASSWORD)
+        client = TestClient(enforce_csrf_checks=True)
+
+        def log_in():
+            client.get(reverse('login'))
+            client.post(reverse('login'), {
+                'username': 'erin', 'password': PASSWORD,
+                'csrfmiddlewaretoken': client.cookies['csrftoken'].value,
+            })
+
+        log_in()
+        response = client.get(reverse('review_page'))
+        etag = response['ETag']
+        self.assertIn('Cookie', response['Vary'])
+        client.get(reverse('logout'))
+        # Login rotates the CSRF secret, so the page (and its token) is new.
+        log_in()
+        response = client.get(reverse('review_page'), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        token = response.context['csrf_token']
+        response = client.post(reverse('submit_review'), {
+            'review_text': 'Fast pages.', 'rating': 5, 'csrfmiddlewaretoken': token,
+        })
+        self.assertEqual(response.status_code, 302)
+        self.assertTrue(Review.objects.filter(user__username='erin').exists())
+
+
+class ReviewStatsTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('erin', password=PASSWORD)
+
+    def assertStatsCurrent(self):
+        counts = dict(Review.objects.values_list('rating').annotate(n=Count('id')).order_by())
+        expected = [sum(counts.values()), sum(r * n for r, n in counts.items())]
+        expected += [counts.get(r, 0) for r in range(1, 6)]
+        stats = ReviewStats.load()
+        self.assertEqual([stats.total, stats.rating_sum] + [getattr(stats, f'rating_{r}') for r in range(1, 6)], expected)
+
+    def test_created_edited_and_deleted_reviews_are_counted(self):
+        reviews = [Review.objects.create(user=self.user, review_text='Good.', rating=r) for r in (5, 4, 4)]
+        self.assertStatsCurrent()
+
+        reviews[1].rating = 2
+        reviews[1].save()
+        self.assertStatsCurrent()
+        # Saving again, or without loading the rating, moves nothing.
+        reviews[1].save()
+        edited = Review.objects.only('review_text').get(pk=reviews[2].pk)
+        edited.review_text = 'Very good.'
+        edited.save()
+        self.assertStatsCurrent()
+
+        reviews[0].delete()
+        self.assertStatsCurrent()
+        Review.objects.only('pk').filter(pk=reviews[1].pk).delete()
+        self.assertStatsCurrent()
+        # Cascades from the user.
+        self.user.delete()
+        self.assertStatsCurrent()
+
+    def test_rebuild_invalidates_the_review_page(self):
+        Review.objects.create(user=self.user, review_text='Good.', rating=4)
+        cache.clear()
+        # Drifted, e.g. by an update() that skipped the signals.
+        ReviewStats.objects.update(total=99)
+        response = self.client.get(reverse('review_page'))
+        self.assertContains(response, '99+ Reviews')
+        call_command('rebuild_review_stats', stdout=io.StringIO())
+        response = self.client.get(reverse('review_page'), HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertContains(response, '1+ Reviews')
+
+
+class RenderBlogPostsTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        author = User.objects.create_user('admin', password=PASSWORD)
+        # bulk_create skips save(), so nothing is rendered yet.
+        [cls.post] = BlogPost.objects.bulk_create([BlogPost(
+            title='Caching', content='<p>Render once, serve many times.</p>',
+            image='blog_images/c.jpg', author=author,
+        )])
+
+    def setUp(self):
+        cache.clear()
+
+    def test_rendered_posts_invalidate_cached_pages(self):
+        response = self.client.get(reverse('blog'))
+        self.assertNotContains(response, 'Render once')
+        etag = response['ETag']
+        StaticPageChange.objects.all().delete()
+
+        call_command('render_blog_posts', stdout=io.StringIO())
+        response = self.client.get(reverse('blog'), HTTP_IF_NONE_MATCH=etag)
+        self.assertContains(response, 'Render once')
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertEqual(
+            set(StaticPageChange.objects.values_list('group', flat=True)),
+            {'blog', f'blog_detail:{self.post.pk}'},
+        )
+        # Nothing left to render: nothing is touched.
+        updated_at = BlogPost.objects.get().updated_at
+        call_command('render_blog_posts', stdout=io.StringIO())
+        self.assertEqual(BlogPost.objects.get().updated_at, updated_at)
+
+
+class StaticExportTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.service = Service.objects.create(title='Hosting', description='Managed hosting.', icon_class='fas fa-server')
+        author = User.objects.create_user('admin', password=PASSWORD)
+        cls.post = BlogPost.objects.create(title='Exports', content='<p>Static pages.</p>', author=author)
+
+    def setUp(self):
+        cache.clear()
+        self.root = Path(self.enterContext(tempfile.TemporaryDirectory()))
+
+    def export(self, *args):
+        call_command('export_static', '--output', str(self.root), '--workers', '1', '--no-assets', *args,
+                     stdout=io.StringIO())
+
+    def page(self, group):
+        return static_export.page_path(self.root, group)
+
+    def test_export_then_only_changed_pages(self):
+        self.export()
+        self.assertIn('Hosting', self.page('services').read_text())
+        self.assertIn('Exports', self.page(f'blog_detail:{self.post.pk}').read_text())
+        self.assertIsNotNone(static_export.read_manifest(self.root))
+        self.assertEqual(static_export.pending_changes(), {})
+
+        self.page('about_us').write_text('left alone')
+        self.service.title = 'Managed hosting'
+        self.service.save()
+        detail = self.page(f'blog_detail:{self.post.pk}')
+        self.post.delete()
+        self.export()
+        self.assertIn('Managed hosting', self.page('services').read_text())
+        self.assertFalse(detail.exists())
+        self.assertEqual(self.page('about_us').read_text(), 'left alone')
+        self.assertEqual(static_export.pending_changes(), {})
+
+        self.export('--full')
+        self.assertNotEqual(self.page('about_us').read_text(), 'left alone')
+
+
+class FrontEndAssetsTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.static_dir = Path(self.enterContext(tempfile.TemporaryDirectory()))
+        self.enterContext(override_settings(STATICFILES_DIRS=[*settings.STATICFILES_DIRS, self.static_dir]))
+        self.enterContext(mock.patch.object(assets, 'STATIC_DIR', self.static_dir))
+        self.enterContext(mock.patch.object(assets, '_built', False))
+        self.enterContext(mock.patch.object(assets, '_checked_at', None))
+
+    def build(self):
+        for path in [assets.APP_CSS, *assets.VENDOR_FILES]:
+            (self.static_dir / path).parent.mkdir(parents=True, exist_ok=True)
+            (self.static_dir / path).write_text('body { color: black; }')
+
+    def test_pages_use_the_cdn_until_the_bundle_is_built(self):
+        self.assertContains(self.client.get(reverse('services')), 'cdn.tailwindcss.com')
+        self.assertEqual([error.id for error in assets.check_bundle_built(None)], ['protfolio.E001'])
+
+        self.build()
+        self.assertEqual(assets.check_bundle_built(None), [])
+        # A running worker notices the build at its next check, in pages
+        # rendered from then on.
+        cache.clear()
+        with mock.patch.object(assets, 'BUNDLE_RECHECK_INTERVAL', 0):
+            response = self.client.get(reverse('services'))
+        self.assertNotContains(response, 'cdn.tailwindcss.com')
+        self.assertContains(response, f'/static/{assets.APP_CSS}')
+
+    def test_collected_bundle_is_linked_by_its_fingerprinted_name(self):
+        self.build()
+        static_root = self.enterContext(tempfile.TemporaryDirectory())
+        self.enterContext(override_settings(STATIC_ROOT=static_root))
+        call_command('collectstatic', interactive=False, verbosity=0)
+        stored = staticfiles_storage.stored_name(assets.APP_CSS)
+        self.assertRegex(stored, r'^build/app\.[0-9a-f]{12}\.css$')
+        self.assertTrue(os.path.exists(os.path.join(static_root, stored + '.gz')))
+        self.assertContains(self.client.get(reverse('services')), f'/static/{stored}')
+
+
+class FragmentCacheTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('erin', password=PASSWORD)
+        for title in ('Hosting', 'Backups', 'Design'):
+            Service.objects.create(title=title, description=f'{title}.', icon_class='fas fa-server')
+
+    def setUp(self):
+        cache.clear()
+        # Logged in, so the whole page is never served from the page cache.
+        self.client.force_login(self.user)
+
+    def test_other_cards_stay_cached_when_one_changes(self):
+        first, second, third = self.client.get(reverse('services')).context['services']
+        key = make_template_fragment_key('service_card', [third.pk, third.fragment_version, 'CLIENT'])
+        self.assertIsNotNone(cache.get(key))
+        cache.set(key, '<div>cached third card</div>')
+
+        # Moves the third card up one place.
+        first.delete()
+        second.title = 'Nightly backups'
+        second.save()
+        response = self.client.get(reverse('services'))
+        self.assertContains(response, 'Nightly backups')
+        self.assertContains(response, 'cached third card')
+
+
+class UserRoleTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('erin', password=PASSWORD)
+        Service.objects.create(title='Hosting', description='Managed hosting.', icon_class='fas fa-server')
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.user)
+
+    def profile_queries(self, url):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200, url)
+        return [q['sql'] for q in queries if 'protfolio_profile' in q['sql']]
+
+    def test_warm_role_cache_makes_no_profile_queries(self):
+        self.assertEqual(len(self.profile_queries(reverse('services'))), 1)
+        for name in ('home', 'services', 'blog', 'about_us', 'review_page'):
+            self.assertEqual(self.profile_queries(reverse(name)), [], name)
+
+    def test_role_change_invalidates_role_fragments_and_etag(self):
+        response = self.client.get(reverse('services'))
+        self.assertEqual(cache.get(f'user-role:{self.user.pk}'), 'CLIENT')
+        list_key = response.context['services_fragment_key']
+        self.assertIsNotNone(cache.get(make_template_fragment_key('service_list', [list_key, 'CLIENT'])))
+
+        profile = self.user.profile
+        profile.role = 'SUPERADMIN'
+        profile.save(update_fields=['role'])
+        self.assertIsNone(cache.get(f'user-role:{self.user.pk}'))
+
+        response = self.client.get(reverse('services'), HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(cache.get(f'user-role:{self.user.pk}'), 'SUPERADMIN')
+        self.assertIsNotNone(cache.get(make_template_fragment_key('service_list', [list_key, 'SUPERADMIN'])))
+
+
+recorded_calls = []
+
+@tasks.task
+def record_call(value):
+    recorded_calls.append(value)
+
+@tasks.task
+def always_fail():
+    raise RuntimeError('boom')
+
+
+class AdminSearchTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_superuser('admin', password=PASSWORD)
+        Service.objects.bulk_create([
+            Service(title=f'Hosting plan {n}', description='Managed hosting.', icon_class='fas fa-server')
+            for n in range(600)
+        ])
+        Service.objects.create(title='Design', description='Logos.', icon_class='fas fa-pen')
+        search.rebuild()
+
+    def setUp(self):
+        self.client.force_login(self.admin)
+
+    def changelist(self, term):
+        response = self.client.get(reverse('admin:protfolio_service_changelist'), {'q': term})
+        return response.context['cl'].result_count
+
+    def test_every_match_is_found(self):
+        self.assertEqual(self.changelist('host'), 600)
+        self.assertEqual(self.changelist('design'), 1)
+
+    def test_terms_match_word_prefixes(self):
+        self.assertEqual(self.changelist('sting'), 0)
+        self.assertEqual(self.changelist('!!'), 0)
+
+
+class SiteSearchTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        admin = User.objects.create_user('admin', password=PASSWORD)
+        cls.body_match = Service.objects.create(
+            title='Hosting', description='Managed hosting with caching in front of every site.',
+            icon_class='fas fa-server',
+        )
+        cls.title_match = Service.objects.create(
+            title='Caching & CDN', description='Edge delivery.', icon_class='fas fa-bolt',
+        )
+        # bulk_create skips the image signals (the file doesn't exist) and the index.
+        [cls.post] = BlogPost.objects.bulk_create([BlogPost(
+            title='Notes', content='<p>Caching pages for anonymous visitors.</p>',
+            image='blog_images/n.jpg', author=admin,
+        )])
+        search.index_object(cls.post)
+
+    def test_title_matches_rank_above_body_matches(self):
+        results = search.search('caching')
+        self.assertEqual(results[0]['pk'], self.title_match.pk)
+        self.assertEqual(str(results[0]['title']), '<mark>Caching</mark> &amp; CDN')
+        self.assertEqual(len(results), 3)
+
+    def test_kind_filter_and_prefixes(self):
+        self.assertEqual([(r['kind'], r['pk']) for r in search.search('cach', kind='blog')], [('blog', self.post.pk)])
+        self.assertEqual(search.search('ache'), [])
+        self.assertEqual(search.search('"caching" OR NOT'), [])
+
+    def test_index_follows_saves_and_deletes(self):
+        self.body_match.description = 'Managed hosting.'
+        self.body_match.save()
+        self.title_match.delete()
+        self.assertEqual([r['kind'] for r in search.search('caching')], ['blog'])
+
+    def test_search_page(self):
+        response = self.client.get(reverse('search'), {'q': 'caching', 'kind': 'service'})
+        self.assertEqual([r['pk'] for r in response.context['results']], [self.title_match.pk, self.body_match.pk])
+        self.assertContains(response, reverse('blog_detail', args=[self.post.pk]), count=0)
+
+
+class TaskQueueTests(TestCase):
+    def setUp(self):
+        recorded_calls.clear()
+
+    def test_identical_pending_tasks_are_queued_once(self):
+        tasks.enqueue('record_call', 1)
+        tasks.enqueue('record_call', 1)
+        tasks.enqueue('record_call', 2)
+        self.assertEqual(Task.objects.filter(status=Task.PENDING).count(), 2)
+
+    def test_worker_runs_due_tasks(self):
+        tasks.enqueue('record_call', 1)
+        tasks.enqueue('record_call', 2)
+        self.assertEqual(tasks.work(once=True), 2)
+        self.assertEqual(recorded_calls, [1, 2])
+        self.assertEqual(Task.objects.filter(status=Task.DONE).count(), 2)
+
+    @mock.patch.object(tasks, 'TASK_MAX_ATTEMPTS', 2)
+    def test_failures_back_off_then_give_up(self):
+        task = tasks.enqueue('always_fail')
+        with self.assertLogs('protfolio.tasks', 'ERROR'):
+            tasks.work(once=True)
+        task.refresh_from_db()
+        self.assertEqual((task.status, task.attempts), (Task.PENDING, 1))
+        self.assertGreater(task.run_at, timezone.now())
+        # Not due yet, so the worker leaves it alone.
+        self.assertEqual(tasks.work(once=True), 0)
+
+        Task.objects.filter(pk=task.pk).update(run_at=timezone.now())
+        with self.assertLogs('protfolio.tasks', 'ERROR'):
+            tasks.work(once=True)
+        task.refresh_from_db()
+        self.assertEqual((task.status, task.attempts), (Task.FAILED, 2))
+        self.assertIn('RuntimeError: boom', task.last_error)
+
+    def test_stalled_task_is_requeued(self):
+        task = tasks.enqueue('record_call', 1)
+        Task.objects.filter(pk=task.pk).update(
+            status=Task.RUNNING, attempts=1, started_at=timezone.now() - timedelta(hours=1),
+        )
+        self.assertEqual(tasks.recover_stalled(), 1)
+        task.refresh_from_db()
+        self.assertEqual(task.status, Task.PENDING)
+
+
+class CompressionTests(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_minify_keeps_whitespace_sensitive_elements(self):
+        html = (
+            '<div>\n    <!-- note -->\n    <p>a    b</p>\n</div>\n'
+            '<pre>  keep\n    this</pre><textarea>  and\n this</textarea>'
+            '<script>\n  var s = "  x  ";\n</script>'
+        )
+        self.assertEqual(compression.minify_html(html), (
+            '<div>\n<p>a b</p>\n</div>\n'
+            '<pre>  keep\n    this</pre><textarea>  and\n this</textarea>'
+            '<script>\n  var s = "  x  ";\n</script>'
+        ))
+
+    def test_cached_page_is_served_precompressed(self):
+        Service.objects.create(title='Hosting', description='Managed hosting.', icon_class='fas fa-server')
+        plain = self.client.get(reverse('services'))
+        self.assertFalse(plain.has_header('Content-Encoding'))
+        self.assertIn('Accept-Encoding', plain['Vary'])
+
+        with mock.patch.object(compression, 'encode', wraps=compression.encode) as encode:
+            response = self.client.get(reverse('services'), HTTP_ACCEPT_ENCODING='gzip, deflate')
+        encode.assert_not_called()
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(gzip.decompress(response.content), plain.content)
+        self.assertEqual(int(response['Content-Length']), len(response.content))
+
+    def respond(self, response, accept='gzip'):
+        middleware = compression.CompressionMiddleware(lambda request: response)
+        return middleware(RequestFactory().get('/', HTTP_ACCEPT_ENCODING=accept))
+
+    def test_best_accepted_coding_is_chosen(self):
+        encoded = {'gzip': b'', 'br': b''}
+        for header, coding in (
+            ('gzip, deflate, br', 'br'),
+            ('gzip, br;q=0', 'gzip'),
+            ('br;q=0.0, gzip;q=0', None),
+            ('*', 'br'),
+            ('identity', None),
+            ('', None),
+        ):
+            request = RequestFactory().get('/', HTTP_ACCEPT_ENCODING=header)
+            self.assertEqual(compression.negotiate(request, encoded), coding, header)
+        request = RequestFactory().get('/', HTTP_ACCEPT_ENCODING='br, gzip')
+        self.assertEqual(compression.negotiate(request, {'gzip': b''}), 'gzip')
+
+    def test_responses_are_minified_and_compressed(self):
+        html = '<p>\n    compress    me\n</p>' * 50
+        response = HttpResponse(html)
+        response['ETag'] = '"v1"'
+        response = self.respond(response)
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(response['Vary'], 'Accept-Encoding')
+        self.assertEqual(response['ETag'], 'W/"v1"')
+        self.assertEqual(gzip.decompress(response.content).decode(), '<p>\ncompress me\n</p>' * 50)
+
+        response = self.respond(JsonResponse({'words': ['compress  me'] * 50}))
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertIn(b'"compress  me"', gzip.decompress(response.content))
+
+    def test_small_streaming_binary_and_encoded_responses_are_left_alone(self):
+        small = self.respond(HttpResponse('<p>  small  </p>'))
+        self.assertEqual(small.content, b'<p> small </p>')
+        self.assertFalse(small.has_header('Vary'))
+        streaming = self.respond(StreamingHttpResponse(['<p>  x  </p>'] * 100))
+        self.assertFalse(streaming.has_header('Content-Encoding'))
+        self.assertEqual(b''.join(streaming), b'<p>  x  </p>' * 100)
+        image = self.respond(HttpResponse(b'\0' * 1000, content_type='image/png'))
+        self.assertFalse(image.has_header('Content-Encoding'))
+        encoded = HttpResponse(gzip.compress(b'x' * 1000), content_type='text/plain')
+        encoded['Content-Encoding'] = 'gzip'
+        self.assertEqual(gzip.decompress(self.respond(encoded).content), b'x' * 1000)
+
+
+class ContentAddressedStorageTests(TestCase):
+    def setUp(self):
+        root = tempfile.TemporaryDirectory()
+        self.addCleanup(root.cleanup)
+        self.enterContext(override_settings(MEDIA_ROOT=root.name))
+
+    def test_upload_named_like_a_derivative_is_still_a_blob(self):
+        name = content_addressed_storage.save('client_logos/logo.w640.jpg', ContentFile(b'logo bytes'))
+        self.assertTrue(content_addressed_storage.is_blob(name))
+        derivative = content_addressed_storage.save_derivative(name[:-4] + '.w640.jpg', ContentFile(b'small'))
+        self.assertEqual(derivative, name[:-4] + '.w640.jpg')
+
+    def test_references_follow_the_stored_name(self):
+        acme = Client.objects.create(name='Acme', logo=ContentFile(b'logo', name='acme.png'))
+        blob = acme.logo.name
+        # The same bytes again: same blob, no extra reference.
+        acme.logo.save('acme-again.png', ContentFile(b'logo'))
+        self.assertEqual(acme.logo.name, blob)
+        self.assertEqual(MediaBlob.objects.get(name=blob).ref_count, 1)
+
+        other = Client.objects.create(name='Other', logo=ContentFile(b'logo', name='other.png'))
+        self.assertEqual(MediaBlob.objects.get(name=blob).ref_count, 2)
+        other.delete()
+        with self.captureOnCommitCallbacks(execute=True):
+            acme.logo.save('new.png', ContentFile(b'new logo'))
+        self.assertFalse(MediaBlob.objects.filter(name=blob).exists())
+        self.assertFalse(content_addressed_storage.exists(blob))
+
+    def test_released_blob_survives_a_rollback(self):
+        acme = Client.objects.create(name='Acme', logo=ContentFile(b'logo', name='acme.png'))
+        blob = acme.logo.name
+        with self.captureOnCommitCallbacks(execute=True):
+            with self.assertRaises(RuntimeError), transaction.atomic():
+                acme.delete()
+                raise RuntimeError
+        self.assertEqual(MediaBlob.objects.get(name=blob).ref_count, 1)
+        self.assertTrue(content_addressed_storage.exists(blob))
+
+    def test_derivatives_are_queued_for_new_stored_names_only(self):
+        def queued():
+            return Task.objects.filter(name='build_image_derivatives', status=Task.PENDING).count()
+
+        acme = Client.objects.create(name='Acme', logo=ContentFile(b'logo', name='acme.png'))
+        Task.objects.update(status=Task.DONE)
+        acme.name = 'Acme Ltd'
+        acme.save()
+        acme.logo.save('acme-again.png', ContentFile(b'logo'))
+        self.assertEqual(queued(), 0)
+        acme.logo.save('new.png', ContentFile(b'new logo'))
+        self.assertEqual(queued(), 1)
+
+    def test_dedupe_media_invalidates_pages(self):
+        png = io.BytesIO()
+        Image.new('RGB', (4, 4)).save(png, 'PNG')
+        for name in ('client_logos/a.png', 'client_logos/b.png'):
+            content_addressed_storage.save_derivative(name, ContentFile(png.getvalue()))
+        # bulk_create skips the signals, like rows saved before blobs existed.
+        Client.objects.bulk_create([Client(name='A', logo='client_logos/a.png'), Client(name='B', logo='client_logos/b.png')])
+        version = page_version('home')
+        call_command('dedupe_media', stdout=io.StringIO())
+        [blob] = set(Client.objects.values_list('logo', flat=True))
+        self.assertTrue(content_addressed_storage.is_blob(blob))
+        self.assertEqual(MediaBlob.objects.get(name=blob).ref_count, 2)
+        self.assertGreater(page_version('home'), version)
+
+    def test_concurrent_upload_of_the_same_bytes_leaves_one_file(self):
+        name = content_addressed_storage.save('blog_images/a.png', ContentFile(b'same bytes'))
+        # The other request checked exists() before this one wrote the blob;
+        # _save() then finds it taken and settles on an alternate name.
+        with mock.patch.object(content_addressed_storage, 'exists', side_effect=[False, True, False]):
+            self.assertEqual(content_addressed_storage.save('blog_images/b.png', ContentFile(b'same bytes')), name)
+        self.assertEqual(os.listdir(os.path.dirname(content_addressed_storage.path(name))), [os.path.basename(name)])
+
+
+class MediaServingTests(TestCase):
+    def setUp(self):
+        root = tempfile.TemporaryDirectory()
+        self.addCleanup(root.cleanup)
+        self.enterContext(override_settings(MEDIA_ROOT=root.name))
+        os.makedirs(os.path.join(root.name, 'blobs', 'ab'))
+        self.blob = 'blobs/ab/' + 'ab' * 32 + '.png'
+        for name in (self.blob, 'blog_images/shot.png'):
+            os.makedirs(os.path.join(root.name, os.path.dirname(name)), exist_ok=True)
+            with open(os.path.join(root.name, name), 'wb') as file:
+                file.write(bytes(range(256)) * 4)
+
+    def url(self, name):
+        return reverse('media', args=[name])
+
+    def test_blob_is_immutable_and_revalidates(self):
+        response = self.client.get(self.url(self.blob))
+        self.assertEqual(b''.join(response.streaming_content), bytes(range(256)) * 4)
+        self.assertEqual(response['Content-Type'], 'image/png')
+        self.assertIn('immutable', response['Cache-Control'])
+        self.assertNotIn('immutable', self.client.get(self.url('blog_images/shot.png'))['Cache-Control'])
+        response = self.client.get(self.url(self.blob), HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 304)
+
+    def test_range(self):
+        response = self.client.get(self.url(self.blob), HTTP_RANGE='bytes=10-19')
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response['Content-Range'], 'bytes 10-19/1024')
+        self.assertEqual(b''.join(response.streaming_content), bytes(range(10, 20)))
+        response = self.client.get(self.url(self.blob), HTTP_RANGE='bytes=-4')
+        self.assertEqual(b''.join(response.streaming_content), bytes(range(252, 256)))
+        response = self.client.get(self.url(self.blob), HTTP_RANGE='bytes=2000-')
+        self.assertEqual(response.status_code, 416)
+
+    def test_missing_derivative_falls_back_to_original(self):
+        response = self.client.get(self.url('blog_images/shot.w640.webp'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'image/png')
+        self.assertNotIn('immutable', response['Cache-Control'])
+        self.assertEqual(self.client.get(self.url('blog_images/other.w640.webp')).status_code, 404)
+        self.assertEqual(self.client.get(self.url('../db.sqlite3')).status_code, 404)
+
+    def test_directories_are_not_found(self):
+        for path in ('/media/blog_images/', '/media/blog_images', '/media/blobs/ab/'):
+            self.assertEqual(self.client.get(path).status_code, 404, path)
+
+    def test_accel_redirect(self):
+        with mock.patch.object(media, 'MEDIA_ACCEL_REDIRECT', '/_protected_media/'):
+            response = self.client.get(self.url('blog_images/shot.png'))
+        self.assertEqual(response['X-Accel-Redirect'], '/_protected_media/blog_images/shot.png')
+        self.assertEqual(response.content, b'')
+
+
+class SQLiteCacheTests(TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.cache = SQLiteCache(os.path.join(directory.name, 'cache.sqlite3'), {'OPTIONS': {'MAX_BYTES': 10_000}})
+
+    def test_values_expiry_and_incr(self):
+        self.cache.set('page', {'body': b'x'})
+        self.assertEqual(self.cache.get('page'), {'body': b'x'})
+        self.assertFalse(self.cache.add('page', 'other'))
+        self.cache.set('version', 1, None)
+        self.assertEqual(self.cache.incr('version'), 2)
+        self.assertEqual(async_to_sync(self.cache.aincr)('version', 5), 7)
+        self.assertEqual(self.cache.get('version'), 7)
+        self.assertRaises(ValueError, self.cache.incr, 'missing')
+        self.cache.set('gone', 1, -1)
+        self.assertIsNone(self.cache.get('gone'))
+        self.assertTrue(self.cache.add('gone', 2))
+
+    def test_least_recently_used_are_evicted_over_the_byte_limit(self):
+        for index in range(8):
+            self.cache.set(f'entry-{index}', b'x' * 1000)
+            self.cache.get('entry-0')
+            self.cache._store.flush()
+        self.cache.set('entry-8', b'x' * 3000)
+        stats = self.cache.stats()
+        self.assertLessEqual(stats['bytes'], 10_000)
+        self.assertGreater(stats['evictions'], 0)
+        self.assertEqual(self.cache.get('entry-0'), b'x' * 1000)
+        self.assertIsNone(self.cache.get('entry-1'))
+
+    def test_tags_and_stats(self):
+        self.cache.set('blog-1', 'a', tags=['page:blog'])
+        async_to_sync(self.cache.aset)('blog-2', 'b', tags=['page:blog'])
+        self.cache.set('home', 'c', tags=['page:home'])
+        self.assertEqual(self.cache.invalidate_tags('page:blog'), 2)
+        self.assertEqual(self.cache.get_many(['blog-1', 'blog-2', 'home']), {'home': 'c'})
+        stats = self.cache.stats()
+        self.assertEqual((stats['hits'], stats['misses'], stats['entries']), (1, 2, 1))
+
+    def test_entry_limit_evicts_the_least_recently_read(self):
+        clock = iter(range(1_000_000, 2_000_000))
+        self.enterContext(mock.patch('time.time', lambda: next(clock)))
+        cache = SQLiteCache(self.cache._path, {'OPTIONS': {'MAX_ENTRIES': 10}})
+        for index in range(10):
+            cache.set(f'entry-{index}', index)
+        for index in (3, 0, 8):
+            cache.get(f'entry-{index}')
+        cache._store.flush()
+        # 11 entries: culled to 90% of the limit, oldest access first.
+        cache.set('entry-10', 10)
+        self.assertEqual(sorted(cache.get_many([f'entry-{index}' for index in range(11)]).values()),
+                         [0, 3, 4, 5, 6, 7, 8, 9, 10])
+        self.assertEqual(cache.stats()['evictions'], 2)
+
+    def test_sizes_are_accounted_across_instances(self):
+        other = SQLiteCache(self.cache._path, {})
+        self.cache.set('a', b'x' * 1000)
+        other.set('a', b'x' * 100)
+        other.set('b', 5)
+        self.assertEqual(self.cache.get('a'), b'x' * 100)
+        with self.cache._store.write() as db:
+            total = db.execute('SELECT sum(size), count(*) FROM cache').fetchone()
+        stats = self.cache.stats()
+        self.assertEqual((stats['bytes'], stats['entries']), total)
+        self.cache.delete('a')
+        self.assertEqual(other.stats()['bytes'], len(':1:b') + 8)
+
+    def test_tags_follow_the_latest_set(self):
+        self.cache.set('post', 'old', tags=['page:blog', 'page:home'])
+        self.cache.set('post', 'new', tags=['page:home'])
+        self.assertEqual(self.cache.invalidate_tags('page:blog'), 0)
+        self.assertEqual(self.cache.get('post'), 'new')
+        self.cache.delete('post')
+        self.cache.set('post', 'untagged')
+        self.cache.set('other', 'x', tags=['page:other'])
+        self.assertEqual(self.cache.invalidate_tags('page:home', 'page:other'), 1)
+        self.assertEqual(self.cache.get('post'), 'untagged')
+
+
+@override_settings(PAGE_ANALYTICS=True)
+class PageAnalyticsTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_user('admin', password=PASSWORD)
+        Profile.objects.filter(user=cls.admin).update(role='SUPERADMIN')
+        # bulk_create skips the image signals; the file doesn't exist.
+        [cls.post] = BlogPost.objects.bulk_create([BlogPost(
+            title='Popular', content='<p>Read me.</p>', image='blog_images/p.jpg', author=cls.admin,
+        )])
+
+    def setUp(self):
+        cache.clear()
+        analytics.discard()
+        # Flushed by the tests, not by a background thread.
+        self.enterContext(mock.patch.object(analytics, '_start_flusher'))
+
+    def test_views_are_counted_in_memory_and_upserted_in_one_batch(self):
+        for _ in range(3):
+            self.client.get(reverse('blog_detail', args=[self.post.pk]))
+        self.client.get(reverse('services'))
+        self.client.get(reverse('search'), {'q': 'read'})
+        self.assertEqual(sorted(analytics.pending().values()), [1, 3])
+
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(analytics.flush(), 2)
+        # executemany is logged once, as '2 times: INSERT ...'.
+        self.assertEqual([q['sql'].split(':')[0] for q in queries if 'INSERT' in q['sql']], ['2 times'])
+        self.client.get(reverse('blog_detail', args=[self.post.pk]))
+        analytics.flush()
+        self.assertEqual(PageView.objects.get(view_name='blog_detail').count, 4)
+
+        self.client.force_login(self.admin)
+        summary = self.client.get(reverse('dashboard')).context['analytics']
+        self.assertEqual(summary['total'], 5)
+        self.assertEqual(summary['top_posts'], [{'post': self.post, 'total': 4}])
+
+    def test_upsert_adds_to_the_rows_of_other_workers(self):
+        minute = timezone.now().replace(second=0, microsecond=0)
+        PageView.objects.create(path='/services/', view_name='services', minute=minute, count=5)
+        with mock.patch.object(analytics.timezone, 'now', return_value=minute + timedelta(seconds=30)):
+            analytics.record('/services/', 'services')
+            analytics.record('/services/', 'services')
+        with mock.patch.object(analytics.timezone, 'now', return_value=minute + timedelta(minutes=1)):
+            analytics.record('/services/', 'services')
+        self.assertEqual(analytics.flush(), 2)
+        self.assertEqual(analytics.pending(), {})
+        self.assertEqual(list(PageView.objects.order_by('minute').values_list('minute', 'count')),
+                         [(minute, 7), (minute + timedelta(minutes=1), 1)])
+
+    def test_counts_are_kept_when_the_write_fails(self):
+        analytics.record('/services/', 'services')
+        failing = mock.Mock(wraps=connection, ops=connection.ops)
+        failing.cursor.side_effect = OperationalError('database is locked')
+        with mock.patch.object(analytics, 'connection', failing):
+            self.assertRaises(OperationalError, analytics.flush)
+        analytics.record('/services/', 'services')
+        self.assertEqual(list(analytics.pending().values()), [2])
+        analytics.flush()
+        self.assertEqual(PageView.objects.get().count, 2)
+
+    def test_only_successful_gets_of_public_pages_are_counted(self):
+        etag = self.client.get(reverse('services'))['ETag']
+        self.client.get(reverse('services'), HTTP_IF_NONE_MATCH=etag)
+        self.client.get(reverse('blog_detail', args=[self.post.pk + 1]))
+        self.client.get(reverse('login'))
+        self.client.post(reverse('services'))
+        self.assertEqual(list(analytics.pending().items()),
+                         [(('/services/', 'services', None, mock.ANY), 2)])
+
+    def test_old_rows_are_pruned(self):
+        now = timezone.now()
+        PageView.objects.create(path='/', view_name='home', minute=now - timedelta(days=91), count=1)
+        PageView.objects.create(path='/', view_name='home', minute=now - timedelta(days=89), count=1)
+        self.assertEqual(analytics.prune(), 1)
+        self.assertEqual(PageView.objects.count(), 1)
+
+
+class SamplingProfilerTests(TestCase):
+    def setUp(self):
+        self.sampler = Sampler(output_dir=self.enterContext(tempfile.TemporaryDirectory()))
+        # Sampled by the tests, not by a background thread.
+        self.enterContext(mock.patch.object(self.sampler, '_ensure_running'))
+
+    def test_async_views_sample_their_sync_thread(self):
+        def query():
+            self.sampler.sample()
+
+        async def view():
+            async with ThreadSensitiveContext():
+                with self.sampler.track('view', related=_sync_threads()):
+                    await sync_to_async(query)()
+
+        async_to_sync(view)()
+        self.assertTrue([stack for stack in self.sampler.counts['view'] if '.query;' in stack])
+
+    def test_concurrent_async_views_are_sampled_per_task(self):
+        self.enterContext(mock.patch.object(profiling, 'sampler', self.sampler))
+        self.enterContext(mock.patch.object(profiling, 'PROFILER_ENABLED', True))
+
+        @sampled(rate=1)
+        async def first(gate):
+            await gate.wait()
+            self.sampler.sample()
+
+        @sampled(rate=1)
+        async def second(gate):
+            await gate.wait()
+            self.sampler.sample()
+
+        @sampled(rate=0)
+        async def third():
+            self.sampler.sample()
+
+        async def overlap():
+            gates = asyncio.Event(), asyncio.Event()
+            tasks = [asyncio.create_task(first(gates[0])), asyncio.create_task(second(gates[1]))]
+            await asyncio.sleep(0)
+            # Both are tracked; `second` stays tracked after `first` returns.
+            for gate, task in zip(gates, tasks):
+                gate.set()
+                await task
+            await third()
+
+        async_to_sync(overlap)()
+        # Each sample saw the loop thread running one task, counted for it only.
+        self.assertEqual({label: sum(counts.values()) for label, counts in self.sampler.counts.items()},
+                         {'first': 1, 'second': 1})
+
+    def test_files_of_stopped_workers_are_pruned(self):
+        stale = self.sampler.output_dir / 'home.1.folded'
+        stale.write_text('a;b 1\n')
+        week_ago = (timezone.now() - timedelta(days=8)).timestamp()
+        os.utime(stale, (week_ago, week_ago))
+        self.sampler.counts['home']['a;c'] += 1
+        self.sampler.flush()
+        self.assertEqual([path.name for path in self.sampler.output_dir.iterdir()], [f'home.{os.getpid()}.folded'])
+
+
+class ReadReplicaRoutingTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.service = Service.objects.create(title='Hosting', description='Managed hosting.', icon_class='fas fa-server')
+
+    def setUp(self):
+        cache.clear()
+        self.router = ReadReplicaRouter()
+        # Tests read the primary in the replica's place; pretend a copy was
+        # taken a minute ago.
+        self.refreshed_at = time.time() - 60
+        self.enterContext(mock.patch.object(routers, 'snapshot_time', lambda: self.refreshed_at))
+
+    def read_from(self, group, model=Service, **kwargs):
+        @prefer_replica(group)
+        def view(request, **kwargs):
+            return self.router.db_for_read(model)
+        return view(None, **kwargs)
+
+    def test_content_is_read_from_a_current_replica(self):
+        self.assertEqual(self.read_from('services'), REPLICA)
+        self.assertIsNone(self.read_from('services', model=Profile))
+        self.assertIsNone(self.router.db_for_read(Service))
+        self.assertEqual(self.router.db_for_write(Service), 'default')
+
+    def test_stale_replica_falls_back_to_the_primary(self):
+        self.service.title = 'Managed hosting'
+        self.service.save()
+        self.assertIsNone(self.read_from('services'))
+        self.assertEqual(self.read_from('about_us'), REPLICA)
+        # Refreshed after the change.
+        self.refreshed_at = time.time() + 1
+        self.assertEqual(self.read_from('services'), REPLICA)
+
+    def test_detail_pages_only_fall_back_for_the_changed_row(self):
+        admin = User.objects.create_user('admin', password=PASSWORD)
+        first, second = BlogPost.objects.bulk_create([
+            BlogPost(title=title, content='<p>Text.</p>', image='blog_images/p.jpg', author=admin)
+            for title in ('First', 'Second')
+        ])
+        first.title = 'First, edited'
+        first.save(update_fields=['title'])
+        self.assertIsNone(self.read_from('blog_detail:{pk}', model=BlogPost, pk=first.pk))
+        self.assertEqual(self.read_from('blog_detail:{pk}', model=BlogPost, pk=second.pk), REPLICA)
+
+    def test_primary_only_and_a_missing_replica(self):
+        @prefer_replica('services')
+        def view(request):
+            with primary_only():
+                return self.router.db_for_read(Service)
+        self.assertIsNone(view(None))
+        self.refreshed_at = None
+        self.assertIsNone(self.read_from('services'))
+
+    def test_async_views(self):
+        @prefer_replica('services')
+        async def view(request):
+            return self.router.db_for_read(Service)
+        self.assertEqual(async_to_sync(view)(None), REPLICA)
+        self.service.delete()
+        self.assertIsNone(async_to_sync(view)(None))
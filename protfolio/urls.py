@@ -17,6 +17,8 @@ urlpatterns = [
     path('about-us/', views.about_us_page, name='about_us'),
     path('reviews/', views.review_page, name='review_page'),
     path('reviews/submit/', views.submit_review, name='submit_review'),
+    path('reviews/feed/', views.review_feed, name='review_feed'),
+    path('search/', views.search_page, name='search'),
 
     # Service CRUD
     path('services/new/', views.service_create, name='service_create'),
@@ -41,4 +43,8 @@ urlpatterns = [
     # Superadmin Dashboard
     path('dashboard/', views.dashboard, name='dashboard'),
     path('dashboard/users/', views.user_management, name='user_management'),
+    path('dashboard/metrics/', views.metrics_dashboard, name='metrics_dashboard'),
+    path('dashboard/metrics.json', views.metrics_export, name='metrics_export'),
+    path('dashboard/profiler/', views.profiler_dashboard, name='profiler_dashboard'),
+    path('dashboard/tasks/', views.tasks_dashboard, name='tasks_dashboard'),
 ]
\ No newline at end of file
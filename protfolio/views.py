@@ -1,6 +1,11 @@
 # file path: protfolio/views.py
 
-from django.shortcuts import render, redirect, get_object_or_404
+import asyncio
+
+from django.conf import settings
+from django.http import HttpResponse, JsonResponse
+from django.shortcuts import render, redirect, get_object_or_404, aget_object_or_404
+from django.template.loader import render_to_string
 from django.contrib.auth import authenticate, login, logout
 from django.contrib.auth.forms import AuthenticationForm
 from django.contrib.auth.decorators import login_required
@@ -8,13 +13,28 @@ from .forms import (
     CustomUserCreationForm, ReviewForm, DeveloperForm,
     ServiceForm, BlogPostForm, ClientForm
 )
-from .models import Service, BlogPost, Developer, Review, Profile, Client
+from .models import Service, BlogPost, Developer, Review, Profile, Client, ReviewStats
 from django.contrib.auth.models import User
+from .cache import anonymous_page_cache, aattach_fragment_versions, cache_stats, conditional_page, get_user_role
+from .pagination import akeyset_page, keyset_page
+from .routers import prefer_replica
+from . import analytics, metrics, search, tasks
+from .profiling import flame_tree, load_profiles, sampled, sampler
+
+# Optional models are looked up once at import, not on every request.
+try:
+    from .models import HeroSection
+except ImportError:
+    HeroSection = None
+
+BLOG_PAGE_SIZE = 9
+REVIEW_PAGE_SIZE = 20
 
 # --- Decorators ---
 def superadmin_required(function):
     def wrap(request, *args, **kwargs):
-        if request.user.is_authenticated and hasattr(request.user, 'profile') and request.user.profile.role == 'SUPERADMIN':
+        role = getattr(request.user, 'role', None) or get_user_role(request.user)
+        if role == 'SUPERADMIN':
             return function(request, *args, **kwargs)
         else:
             return redirect('home')
@@ -56,44 +76,157 @@ def logout_view(request):
     return redirect('home')
 
 # --- Page Views ---
-def home(request):
-    services = Service.objects.all()
-    clients = Client.objects.all()
-    # Assuming HeroSection model might exist from previous interactions
-    try:
-        from .models import HeroSection
-        hero_section = HeroSection.objects.filter(is_active=True).first()
-    except ImportError:
-        hero_section = None
-    
+# The public read-only pages are async: under ASGI a slow client doesn't hold
+# a worker thread, and independent queries are awaited together.
+
+async def _alist(queryset):
+    return [obj async for obj in queryset]
+
+async def _active_hero_section():
+    if HeroSection is None:
+        return None
+    return await HeroSection.objects.filter(is_active=True).afirst()
+
+@sampled
+@prefer_replica('home')
+@conditional_page(Service, Client)
+@anonymous_page_cache('home')
+async def home(request):
+    services, clients, hero_section = await asyncio.gather(
+        _alist(Service.objects.all()[:3]),
+        _alist(Client.objects.all()),
+        _active_hero_section(),
+    )
+    services_fragment_key, clients_fragment_key = await asyncio.gather(
+        aattach_fragment_versions(services),
+        aattach_fragment_versions(clients),
+    )
     context = {
         'services': services,
+        'services_fragment_key': services_fragment_key,
         'clients': clients,
+        'clients_fragment_key': clients_fragment_key,
         'hero_section': hero_section,
     }
     return render(request, 'index.html', context)
 
 
-def services_page(request):
-    services = Service.objects.all()
-    return render(request, 'services.html', {'services': services})
-
-def blog_page(request):
-    posts = BlogPost.objects.all().order_by('-created_at')
-    return render(request, 'blog.html', {'posts': posts})
-
-def blog_detail(request, pk):
-    post = get_object_or_404(BlogPost, pk=pk)
+@prefer_replica('services')
+@conditional_page(Service)
+@anonymous_page_cache('services')
+async def services_page(request):
+    services = await _alist(Service.objects.all())
+    context = {
+        'services': services,
+        'services_fragment_key': await aattach_fragment_versions(services),
+    }
+    return render(request, 'services.html', context)
+
+@prefer_replica('blog')
+@conditional_page(BlogPost)
+@anonymous_page_cache('blog')
+async def blog_page(request):
+    listing = (
+        BlogPost.objects.select_related('author')
+        .only('title', 'excerpt', 'image', 'created_at', 'author__username')
+    )
+    (posts, next_cursor), post_count = await asyncio.gather(
+        akeyset_page(listing, request.GET.get('cursor'), BLOG_PAGE_SIZE),
+        BlogPost.objects.acount(),
+    )
+    context = {
+        'posts': posts,
+        'posts_fragment_key': await aattach_fragment_versions(posts),
+        'post_count': post_count,
+        'next_cursor': next_cursor,
+        'is_first_page': not request.GET.get('cursor'),
+    }
+    return render(request, 'blog.html', context)
+
+@sampled
+@prefer_replica('blog_detail:{pk}')
+@conditional_page(lambda pk: BlogPost.objects.filter(pk=pk))
+@anonymous_page_cache('blog_detail:{pk}')
+async def blog_detail(request, pk):
+    # The page shows the stored rendering, so the raw body is never loaded.
+    post = await aget_object_or_404(BlogPost.objects.select_related('author').defer('content'), pk=pk)
     return render(request, 'blog_detail.html', {'post': post})
 
-def about_us_page(request):
-    developers = Developer.objects.all()
-    return render(request, 'about_us.html', {'developers': developers})
-
-def review_page(request):
-    reviews = Review.objects.all().order_by('-created_at')
+@prefer_replica('about_us')
+@conditional_page(Developer)
+@anonymous_page_cache('about_us')
+async def about_us_page(request):
+    developers = await _alist(Developer.objects.all())
+    context = {
+        'developers': developers,
+        'developers_fragment_key': await aattach_fragment_versions(developers),
+    }
+    return render(request, 'about_us.html', context)
+
+def _review_feed_query(request):
+    """Reviews for the rating in the query string (if any), plus that rating."""
+    reviews = (
+        Review.objects.select_related('user')
+        .only('review_text', 'rating', 'created_at', 'user__username')
+    )
+    rating = request.GET.get('rating')
+    if rating in {'1', '2', '3', '4', '5'}:
+        reviews = reviews.filter(rating=int(rating))
+    else:
+        rating = None
+    return reviews, rating
+
+@sampled
+@prefer_replica('review_page')
+@conditional_page(Review, lambda: ReviewStats.objects.filter(pk=1))
+@anonymous_page_cache('review_page')
+async def review_page(request):
+    reviews, rating = _review_feed_query(request)
+    (reviews, next_cursor), stats = await asyncio.gather(
+        akeyset_page(reviews, request.GET.get('cursor'), REVIEW_PAGE_SIZE),
+        ReviewStats.aload(),
+    )
     form = ReviewForm()
-    return render(request, 'review.html', {'reviews': reviews, 'form': form})
+    context = {
+        'reviews': reviews,
+        'next_cursor': next_cursor,
+        'rating_filter': rating,
+        'form': form,
+        'stats': stats,
+    }
+    return render(request, 'review.html', context)
+
+def review_feed(request):
+    reviews, rating = _review_feed_query(request)
+    reviews, next_cursor = keyset_page(reviews, request.GET.get('cursor'), REVIEW_PAGE_SIZE)
+    if request.GET.get('format') == 'html':
+        html = render_to_string('partials/review_cards.html', {'reviews': reviews}, request=request)
+        response = HttpResponse(html)
+        if next_cursor:
+            response['X-Next-Cursor'] = next_cursor
+        return response
+    results = [
+        {
+            'id': review.pk,
+            'username': review.user.username,
+            'rating': review.rating,
+            'review_text': review.review_text,
+            'created_at': review.created_at.isoformat(),
+        }
+        for review in reviews
+    ]
+    return JsonResponse({'results': results, 'next_cursor': next_cursor})
+
+def search_page(request):
+    query = request.GET.get('q', '').strip()
+    kind = request.GET.get('kind')
+    results = search.search(query, kind=kind) if query else []
+    context = {
+        'query': query,
+        'kind': kind if kind in search.SOURCES else '',
+        'results': results,
+    }
+    return render(request, 'search.html', context)
 
 @login_required
 def submit_review(request):
@@ -107,6 +240,7 @@ def submit_review(request):
     return redirect('review_page')
 
 # --- Generic CRUD for models WITHOUT author field ---
+@sampled
 @login_required
 @superadmin_required
 def create_item(request, model_form, template_name, redirect_url, item_name):
@@ -119,6 +253,7 @@ def create_item(request, model_form, template_name, redirect_url, item_name):
         form = model_form()
     return render(request, template_name, {'form': form, 'title': f'Add New {item_name}'})
 
+@sampled
 @login_required
 @superadmin_required
 def update_item(request, pk, model_class, model_form, template_name, redirect_url):
@@ -210,7 +345,48 @@ def dashboard(request):
         from .views import hero_section_update
     except ImportError:
         pass
-    return render(request, 'dashboard/dashboard.html')
+    return render(request, 'dashboard/dashboard.html', {'analytics': analytics.summary()})
+
+@login_required
+@superadmin_required
+def metrics_dashboard(request):
+    context = {
+        'enabled': getattr(settings, 'REQUEST_METRICS', False),
+        'rows': metrics.summary(),
+        'slowest': sorted(metrics.recent(), key=lambda r: r['total_ms'], reverse=True)[:20],
+        'threshold': metrics.N_PLUS_ONE_THRESHOLD,
+        'cache': cache_stats(),
+    }
+    return render(request, 'dashboard/metrics.html', context)
+
+@login_required
+@superadmin_required
+def metrics_export(request):
+    return JsonResponse({'summary': metrics.summary(), 'requests': metrics.recent()})
+
+@login_required
+@superadmin_required
+def profiler_dashboard(request):
+    profiles = load_profiles()
+    label = request.GET.get('label')
+    if label not in profiles:
+        label = min(profiles, default=None)
+    context = {
+        'enabled': getattr(settings, 'SAMPLING_PROFILER', False),
+        'labels': sorted(profiles),
+        'label': label,
+        'samples': sum(profiles[label].values()) if label else 0,
+        'tree': flame_tree(profiles[label]) if label else None,
+        'overhead_percent': round(sampler.overhead() * 100, 3),
+    }
+    return render(request, 'dashboard/profiler.html', context)
+
+@login_required
+@superadmin_required
+def tasks_dashboard(request):
+    context = tasks.queue_stats()
+    context['eager'] = tasks.TASKS_EAGER
+    return render(request, 'dashboard/tasks.html', context)
 
 @login_required
 @superadmin_required
@@ -218,10 +394,10 @@ def user_management(request):
     if request.method == 'POST':
         user_id = request.POST.get('user_id')
         new_role = request.POST.get('role')
-        user_to_change = get_object_or_404(User, id=user_id)
-        if hasattr(user_to_change, 'profile'):
-            user_to_change.profile.role = new_role
-            user_to_change.profile.save()
+        profile = get_object_or_404(Profile.objects.only('role', 'user'), user_id=user_id)
+        if new_role in dict(Profile.ROLE_CHOICES) and profile.role != new_role:
+            profile.role = new_role
+            profile.save(update_fields=['role'])
         return redirect('user_management')
 
     users = User.objects.all().select_related('profile')
@@ -0,0 +1,40 @@
+/** Theme shared by every template; compiled by `manage.py build_assets`. */
+module.exports = {
+    content: [
+        './templates/**/*.html',
+        './protfolio/**/*.py',
+        './protfolio/static/js/**/*.js',
+    ],
+    darkMode: 'class',
+    theme: {
+        extend: {
+            colors: {
+                primary: {
+                    50: '#f0f9ff',
+                    100: '#e0f2fe',
+                    500: '#0ea5e9',
+                    600: '#0284c7',
+                    700: '#0369a1',
+                    800: '#075985',
+                    900: '#0c4a6e',
+                },
+                accent: {
+                    50: '#f8fafc',
+                    100: '#f1f5f9',
+                    200: '#e2e8f0',
+                    300: '#cbd5e1',
+                    400: '#94a3b8',
+                    500: '#64748b',
+                    600: '#475569',
+                    700: '#334155',
+                    800: '#1e293b',
+                    900: '#0f172a',
+                }
+            },
+            fontFamily: {
+                'sans': ['Inter', 'system-ui', 'sans-serif'],
+                'serif': ['Georgia', 'serif'],
+            }
+        }
+    }
+}